@@ -1,5 +1,8 @@
+from typing import Optional
+from sqlalchemy import func, select
 from sqlalchemy.orm import Session
 from app.models import ChatHistory
+from app.services.conversation_cache import conversation_cache
 
 def save_chat(db: Session, user_id: str, message: str, reply: str):
     chat = ChatHistory(
@@ -9,17 +12,41 @@ def save_chat(db: Session, user_id: str, message: str, reply: str):
     )
     db.add(chat)
     db.commit()
-    db.refresh(chat)
-    print(chat)
+    conversation_cache.append(chat)
     return chat
 
 def get_recent_chats(db: Session,user_id:str, limit: int = 10):
-    return (
+    def newest_id():
+        # Only asked when other worker processes may have saved a chat since it was cached
+        return db.query(func.max(ChatHistory.id)).filter(ChatHistory.user_id == user_id).scalar()
+
+    cached = conversation_cache.get(user_id, limit, newest_id)
+    if cached is not None:
+        return cached
+
+    token = conversation_cache.load_token()
+    chats = (
         db.query(ChatHistory)
         .filter(ChatHistory.user_id == user_id)
         .order_by(ChatHistory.id.desc())
-        .limit(limit)
+        .limit(max(limit, conversation_cache.window))
         .all()
     )
-def get_chat_history(db: Session, user_id: str):
-    return db.query(ChatHistory).filter(ChatHistory.user_id == user_id).all()
+    conversation_cache.put(user_id, chats, token)
+    return chats[:limit]
+def get_chat_history(db: Session, user_id: str, after_id: Optional[int] = None, limit: int = 50):
+    """One page of a user's history, oldest first, starting after the `after_id` cursor."""
+    query = db.query(ChatHistory).filter(ChatHistory.user_id == user_id)
+    if after_id is not None:
+        query = query.filter(ChatHistory.id > after_id)
+    return query.order_by(ChatHistory.id).limit(limit).all()
+
+def iter_chat_history(db: Session, user_id: str, batch_size: int = 1000):
+    """Yield a user's whole history as plain rows, fetching batch_size rows at a time."""
+    statement = (
+        select(ChatHistory.id, ChatHistory.message, ChatHistory.reply)
+        .where(ChatHistory.user_id == user_id)
+        .order_by(ChatHistory.id)
+        .execution_options(yield_per=batch_size)
+    )
+    yield from db.execute(statement)
@@ -1,17 +1,35 @@
-from fastapi import FastAPI,Depends,UploadFile,File
+from fastapi import FastAPI,Depends,UploadFile,File,HTTPException,Query,Request
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from fastapi.concurrency import run_in_threadpool
 from app import crud
-from app.schemas import ChatRequest, ChatResponse
+from app.schemas import ChatRequest, ChatResponse, ChatHistoryItem, ChatHistoryPage, DocChatRequest, DocFilters
 from app.database import SessionLocal, engine, Base
+from app import migrations
 from sqlalchemy.orm import Session
+from typing import Optional
+from urllib.parse import quote
 import os
-from app.services.ai_service import generate_ai_reply
-from app.services.doc_service import find_relevant_chunks, load_and_chunk_documents, retrieve_chunks
+import re
+import json
+import time
+import asyncio
+from app.services.ai_service import agenerate_ai_reply, stream_ai_reply, close_client
 from fastapi.middleware.cors import CORSMiddleware
-from app.services.doc_service import initialize_doc_system, rebuild_index
+from app.services import ingest_queue
+from app.services import prompt_builder
+from app.services import metrics
+from app.services.conversation_cache import conversation_cache
+from app.services.answer_cache import answer_cache
+from app.services.prompt_builder import build_chat_messages, build_doc_messages
+
+# doc_service (FAISS, pdfplumber, the embedding model) is imported by the
+# warm-up task or the first document request, never at import time, so workers
+# and tools that only need /chat or /history start in well under a second
 
 
 
 Base.metadata.create_all(bind=engine)
+migrations.upgrade(engine)
 
 app = FastAPI(title="Smart AI Assistant")
 
@@ -21,52 +39,167 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing"],
 )
 
+# Adds a Server-Timing header with each request's per-stage durations
+METRICS_TIMING_HEADER = os.getenv("METRICS_TIMING_HEADER", "false").lower() in ("1", "true", "yes")
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    start = time.perf_counter()
+    timings = metrics.start_request_timing() if METRICS_TIMING_HEADER else None
+    response = await call_next(request)
+    elapsed = time.perf_counter() - start
+
+    # The route template, not the path, so /history/{user_id} is one series
+    route = request.scope.get("route")
+    metrics.HTTP_REQUEST_SECONDS.observe(elapsed, method=request.method,
+                                         route=route.path if route is not None else "unmatched",
+                                         status=response.status_code)
+    if timings is not None:
+        response.headers["Server-Timing"] = metrics.server_timing(timings, elapsed)
+    return response
+
+# Load the index and embedding model right after startup rather than on the first /ask-doc
+WARMUP_ON_STARTUP = os.getenv("WARMUP_ON_STARTUP", "true").lower() in ("1", "true", "yes")
+
+_warm_up_task: Optional[asyncio.Task] = None
+
+def warm_up():
+    from app.services import doc_service
+    doc_service.warm_up()
+    prompt_builder.encoding()
+
+def warm_up_task() -> asyncio.Task:
+    """The background task loading the doc system; started on first call and again after a failure."""
+    global _warm_up_task
+    task = _warm_up_task
+    if task is None or (task.done() and (task.cancelled() or task.exception() is not None)):
+        task = _warm_up_task = asyncio.get_running_loop().create_task(run_in_threadpool(warm_up))
+    return task
+
+async def doc_system():
+    """doc_service, once its index and embedding model are loaded."""
+    # Shielded: a client disconnecting must not cancel the load other requests wait on
+    await asyncio.shield(warm_up_task())
+    from app.services import doc_service
+    return doc_service
+
 @app.on_event("startup")
-def startup_event():
-    initialize_doc_system()   # Loads existing documents when server starts
+async def startup_event():
+    # Not awaited, so / and /ready answer while existing documents load
+    if WARMUP_ON_STARTUP:
+        warm_up_task()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await close_client()   # Drains the pooled LLM connections
 
 @app.get("/")
 def root():
+    # Liveness: the process is up; see /ready for whether documents can be searched
     return {"status": "API is running"}
 
+@app.get("/ready")
+async def ready():
+    task = _warm_up_task
+    if task is None:
+        # Warm-up disabled: the first document request loads the doc system
+        return {"status": "ready", "doc_system": "loads on first use"}
+    if not task.done():
+        return JSONResponse({"status": "starting"}, status_code=503)
+    if task.cancelled() or task.exception() is not None:
+        error = "cancelled" if task.cancelled() else str(task.exception())
+        return JSONResponse({"status": "failed", "error": error}, status_code=503)
+    return {"status": "ready", "doc_system": "loaded"}
+
+@app.get("/metrics")
+def prometheus_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/stats")
+def cache_stats():
+    return {
+        "conversation_cache": conversation_cache.stats(),
+        "answer_cache": answer_cache.stats(),
+    }
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
-        
-@app.post("/chat", response_model=ChatResponse)
-def chat(request: ChatRequest, db:Session=Depends(get_db)):
-    
-    previous_chats=crud.get_recent_chats(db=db, user_id=request.user_id)
 
-    messages = [
-        {"role": "system", "content": "You are a helpful support assistant."}
-    ]
+async def save_reply(db: Session, user_id: str, message: str, reply: str):
+    if not reply.startswith("(AI Error)"):
+        with metrics.stage("save_chat"):
+            await run_in_threadpool(
+                crud.save_chat,
+                db=db,
+                user_id=user_id,
+                message=message,
+                reply=reply
+            )
 
-    for chat in reversed(previous_chats):
-        messages.append({"role": "user", "content": chat.message})
-        messages.append({"role": "assistant", "content": chat.reply})
+async def replay(reply: str):
+    yield reply
 
-    messages.append({"role": "user", "content": request.message})
+def sse_reply(request: ChatRequest, tokens, on_reply=None):
+    """Forward reply tokens as Server-Sent Events, then store the full reply.
 
-    ai_reply = generate_ai_reply(messages)
+    `on_reply(reply)` is called with the complete reply unless the LLM call failed.
+    """
+    async def events():
+        parts = []
+        failed = False
 
-    if not ai_reply.startswith("(AI Error)"):
-        crud.save_chat(
-        db=db,
-        user_id=request.user_id,
-        message=request.message,
-        reply=ai_reply
-        )
+        async for token in tokens:
+            failed = failed or token.startswith("(AI Error)")
+            parts.append(token)
+            yield f"data: {json.dumps({'token': token})}\n\n"
+
+        yield "data: [DONE]\n\n"
+
+        # The request's db session is already closed once streaming starts
+        if not failed:
+            reply = "".join(parts)
+            if on_reply is not None:
+                on_reply(reply)
+            db = SessionLocal()
+            try:
+                await save_reply(db, request.user_id, request.message, reply)
+            finally:
+                db.close()
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache"})
+
+@app.post("/chat", response_model=ChatResponse)
+async def chat(request: ChatRequest, db:Session=Depends(get_db)):
+
+    with metrics.stage("recent_chats"):
+        previous_chats = await run_in_threadpool(crud.get_recent_chats, db=db, user_id=request.user_id)
+    with metrics.stage("build_prompt"):
+        messages = build_chat_messages(previous_chats, request.message)
+
+    ai_reply = await agenerate_ai_reply(messages)
+    await save_reply(db, request.user_id, request.message, ai_reply)
 
     return ChatResponse(
         reply=ai_reply
     )
 
+@app.post("/chat/stream")
+async def chat_stream(request: ChatRequest, db:Session=Depends(get_db)):
+
+    with metrics.stage("recent_chats"):
+        previous_chats = await run_in_threadpool(crud.get_recent_chats, db=db, user_id=request.user_id)
+    with metrics.stage("build_prompt"):
+        messages = build_chat_messages(previous_chats, request.message)
+    return sse_reply(request, stream_ai_reply(messages))
+
 DOCS_PATH = "documents"
 os.makedirs(DOCS_PATH, exist_ok=True)
 
@@ -77,45 +210,104 @@ def upload_doc(file: UploadFile = File(...)):
     with open(file_path, "wb") as f:
         f.write(file.file.read())
 
-    rebuild_index()
+    # Indexing happens in the background; poll /jobs/{job_id} for progress
+    job_id = ingest_queue.submit(file.filename)
 
-    return {"message": "File uploaded successfully"}
+    return {"message": "File uploaded successfully", "job_id": job_id}
+
+@app.get("/jobs/{job_id}")
+def job_status(job_id: str):
+    job = ingest_queue.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+def chunk_filter(filters: Optional[DocFilters]):
+    if filters is None:
+        return None
+    from app.services.doc_service import ChunkFilter
+    result = ChunkFilter(
+        sources=filters.sources,
+        pages=[(p.first, p.last or p.first) for p in filters.pages] if filters.pages else None,
+        uploaded_after=filters.uploaded_after.timestamp() if filters.uploaded_after else None,
+        uploaded_before=filters.uploaded_before.timestamp() if filters.uploaded_before else None,
+    )
+    return result if any(value is not None for value in result) else None
 
 @app.post("/ask-doc", response_model=ChatResponse)
-def ask_doc(request: ChatRequest,db:Session=Depends(get_db)):
+async def ask_doc(request: DocChatRequest,db:Session=Depends(get_db)):
 
-    chunks = retrieve_chunks(request.message)
-    context = "\n\n".join([c["text"] for c in chunks])
+    with metrics.stage("doc_system"):
+        doc_service = await doc_system()
+    with metrics.stage("retrieve"):
+        retrieval = await doc_service.aretrieve(request.message, chunk_filter=chunk_filter(request.filters))
+    # A near-identical question answered from the same chunks skips the LLM
+    with metrics.stage("answer_cache"):
+        ai_reply = answer_cache.lookup(retrieval.embedding, retrieval.chunks)
 
+    if ai_reply is None:
+        with metrics.stage("recent_chats"):
+            previous_chats = await run_in_threadpool(crud.get_recent_chats, db=db, user_id=request.user_id)
+        with metrics.stage("build_prompt"):
+            messages = build_doc_messages(previous_chats, retrieval.chunks, request.message)
 
-    previous_chats=crud.get_recent_chats(db=db, user_id=request.user_id)
+        ai_reply = await agenerate_ai_reply(messages)
+        if not ai_reply.startswith("(AI Error)"):
+            answer_cache.store(retrieval.embedding, retrieval.chunks, ai_reply)
 
-    messages = [
-        {"role": "system", "content": "Answer ONLY using the provided context. If not found, say you don't know."}
-    ]
+    await save_reply(db, request.user_id, request.message, ai_reply)
 
-    for chat in reversed(previous_chats):
-        messages.append({"role": "user", "content": chat.message})
-        messages.append({"role": "assistant", "content": chat.reply})
+    return ChatResponse(reply=ai_reply)
 
-    messages.extend([
-        {"role": "user", "content": f"CONTEXT:\n{context}"},
-        {"role": "user", "content": request.message}
-    ])
-    # print(messages)
-    ai_reply = generate_ai_reply(messages)
+@app.post("/ask-doc/stream")
+async def ask_doc_stream(request: DocChatRequest,db:Session=Depends(get_db)):
 
-    if not ai_reply.startswith("(AI Error)"):
-        crud.save_chat(
-        db=db,
-        user_id=request.user_id,
-        message=request.message,
-        reply=ai_reply
-        )
+    with metrics.stage("doc_system"):
+        doc_service = await doc_system()
+    with metrics.stage("retrieve"):
+        retrieval = await doc_service.aretrieve(request.message, chunk_filter=chunk_filter(request.filters))
+    with metrics.stage("answer_cache"):
+        cached = answer_cache.lookup(retrieval.embedding, retrieval.chunks)
+    if cached is not None:
+        return sse_reply(request, replay(cached))
 
-    return ChatResponse(reply=ai_reply)
+    with metrics.stage("recent_chats"):
+        previous_chats = await run_in_threadpool(crud.get_recent_chats, db=db, user_id=request.user_id)
+    with metrics.stage("build_prompt"):
+        messages = build_doc_messages(previous_chats, retrieval.chunks, request.message)
+    return sse_reply(request, stream_ai_reply(messages),
+                     on_reply=lambda reply: answer_cache.store(retrieval.embedding, retrieval.chunks, reply))
+
+HISTORY_PAGE_SIZE = int(os.getenv("HISTORY_PAGE_SIZE", "50"))
+HISTORY_MAX_PAGE_SIZE = int(os.getenv("HISTORY_MAX_PAGE_SIZE", "500"))
+HISTORY_EXPORT_BATCH = 1000
+
+@app.get("/history/{user_id}", response_model=ChatHistoryPage)
+def chat_history(user_id:str,
+                 cursor: Optional[int] = None,
+                 limit: int = Query(HISTORY_PAGE_SIZE, ge=1, le=HISTORY_MAX_PAGE_SIZE),
+                 db:Session=Depends(get_db)):
+    # Pass next_cursor back as ?cursor= to get the following page; null means this was the last one
+    rows = crud.get_chat_history(db=db, user_id=user_id, after_id=cursor, limit=limit + 1)
+    next_cursor = rows[limit - 1].id if len(rows) > limit else None
+    return ChatHistoryPage(items=rows[:limit], next_cursor=next_cursor)
+
+def attachment(filename: str) -> str:
+    """Content-Disposition for a download: an ASCII-only filename plus the exact one per RFC 5987."""
+    fallback = re.sub(r"[^A-Za-z0-9._-]", "_", filename)
+    return f"attachment; filename=\"{fallback}\"; filename*=UTF-8''{quote(filename, safe='')}"
+
+@app.get("/history/{user_id}/export")
+def export_chat_history(user_id:str):
+    """Stream a user's full history as NDJSON, one chat per line, oldest first."""
+    def lines():
+        # The request's db session is closed before the body is streamed
+        db = SessionLocal()
+        try:
+            for row in crud.iter_chat_history(db, user_id, batch_size=HISTORY_EXPORT_BATCH):
+                yield ChatHistoryItem.model_validate(row).model_dump_json() + "\n"
+        finally:
+            db.close()
 
-@app.get("/history/{user_id}")
-def chat_history(user_id:str, db:Session=Depends(get_db)):
-    history=crud.get_chat_history(db=db, user_id=user_id)
-    return history
\ No newline at end of file
+    return StreamingResponse(lines(), media_type="application/x-ndjson",
+                             headers={"Content-Disposition": attachment(f"history-{user_id}.ndjson")})
@@ -0,0 +1,34 @@
+"""Schema upgrades for databases created by older versions of the app.
+
+`Base.metadata.create_all` only creates missing tables, so an existing
+chat.db keeps whatever indexes it was created with. `upgrade` brings it to
+the current schema and is safe to run on every start.
+"""
+import logging
+
+from sqlalchemy import inspect, text
+
+from app.models import ChatHistory
+
+logger = logging.getLogger(__name__)
+
+# Indexes from the original schema: single-column B-trees on the free-text
+# columns (never queried), on id (duplicates the primary key) and on user_id
+# (covered by the composite index)
+OBSOLETE_INDEXES = ["ix_chat_db_message", "ix_chat_db_reply", "ix_chat_db_id", "ix_chat_db_user_id"]
+
+
+def upgrade(engine):
+    table = ChatHistory.__table__
+    existing = {ix["name"] for ix in inspect(engine).get_indexes(table.name)}
+
+    with engine.begin() as conn:
+        for index in table.indexes:
+            if index.name not in existing:
+                logger.info("Creating index %s", index.name)
+                index.create(conn)
+
+        for name in OBSOLETE_INDEXES:
+            if name in existing:
+                logger.info("Dropping index %s", name)
+                conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
@@ -1,10 +1,15 @@
-from sqlalchemy import Column, Integer, String
+from sqlalchemy import Column, Index, Integer, String
 from app.database import Base
 
 class ChatHistory(Base):
     __tablename__='chat_db'
 
-    id=Column(Integer, primary_key=True, index=True)
-    user_id=Column(String, index=True)
-    message=Column(String, index=True)
-    reply=Column(String, index=True)
\ No newline at end of file
+    id=Column(Integer, primary_key=True)
+    user_id=Column(String)
+    message=Column(String)
+    reply=Column(String)
+
+    # Every lookup is "this user's chats, newest first"; message/reply are never searched
+    __table_args__ = (
+        Index("ix_chat_db_user_id_id", "user_id", "id"),
+    )
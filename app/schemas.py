@@ -1,8 +1,40 @@
-from pydantic import BaseModel, Field
+from datetime import datetime
+from typing import List, Optional
+from pydantic import BaseModel, ConfigDict, Field, model_validator
 
 class ChatRequest(BaseModel):
     user_id: str
     message: str
 
+class PageRange(BaseModel):
+    first: int = Field(ge=1)
+    last: Optional[int] = Field(default=None, ge=1)   # defaults to first
+
+    @model_validator(mode="after")
+    def check_order(self):
+        if self.last is not None and self.last < self.first:
+            raise ValueError("last must not be before first")
+        return self
+
+class DocFilters(BaseModel):
+    sources: Optional[List[str]] = None
+    pages: Optional[List[PageRange]] = None
+    uploaded_after: Optional[datetime] = None
+    uploaded_before: Optional[datetime] = None
+
+class DocChatRequest(ChatRequest):
+    filters: Optional[DocFilters] = None
+
 class ChatResponse(BaseModel):
     reply: str=Field(default="hi")
+
+class ChatHistoryItem(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    message: str
+    reply: str
+
+class ChatHistoryPage(BaseModel):
+    items: List[ChatHistoryItem]
+    next_cursor: Optional[int] = None
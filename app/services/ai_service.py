@@ -1,30 +1,51 @@
-import requests
-import certifi
+import asyncio
+import importlib.util
+import json
+import httpx
 from dotenv import load_dotenv
 import os
+import time
+from typing import AsyncIterator, Optional
+
+from app.services import metrics
 
 load_dotenv()
 
 OPENROUTER_API_KEY = os.getenv("API_KEY")
+OPENROUTER_URL = os.getenv("OPENROUTER_URL", "https://openrouter.ai/api/v1/chat/completions")
+LLM_MODEL = os.getenv("LLM_MODEL", "mistralai/mistral-7b-instruct")  # free + good model
+
+# 🔹 Connection tuning (seconds / counts)
+LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", "5"))
+LLM_READ_TIMEOUT = float(os.getenv("LLM_READ_TIMEOUT", "60"))
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "100"))
+LLM_MAX_KEEPALIVE = int(os.getenv("LLM_MAX_KEEPALIVE", "20"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "32"))
+LLM_VERIFY_SSL = os.getenv("LLM_VERIFY_SSL", "true").lower() in ("1", "true", "yes")
+
+# HTTP/2 needs the optional `h2` package
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+_client: Optional[httpx.AsyncClient] = None
+_semaphore: Optional[asyncio.Semaphore] = None
+
+
+def _headers():
+    return {
+        "Authorization": f"Bearer {OPENROUTER_API_KEY}",
+        "Content-Type": "application/json",
+    }
 
-def generate_ai_reply(messages: list) -> str:
-    # print(messages)
-    response = requests.post(
-        "https://openrouter.ai/api/v1/chat/completions",
-        headers={
-            "Authorization": f"Bearer {OPENROUTER_API_KEY}",
-            "Content-Type": "application/json",
-        },
-        json={
-            "model": "mistralai/mistral-7b-instruct",  # free + good model
-            "messages": messages
-        }
-        ,verify=False
-    )
-
-    data = response.json()
-    # print("AI RAW RESPONSE:", data)  # 👈 VERY IMPORTANT FOR DEBUGGING
 
+def _record_usage(data):
+    usage = data.get("usage") if isinstance(data, dict) else None
+    if usage:
+        metrics.LLM_TOKENS.inc(usage.get("prompt_tokens") or 0, kind="prompt")
+        metrics.LLM_TOKENS.inc(usage.get("completion_tokens") or 0, kind="completion")
+
+
+def _parse_reply(data) -> str:
+    _record_usage(data)
     # ✅ If API returned an error
     if "error" in data:
         return f"(AI Error) {data['error'].get('message', 'Unknown error')}"
@@ -33,4 +54,99 @@ def generate_ai_reply(messages: list) -> str:
     if "choices" in data and len(data["choices"]) > 0:
         return data["choices"][0]["message"]["content"]
 
-    return "(AI returned unexpected response)"
\ No newline at end of file
+    return "(AI Error) AI returned unexpected response"
+
+
+def get_client() -> httpx.AsyncClient:
+    """Shared keep-alive client, so every request reuses pooled connections."""
+    global _client, _semaphore
+
+    if _client is None:
+        _client = httpx.AsyncClient(
+            http2=HTTP2_AVAILABLE,
+            verify=LLM_VERIFY_SSL,
+            timeout=httpx.Timeout(LLM_READ_TIMEOUT, connect=LLM_CONNECT_TIMEOUT),
+            limits=httpx.Limits(
+                max_connections=LLM_MAX_CONNECTIONS,
+                max_keepalive_connections=LLM_MAX_KEEPALIVE,
+            ),
+            headers=_headers(),
+        )
+        _semaphore = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+    return _client
+
+
+async def close_client():
+    global _client, _semaphore
+
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+        _semaphore = None
+
+
+async def agenerate_ai_reply(messages: list) -> str:
+    client = get_client()
+
+    try:
+        # Includes waiting for a free slot under LLM_MAX_CONCURRENCY
+        with metrics.stage("llm"):
+            async with _semaphore:
+                response = await client.post(
+                    OPENROUTER_URL,
+                    json={"model": LLM_MODEL, "messages": messages},
+                )
+        data = response.json()
+    except (httpx.HTTPError, ValueError) as e:
+        return f"(AI Error) {e}"
+
+    return _parse_reply(data)
+
+
+async def stream_ai_reply(messages: list) -> AsyncIterator[str]:
+    """Yield reply text as the model produces it (OpenAI-style SSE deltas)."""
+    client = get_client()
+    start = time.perf_counter()
+    first_token = True
+
+    try:
+        async with _semaphore:
+            async with client.stream(
+                "POST",
+                OPENROUTER_URL,
+                # Token usage arrives in a final chunk only when asked for
+                json={"model": LLM_MODEL, "messages": messages, "stream": True,
+                      "stream_options": {"include_usage": True}},
+            ) as response:
+                if response.status_code != 200:
+                    body = await response.aread()
+                    try:
+                        yield _parse_reply(json.loads(body))
+                    except ValueError:
+                        yield f"(AI Error) HTTP {response.status_code}"
+                    return
+
+                async for line in response.aiter_lines():
+                    # Blank keep-alives and ": comment" lines carry no data
+                    if not line.startswith("data:"):
+                        continue
+                    payload = line[len("data:"):].strip()
+                    if payload == "[DONE]":
+                        return
+
+                    data = json.loads(payload)
+                    if "error" in data:
+                        yield _parse_reply(data)
+                        return
+                    _record_usage(data)
+                    for choice in data.get("choices", []):
+                        token = choice.get("delta", {}).get("content")
+                        if token:
+                            if first_token:
+                                metrics.record("llm_first_token", time.perf_counter() - start)
+                                first_token = False
+                            yield token
+    except (httpx.HTTPError, ValueError) as e:
+        yield f"(AI Error) {e}"
+    finally:
+        metrics.record("llm_stream", time.perf_counter() - start)
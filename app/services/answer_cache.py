@@ -0,0 +1,123 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+# Cosine similarity a new question needs with a cached one to reuse its answer
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95"))
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "1000"))
+# Near neighbours checked per lookup; a close question may have retrieved different chunks
+ANSWER_CACHE_CANDIDATES = 4
+
+
+class AnswerCache:
+    """Replies to previous /ask-doc questions, found by question-embedding similarity.
+
+    A cached reply is reused only when the new question is within the
+    similarity threshold and retrieval returned the same chunk ids, so the
+    model would have been shown the same context. Entries are dropped when
+    one of their source files is re-indexed and evicted least recently used
+    first beyond `max_entries`.
+    """
+
+    def __init__(self, threshold: float = ANSWER_CACHE_THRESHOLD,
+                 max_entries: int = ANSWER_CACHE_MAX_ENTRIES):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._index = None
+        self._next_id = 0
+        # entry id -> {"chunk_ids", "sources", "reply"}, least recently used first
+        self._entries: "OrderedDict[int, Dict]" = OrderedDict()
+
+    @staticmethod
+    def _chunk_ids(chunks: List[Dict]) -> tuple:
+        # Merged context spans carry the ids of every chunk they cover
+        return tuple(chunk_id for c in chunks for chunk_id in c.get("ids", (c["id"],)))
+
+    @staticmethod
+    def _normalize(embedding: np.ndarray) -> np.ndarray:
+        vector = np.asarray(embedding, dtype="float32").reshape(1, -1)
+        return vector / max(float(np.linalg.norm(vector)), 1e-12)
+
+    def lookup(self, embedding: Optional[np.ndarray], chunks: List[Dict]) -> Optional[str]:
+        if embedding is None or not chunks or self.max_entries <= 0:
+            return None
+        chunk_ids = self._chunk_ids(chunks)
+
+        with self._lock:
+            if self._index is None or not self._entries:
+                self.misses += 1
+                return None
+            similarities, ids = self._index.search(self._normalize(embedding),
+                                                   min(ANSWER_CACHE_CANDIDATES, len(self._entries)))
+            for similarity, entry_id in zip(similarities[0], ids[0].tolist()):
+                if similarity < self.threshold:
+                    break
+                entry = self._entries.get(entry_id)
+                if entry is not None and entry["chunk_ids"] == chunk_ids:
+                    self._entries.move_to_end(entry_id)
+                    self.hits += 1
+                    return entry["reply"]
+            self.misses += 1
+            return None
+
+    def store(self, embedding: Optional[np.ndarray], chunks: List[Dict], reply: str):
+        if embedding is None or not chunks or self.max_entries <= 0:
+            return
+        vector = self._normalize(embedding)
+
+        with self._lock:
+            if self._index is None:
+                # Imported here so processes that never cache an answer don't load FAISS
+                import faiss
+
+                self._index = faiss.IndexIDMap2(faiss.IndexFlatIP(vector.shape[1]))
+            entry_id = self._next_id
+            self._next_id += 1
+            self._index.add_with_ids(vector, np.array([entry_id], dtype="int64"))
+            self._entries[entry_id] = {
+                "chunk_ids": self._chunk_ids(chunks),
+                "sources": {c["source"] for c in chunks},
+                "reply": reply,
+            }
+
+            if len(self._entries) > self.max_entries:
+                evicted = []
+                while len(self._entries) > self.max_entries:
+                    evicted.append(self._entries.popitem(last=False)[0])
+                self._index.remove_ids(np.array(evicted, dtype="int64"))
+
+    def invalidate_sources(self, sources: Iterable[str]):
+        """Drop every answer built from a chunk of one of these files."""
+        sources = set(sources)
+        if not sources:
+            return
+        with self._lock:
+            stale = [entry_id for entry_id, entry in self._entries.items() if entry["sources"] & sources]
+            for entry_id in stale:
+                del self._entries[entry_id]
+            if stale:
+                self._index.remove_ids(np.array(stale, dtype="int64"))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._index = None
+
+    def stats(self) -> Dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "entries": len(self._entries),
+            }
+
+
+answer_cache = AnswerCache()
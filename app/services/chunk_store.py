@@ -0,0 +1,177 @@
+import json
+import mmap
+import os
+from array import array
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from app.services.mapped_column import MappedColumn
+
+TEXT_FILE = "chunk_text.bin"
+OFFSETS_FILE = "chunk_offsets.npy"
+SOURCES_FILE = "chunk_sources.npy"
+PAGES_FILE = "chunk_pages.npy"
+SPANS_FILE = "chunk_spans.npy"
+FINGERPRINTS_FILE = "chunk_fingerprints.npy"
+# Row ids grouped by source, and where each source's group starts
+SOURCE_ROWS_FILE = "chunk_source_rows.npy"
+SOURCE_STARTS_FILE = "chunk_source_starts.npy"
+SOURCE_NAMES_FILE = "chunk_source_names.json"
+
+# Stored in the page column for chunks that don't come from a paginated file
+NO_PAGE = 0
+
+
+class ChunkStore:
+    """Append-only, column-oriented storage for chunk text and metadata.
+
+    The row number is the chunk id used in the FAISS index. Sources are interned
+    to small ints, pages, text offsets, each chunk's character span in its
+    document (or page) and its SimHash fingerprint live in typed columns, and
+    all text is one UTF-8 buffer. A loaded store memory-maps that buffer and
+    every column read-only, and appended rows go to in-memory tails. Rows are
+    never changed or deleted here; which rows are live is tracked by each
+    IndexSnapshot.
+    """
+
+    def __init__(self):
+        self.source_names: List[str] = []
+        self._source_ids: Dict[str, int] = {}
+        self.sources = MappedColumn("i")
+        self.pages = MappedColumn("i")
+        self.offsets = MappedColumn("Q", values=[0])
+        # char_start, char_end of each chunk in the extracted text, interleaved
+        self.spans = MappedColumn("I")
+        # 64-bit SimHash of each chunk's text, for near-duplicate detection
+        self.fingerprints = MappedColumn("Q")
+        # Saved rows grouped by source id, so a per-file lookup doesn't scan every row;
+        # the rows of source s are _source_rows[_source_starts[s]:_source_starts[s + 1]]
+        self._source_rows = np.empty(0, dtype="int32")
+        self._source_starts = np.zeros(1, dtype="int64")
+        # source id -> rows appended since loading
+        self._rows_by_source: Dict[int, array] = {}
+        self._base = b""
+        self._base_len = 0
+        self._tail = bytearray()
+
+    def __len__(self):
+        return len(self.sources)
+
+    def source_id(self, name: str) -> int:
+        sid = self._source_ids.get(name)
+        if sid is None:
+            sid = self._source_ids[name] = len(self.source_names)
+            self.source_names.append(name)
+        return sid
+
+    def append(self, text: str, source: str, page: Optional[int], char_start: int = 0,
+               char_end: Optional[int] = None, fingerprint: int = 0) -> int:
+        """Add one chunk and return its id. Only the single ingestion writer may call this."""
+        data = text.encode("utf-8")
+        self._tail += data
+        # Offsets go in last so a concurrent reader never sees a row whose text is missing
+        sid = self.source_id(source)
+        self.sources.append(sid)
+        self.pages.append(page if page is not None else NO_PAGE)
+        self.spans.extend((char_start, char_end if char_end is not None else char_start + len(text)))
+        self.fingerprints.append(fingerprint)
+        self.offsets.append(self.offsets[-1] + len(data))
+        row = len(self.sources) - 1
+        self._rows_by_source.setdefault(sid, array("i")).append(row)
+        return row
+
+    def text(self, chunk_id: int) -> str:
+        start, end = self.offsets[chunk_id], self.offsets[chunk_id + 1]
+        if end <= self._base_len:
+            data = self._base[start:end]
+        else:
+            data = self._tail[start - self._base_len:end - self._base_len]
+        return bytes(data).decode("utf-8")
+
+    def get(self, chunk_id: int) -> Dict:
+        """Materialize one chunk as the dict the rest of the app expects."""
+        page = self.pages[chunk_id]
+        return {
+            "id": chunk_id,
+            "text": self.text(chunk_id),
+            "source": self.source(chunk_id),
+            "page": page if page != NO_PAGE else None,
+            "char_start": self.spans[2 * chunk_id],
+            "char_end": self.spans[2 * chunk_id + 1],
+        }
+
+    def source(self, chunk_id: int) -> str:
+        return self.source_names[self.sources[chunk_id]]
+
+    def rows_for_source(self, name: str) -> np.ndarray:
+        sid = self._source_ids.get(name)
+        if sid is None:
+            return np.empty(0, dtype="int64")
+        rows = np.empty(0, dtype="int64")
+        if sid + 1 < len(self._source_starts):
+            rows = self._source_rows[self._source_starts[sid]:self._source_starts[sid + 1]].astype("int64")
+        if sid in self._rows_by_source:
+            rows = np.concatenate((rows, np.array(self._rows_by_source[sid], dtype="int64")))
+        return rows
+
+    def pages_of(self, ids: np.ndarray) -> np.ndarray:
+        """Page numbers (NO_PAGE for unpaginated files) of the given rows."""
+        return self.pages.take(ids)
+
+    def nbytes(self) -> int:
+        columns = sum(col.itemsize * len(col)
+                      for col in (self.sources, self.pages, self.offsets, self.spans, self.fingerprints))
+        return columns + self._source_rows.nbytes + self._base_len + len(self._tail)
+
+    # ==============================
+    # Persistence
+    # ==============================
+    def save(self, directory: str, n_rows: Optional[int] = None):
+        """Write the first n_rows rows (default: all)."""
+        n_rows = len(self) if n_rows is None else n_rows
+        text_len = self.offsets[n_rows]
+
+        with open(os.path.join(directory, TEXT_FILE), "wb") as f:
+            f.write(self._base[:min(text_len, self._base_len)])
+            if text_len > self._base_len:
+                f.write(self._tail[:text_len - self._base_len])
+        for name, column, count in ((OFFSETS_FILE, self.offsets, n_rows + 1),
+                                    (SOURCES_FILE, self.sources, n_rows),
+                                    (PAGES_FILE, self.pages, n_rows),
+                                    (SPANS_FILE, self.spans, 2 * n_rows),
+                                    (FINGERPRINTS_FILE, self.fingerprints, n_rows)):
+            column.save(os.path.join(directory, name), count)
+
+        sources = self.sources.slice(0, n_rows)
+        counts = np.bincount(sources, minlength=len(self.source_names))
+        np.save(os.path.join(directory, SOURCE_ROWS_FILE), np.argsort(sources, kind="stable").astype("int32"))
+        np.save(os.path.join(directory, SOURCE_STARTS_FILE), np.concatenate(([0], np.cumsum(counts))).astype("int64"))
+        with open(os.path.join(directory, SOURCE_NAMES_FILE), "w", encoding="utf-8") as f:
+            json.dump(self.source_names, f)
+
+    @classmethod
+    def load(cls, directory: str, n_chunks: int) -> "ChunkStore":
+        store = cls()
+        with open(os.path.join(directory, SOURCE_NAMES_FILE), "r", encoding="utf-8") as f:
+            store.source_names = json.load(f)
+        store._source_ids = {name: i for i, name in enumerate(store.source_names)}
+
+        for attr, name, typecode, count in (("offsets", OFFSETS_FILE, "Q", n_chunks + 1),
+                                            ("sources", SOURCES_FILE, "i", n_chunks),
+                                            ("pages", PAGES_FILE, "i", n_chunks),
+                                            ("spans", SPANS_FILE, "I", 2 * n_chunks),
+                                            ("fingerprints", FINGERPRINTS_FILE, "Q", n_chunks)):
+            setattr(store, attr, MappedColumn.load(os.path.join(directory, name), typecode, count))
+        store._source_rows = MappedColumn.load(os.path.join(directory, SOURCE_ROWS_FILE), "i", n_chunks).base
+        store._source_starts = MappedColumn.load(os.path.join(directory, SOURCE_STARTS_FILE), "q",
+                                                 len(store.source_names) + 1).base
+
+        text_path = os.path.join(directory, TEXT_FILE)
+        if store.offsets[-1] != os.path.getsize(text_path):
+            raise ValueError(f"{text_path} does not match its offset table")
+        if store.offsets[-1]:
+            with open(text_path, "rb") as f:
+                store._base = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        store._base_len = store.offsets[-1]
+        return store
@@ -0,0 +1,101 @@
+"""Redundancy-aware context assembly for /ask-doc.
+
+Neighbouring chunks share Chunker.overlap tokens, so a plain top-k often
+repeats the same sentences. Retrieval over-fetches CONTEXT_OVERFETCH
+candidates per requested chunk and select_context() keeps top_k of them by
+maximal marginal relevance: relevance is the candidate's fused retrieval rank
+(so keyword hits keep their place), and the penalty is its cosine similarity
+to the chunks already kept. Kept chunks whose character spans in the same
+source and page overlap or touch are then merged into one span.
+"""
+import os
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from app.services.metrics import CONTEXT_TOKENS, CONTEXT_TOKENS_SAVED
+
+# Candidates fetched per requested chunk; 1 turns selection off (plain top-k)
+CONTEXT_OVERFETCH = int(os.getenv("CONTEXT_OVERFETCH", "4"))
+# MMR trade-off: 1 ranks by relevance only, 0 by novelty only
+CONTEXT_MMR_LAMBDA = float(os.getenv("CONTEXT_MMR_LAMBDA", "0.7"))
+# Spans this close are consecutive chunks whose shared whitespace the chunker trimmed
+MERGE_MAX_GAP = 2
+
+
+def mmr(embeddings: np.ndarray, k: int, lam: float = CONTEXT_MMR_LAMBDA) -> List[int]:
+    """Indexes of k rows of embeddings (candidates, best-ranked first), in pick order."""
+    n = len(embeddings)
+    if n <= 1 or k <= 0:
+        return list(range(min(n, k)))
+    vectors = embeddings / np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12)
+    similarity = vectors @ vectors.T
+    relevance = 1.0 - np.arange(n) / n
+
+    picked = [0]
+    # Highest similarity of each candidate to anything picked so far
+    redundancy = similarity[0].copy()
+    available = np.ones(n, dtype=bool)
+    available[0] = False
+    while len(picked) < min(k, n):
+        scores = np.where(available, lam * relevance - (1 - lam) * redundancy, -np.inf)
+        best = int(np.argmax(scores))
+        picked.append(best)
+        available[best] = False
+        np.maximum(redundancy, similarity[best], out=redundancy)
+    return picked
+
+
+def merge_spans(chunks: List[Dict]) -> List[Dict]:
+    """Chunks (best first) with overlapping or touching spans of one source and page merged.
+
+    A merged chunk keeps the id of its first member, lists all of them in "ids",
+    and takes the rank of its best member.
+    """
+    groups: Dict[Tuple, List[Tuple[int, Dict]]] = {}
+    for rank, chunk in enumerate(chunks):
+        groups.setdefault((chunk["source"], chunk["page"]), []).append((rank, chunk))
+
+    merged = []   # [best rank, span]
+    for members in groups.values():
+        members.sort(key=lambda member: member[1]["char_start"])
+        first = len(merged)
+        for rank, chunk in members:
+            if len(merged) > first and chunk["char_start"] <= merged[-1][1]["char_end"] + MERGE_MAX_GAP:
+                entry = merged[-1]
+                span = entry[1]
+                if chunk["char_end"] > span["char_end"]:
+                    if chunk["char_start"] >= span["char_end"]:
+                        span["text"] += " " + chunk["text"]
+                    else:
+                        span["text"] += chunk["text"][span["char_end"] - chunk["char_start"]:]
+                    span["char_end"] = chunk["char_end"]
+                span["ids"].append(chunk["id"])
+                if "sources" in span:
+                    span["sources"] = list(dict.fromkeys(span["sources"] + chunk["sources"]))
+                entry[0] = min(entry[0], rank)
+            else:
+                merged.append([rank, {**chunk, "ids": [chunk["id"]]}])
+    merged.sort(key=lambda entry: entry[0])
+    return [span for _, span in merged]
+
+
+def select_context(candidates: List[Dict], embeddings: np.ndarray, top_k: int) -> List[Dict]:
+    """top_k candidates (ranked best first) picked by MMR, merged into spans and in rank order."""
+    picked = sorted(mmr(embeddings, top_k))
+    return merge_spans([candidates[i] for i in picked])
+
+
+def context_tokens(chunks: List[Dict]) -> int:
+    from app.services.prompt_builder import count_tokens
+
+    return sum(count_tokens(chunk["text"]) for chunk in chunks)
+
+
+def record_tokens_saved(top_k_chunks: List[Dict], selected: List[Dict]) -> int:
+    """Compare the selected context with the plain top-k it replaces; returns tokens saved."""
+    plain, sent = context_tokens(top_k_chunks), context_tokens(selected)
+    CONTEXT_TOKENS.inc(plain, kind="top_k")
+    CONTEXT_TOKENS.inc(sent, kind="selected")
+    CONTEXT_TOKENS_SAVED.observe(plain - sent)
+    return plain - sent
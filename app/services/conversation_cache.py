@@ -0,0 +1,154 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+from app.services import metrics
+from app.services.metrics import CHAT_CACHE_LOOKUPS
+
+# Matches the number of turns crud.get_recent_chats loads by default
+WINDOW_SIZE = int(os.getenv("CHAT_CACHE_WINDOW", "10"))
+MAX_USERS = int(os.getenv("CHAT_CACHE_MAX_USERS", "10000"))
+TTL_SECONDS = float(os.getenv("CHAT_CACHE_TTL_SECONDS", "600"))
+# Other processes write the same database: check each hit against the user's newest
+# id there instead of relying on the TTL. On by default when WEB_CONCURRENCY (the
+# worker count uvicorn and gunicorn read) is above 1; set it to true with --workers
+CHAT_CACHE_SHARED_DB = os.getenv(
+    "CHAT_CACHE_SHARED_DB", "true" if int(os.getenv("WEB_CONCURRENCY", "1")) > 1 else "false"
+).lower() in ("1", "true", "yes")
+
+
+class CachedChat(NamedTuple):
+    """Immutable copy of a ChatHistory row, safe to share between requests and threads."""
+    id: int
+    user_id: str
+    message: str
+    reply: str
+
+
+class ConversationCache:
+    """LRU of each user's most recent chats, newest first.
+
+    Filled on a database read and kept current write-through by save_chat, so
+    in a single process a hit never touches the database. When other worker
+    processes write to the same database (`shared_db`), get() checks the cached
+    newest id against the database's (an index-only lookup) and drops a window
+    that fell behind. Entries expire after `ttl_seconds` either way.
+    """
+
+    def __init__(self, window: int = WINDOW_SIZE, max_users: int = MAX_USERS,
+                 ttl_seconds: float = TTL_SECONDS, shared_db: bool = CHAT_CACHE_SHARED_DB):
+        self.window = window
+        self.max_users = max_users
+        self.ttl = ttl_seconds
+        self.shared_db = shared_db
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        # Write sequence numbers for users written while not cached, so a read
+        # that started before the write cannot cache a window missing it
+        self._seq = 0
+        self._unseen_writes: "OrderedDict[str, int]" = OrderedDict()
+
+    @staticmethod
+    def _snapshot(chat) -> CachedChat:
+        return CachedChat(chat.id, chat.user_id, chat.message, chat.reply)
+
+    def get(self, user_id: str, limit: int,
+            newest_id: Optional[Callable[[], Optional[int]]] = None) -> Optional[List[CachedChat]]:
+        """The user's last `limit` chats, or None on a miss.
+
+        With shared_db, `newest_id` returns the id of the user's newest chat in
+        the database; a cached window starting elsewhere is stale and counts as
+        a miss.
+        """
+        if limit > self.window:
+            return None
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[0] < time.monotonic():
+                del self._entries[user_id]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                CHAT_CACHE_LOOKUPS.inc(result="miss")
+                return None
+            chats = entry[1]
+
+        # Outside the lock: a database round trip must not stall other users' lookups
+        if self.shared_db and newest_id is not None and (chats[0].id if chats else None) != newest_id():
+            with self._lock:
+                if self._entries.get(user_id) is entry:
+                    del self._entries[user_id]
+                self.stale += 1
+                self.misses += 1
+            CHAT_CACHE_LOOKUPS.inc(result="stale")
+            return None
+
+        with self._lock:
+            if user_id in self._entries:
+                self._entries.move_to_end(user_id)
+            self.hits += 1
+        CHAT_CACHE_LOOKUPS.inc(result="hit")
+        return chats[:limit]
+
+    def load_token(self) -> int:
+        """Take before reading from the database; pass to put() afterwards."""
+        with self._lock:
+            return self._seq
+
+    def put(self, user_id: str, chats: list, token: int):
+        """Cache a window read from the database (newest first, at least `window` long or complete)."""
+        snapshot = [self._snapshot(chat) for chat in chats[:self.window]]
+        with self._lock:
+            if self._unseen_writes.get(user_id, -1) > token:
+                return
+            self._unseen_writes.pop(user_id, None)
+            self._entries[user_id] = (time.monotonic() + self.ttl, snapshot)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_users:
+                self._entries.popitem(last=False)
+
+    def append(self, chat):
+        """Write-through for a chat that was just committed."""
+        with self._lock:
+            self._seq += 1
+            entry = self._entries.get(chat.user_id)
+            if entry is None:
+                self._unseen_writes[chat.user_id] = self._seq
+                self._unseen_writes.move_to_end(chat.user_id)
+                while len(self._unseen_writes) > self.max_users:
+                    self._unseen_writes.popitem(last=False)
+                return
+            expires_at, chats = entry
+            self._entries[chat.user_id] = (expires_at, [self._snapshot(chat)] + chats[:self.window - 1])
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._unseen_writes.clear()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "stale": self.stale,
+                "hit_rate": self.hits / total if total else 0.0,
+                "users": len(self._entries),
+                "turns": sum(len(chats) for _, chats in self._entries.values()),
+            }
+
+
+conversation_cache = ConversationCache()
+
+
+@metrics.collector
+def record_cache_metrics():
+    stats = conversation_cache.stats()
+    metrics.CHAT_CACHE_USERS.set(stats["users"])
+    metrics.CHAT_CACHE_TURNS.set(stats["turns"])
@@ -321,155 +321,1176 @@
 
 #     return content
 import os
+import json
+import math
+import asyncio
+import hashlib
+import logging
+import shutil
+import threading
+import time
 import faiss
+import multiprocessing
+from contextlib import contextmanager
 import numpy as np
-import pdfplumber
-import tiktoken
-from typing import List, Dict
-from sentence_transformers import SentenceTransformer
-import os
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, Dict, NamedTuple, Optional, Tuple
 import certifi
+from app.services.embedding_cache import EmbeddingCache
+from app.services.embedding_backend import LazyBackend
+from app.services.chunk_store import ChunkStore
+from app.services.keyword_index import KeywordIndex
+from app.services.process_lock import ProcessLock
+from app.services.query_batcher import QueryBatcher
+from app.services.answer_cache import answer_cache
+from app.services.context_selection import CONTEXT_OVERFETCH, record_tokens_saved, select_context
+from app.services.near_duplicates import NEAR_DUPLICATE_DISTANCE, NearDuplicateIndex, simhash
+from app.services.extraction import extract_and_chunk, first_task, remaining_tasks
+from app.services import memstats
+from app.services import metrics
+from app.services.metrics import INGEST_STAGE_SECONDS, INGESTED_CHUNKS
 
 os.environ["SSL_CERT_FILE"] = certifi.where()
 
+logger = logging.getLogger(__name__)
+
 DOCS_PATH = "documents"
+SUPPORTED_EXTENSIONS = (".txt", ".pdf")
+MODEL_NAME = "all-MiniLM-L6-v2"
+
+# 🔹 On-disk copy of the index so restarts don't re-embed the whole corpus.
+# Every save is a new generation directory and CURRENT names the live one, so
+# worker processes map the same read-only files and notice each other's uploads
+INDEX_PATH = "index_data"
+GENERATIONS_PATH = os.path.join(INDEX_PATH, "generations")
+CURRENT_FILE = os.path.join(INDEX_PATH, "CURRENT")
+WRITER_LOCK_FILE = os.path.join(INDEX_PATH, "writer.lock")
+# File names inside a generation directory
+INDEX_FILE = "vectors.faiss"
+ALIVE_FILE = "chunk_alive.bin"
+DUPLICATES_FILE = "chunk_duplicates.bin"
+MANIFEST_FILE = "manifest.json"
+EMBEDDING_CACHE_FILE = os.path.join(INDEX_PATH, "embedding_cache.sqlite")
+INDEX_FORMAT_VERSION = 9
+# How often each process checks CURRENT for a generation another process published
+INDEX_POLL_SECONDS = float(os.getenv("INDEX_POLL_SECONDS", "1"))
+# Older generations are deleted; processes still mapping one keep its pages until they move on
+INDEX_KEEP_GENERATIONS = max(2, int(os.getenv("INDEX_KEEP_GENERATIONS", "3")))
+# Zero-copy mmap of the flat vectors where this FAISS build supports it
+MMAP_FLAG = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP)
+
+# 🔹 Vector index type: flat (exact), ivf_flat, ivf_pq or hnsw. IVF modes fall back
+# to a simpler index until the corpus has enough vectors to train them
+INDEX_TYPE = os.getenv("INDEX_TYPE", "flat").lower()
+IVF_NPROBE = int(os.getenv("IVF_NPROBE", "16"))
+HNSW_M = int(os.getenv("HNSW_M", "32"))
+HNSW_EF_CONSTRUCTION = int(os.getenv("HNSW_EF_CONSTRUCTION", "80"))
+HNSW_EF_SEARCH = int(os.getenv("HNSW_EF_SEARCH", "64"))
+# FAISS wants ~39 training points per centroid (and per PQ code for ivf_pq)
+MIN_TRAINING_POINTS_PER_CENTROID = 39
+# HNSW cannot delete vectors; once this share of them is dead the index is rebuilt
+MAX_DEAD_FRACTION = 0.2
+
+INDEX_FALLBACKS = {
+    "flat": ["flat"],
+    "ivf_flat": ["flat", "ivf_flat"],
+    "ivf_pq": ["flat", "ivf_flat", "ivf_pq"],
+    "hnsw": ["hnsw"],
+}
+if INDEX_TYPE not in INDEX_FALLBACKS:
+    raise ValueError(f"INDEX_TYPE must be one of {sorted(INDEX_FALLBACKS)}, got {INDEX_TYPE!r}")
+
+# 🔹 Extraction/chunking processes (1 runs everything in the ingesting thread)
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", str(os.cpu_count() or 1)))
+
+# Chunks flow through embedding and index.add in batches of this size, which
+# bounds ingestion memory regardless of corpus size
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "256"))
+
+# 🔹 Query micro-batching (a batch size of 1 disables it)
+QUERY_BATCH_SIZE = int(os.getenv("QUERY_BATCH_SIZE", "32"))
+QUERY_BATCH_WAIT_MS = float(os.getenv("QUERY_BATCH_WAIT_MS", "3"))
+
+# 🔹 Retrieval: dense (vectors only) or hybrid (vectors + BM25 keywords, fused by reciprocal rank)
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "hybrid").lower()
+if RETRIEVAL_MODE not in ("dense", "hybrid"):
+    raise ValueError(f"RETRIEVAL_MODE must be 'dense' or 'hybrid', got {RETRIEVAL_MODE!r}")
+# Each retriever contributes this many candidates per requested chunk before fusion
+HYBRID_CANDIDATES_PER_RESULT = 4
+# Standard RRF damping constant: a hit at rank r scores 1 / (RRF_K + r)
+RRF_K = 60
+# Filtered searches over at most this many chunks skip approximate (IVF/HNSW)
+# indexes, which lose recall when most vectors are excluded, and rank exactly
+FILTER_EXACT_MAX_IDS = int(os.getenv("FILTER_EXACT_MAX_IDS", "4096"))
 
 # 🔹 Global storage (acts like memory)
-stored_chunks: List[Dict] = []
-index = None
+# Writers (uploads, rebuilds) take turns, across worker processes too; readers
+# never lock, see IndexSnapshot
+ingest_lock = ProcessLock(WRITER_LOCK_FILE)
+# Set once initialize_doc_system has loaded or built the index
+doc_system_initialized = threading.Event()
 
-# 🔹 Embedding model
-model = SentenceTransformer("all-MiniLM-L6-v2")
+# 🔹 Embedding model (PyTorch or ONNX Runtime, see embedding_backend.py),
+# loaded on first encode or by warm_up()
+embedder = LazyBackend(MODEL_NAME)
+
+# 🔹 Chunk embeddings by content hash, shared by every rebuild
+embedding_cache = EmbeddingCache(EMBEDDING_CACHE_FILE, embedder.name)
 
 
 # ==============================
-# 1️⃣ LOAD DOCUMENTS
+# 1️⃣ LIST DOCUMENTS
 # ==============================
-def load_documents():
-    docs = []
-
-    for filename in os.listdir(DOCS_PATH):
-        path = os.path.join(DOCS_PATH, filename)
-
-        if filename.endswith(".txt"):
-            with open(path, "r", encoding="utf-8") as f:
-                text = f.read()
-                docs.append({"text": text, "source": filename})
-
-        elif filename.endswith(".pdf"):
-            with pdfplumber.open(path) as pdf:
-                for i, page in enumerate(pdf.pages):
-                    text = page.extract_text()
-                    if text:
-                        docs.append({
-                            "text": text,
-                            "source": filename,
-                            "page": i + 1
-                        })
-    return docs
+def list_documents():
+    return sorted(
+        filename for filename in os.listdir(DOCS_PATH)
+        if filename.endswith(SUPPORTED_EXTENSIONS)
+    )
+
+
+def file_hash(filename):
+    digest = hashlib.sha256()
+    with open(os.path.join(DOCS_PATH, filename), "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
 
 
 # ==============================
-# 2️⃣ CHUNKING WITH TOKENS
+# 2️⃣ PARALLEL EXTRACTION + CHUNKING
 # ==============================
-class Chunker:
-    def __init__(self, chunk_size=400, overlap=80):
-        self.chunk_size = chunk_size
-        self.overlap = overlap
-        self.tokenizer = tiktoken.get_encoding("cl100k_base")
+# Extraction and chunking live in extraction.py so pool workers can import them
+# without loading the embedding model
+_ingest_pool = None
 
-    def split_text(self, text: str) -> List[str]:
-        tokens = self.tokenizer.encode(text)
-        chunks = []
 
-        start = 0
-        while start < len(tokens):
-            end = start + self.chunk_size
-            chunk_tokens = tokens[start:end]
-            chunk_text = self.tokenizer.decode(chunk_tokens)
-            chunks.append(chunk_text)
+def get_ingest_pool():
+    global _ingest_pool
+    if _ingest_pool is None:
+        # spawn, not fork: the parent already runs torch and FAISS threads
+        _ingest_pool = ProcessPoolExecutor(
+            max_workers=INGEST_WORKERS, mp_context=multiprocessing.get_context("spawn")
+        )
+    return _ingest_pool
 
-            start += self.chunk_size - self.overlap
 
-        return chunks
+def reset_ingest_pool(pool):
+    """Discard a pool one of whose workers died; the next get_ingest_pool() starts a fresh one."""
+    global _ingest_pool
+    pool.shutdown(wait=False, cancel_futures=True)
+    if _ingest_pool is pool:
+        _ingest_pool = None
 
 
-# ==============================
-# 3️⃣ CREATE CHUNKS FROM DOCS
-# ==============================
-def create_chunks():
-    global stored_chunks
-    stored_chunks = []
+def iter_file_chunks(filenames, failed=None):
+    """Yield lists of chunks as extraction tasks finish, in completion order.
+
+    Large PDFs are split into page ranges: the worker extracting a PDF's first
+    range also counts its pages, and the rest are queued from there. Only a
+    couple of tasks per worker are in flight, so the caller can embed finished
+    results while the rest extract. A file that cannot be read or extracted goes
+    into `failed` (filename -> error) and yields nothing more; the other files
+    carry on.
+    """
+    failed = failed if failed is not None else {}
+    pending = deque(first_task(os.path.join(DOCS_PATH, filename), filename) for filename in filenames)
+
+    def fail(filename, error):
+        logger.warning("Could not extract %s: %s", filename, error)
+        failed[filename] = str(error)
+
+    if INGEST_WORKERS <= 1 or (len(pending) == 1 and pending[0][3] is None):
+        while pending:
+            task = pending.popleft()
+            try:
+                with metrics.stage("load_and_chunk", INGEST_STAGE_SECONDS):
+                    chunks, n_pages = extract_and_chunk(*task)
+            except Exception as e:
+                fail(task[1], e)
+                continue
+            pending.extend(remaining_tasks(task, n_pages))
+            yield chunks
+        return
+
+    pool = get_ingest_pool()
+    running = {}   # future -> task
+    # Tasks in flight when a worker died (an OOM kill, a crash in a PDF parser):
+    # rerun one at a time, so only the task that takes a worker down again fails
+    suspects = deque()
+
+    def submit(task):
+        nonlocal pool
+        try:
+            running[pool.submit(extract_and_chunk, *task)] = task
+        except BrokenProcessPool:
+            # Broken while no result of ours was pending, e.g. during an abandoned earlier run
+            reset_ingest_pool(pool)
+            pool = get_ingest_pool()
+            running[pool.submit(extract_and_chunk, *task)] = task
+
+    try:
+        while True:
+            if suspects:
+                if not running:
+                    task = suspects.popleft()
+                    if task[1] not in failed:
+                        submit(task)
+            else:
+                while pending and len(running) < 2 * INGEST_WORKERS:
+                    task = pending.popleft()
+                    if task[1] not in failed:
+                        submit(task)
+            if not running:
+                if suspects:
+                    continue
+                return
+
+            # Time the caller spends waiting on extraction, not the workers' total CPU time
+            with metrics.stage("load_and_chunk", INGEST_STAGE_SECONDS):
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                task = running.pop(future)
+                try:
+                    chunks, n_pages = future.result()
+                except BrokenProcessPool:
+                    crashed = [task, *running.values()]
+                    running.clear()
+                    reset_ingest_pool(pool)
+                    pool = get_ingest_pool()
+                    if len(crashed) == 1:
+                        fail(task[1], "extraction worker crashed")
+                    else:
+                        logger.warning("An extraction worker crashed; retrying %d task(s) one at a time",
+                                       len(crashed))
+                        suspects.extend(crashed)
+                    break
+                except Exception as e:
+                    fail(task[1], e)
+                    continue
+                if task[1] not in failed:
+                    pending.extend(remaining_tasks(task, n_pages))
+                    yield chunks
+    finally:
+        for future in running:
+            future.cancel()
 
-    docs = load_documents()
-    chunker = Chunker()
 
-    for doc in docs:
-        text_chunks = chunker.split_text(doc["text"])
-        for chunk in text_chunks:
-            stored_chunks.append({
-                "text": chunk,
-                "source": doc["source"],
-                "page": doc.get("page", None)
-            })
+def iter_chunks(filenames, failed=None):
+    for chunks in iter_file_chunks(filenames, failed):
+        yield from chunks
+
+
+def batched(iterable, size):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
 
 
 # ==============================
-# 4️⃣ EMBEDDINGS
+# 3️⃣ EMBEDDINGS
 # ==============================
-def embed_chunks():
-    texts = [c["text"] for c in stored_chunks]
-    embeddings = model.encode(texts, show_progress_bar=True)
-    return np.array(embeddings).astype("float32")
+@metrics.timed("embed_chunks", INGEST_STAGE_SECONDS)
+def embed_chunks(chunks):
+    texts = [c["text"] for c in chunks]
+
+    return embedding_cache.encode(texts, embedder.encode)
 
 
 # ==============================
-# 5️⃣ BUILD FAISS INDEX
+# 4️⃣ BUILD FAISS INDEX
 # ==============================
-def build_vector_index():
-    global index
+def ivf_nlist(n_vectors):
+    return max(16, min(65536, int(4 * math.sqrt(n_vectors))))
+
+
+def pq_subquantizers(dimension):
+    # Largest divisor of the dimension giving sub-vectors of at least 8 floats
+    return max(m for m in range(1, dimension // 8 + 1) if dimension % m == 0)
+
+
+def choose_index_type(n_vectors, index_type=None):
+    """The configured index type, or the fallback the corpus is big enough to train."""
+    index_type = index_type or INDEX_TYPE
+    if index_type == "ivf_pq" and n_vectors < 256 * MIN_TRAINING_POINTS_PER_CENTROID:
+        index_type = "ivf_flat"
+    if index_type == "ivf_flat" and n_vectors < ivf_nlist(n_vectors) * MIN_TRAINING_POINTS_PER_CENTROID:
+        index_type = "flat"
+    return index_type
+
+
+def index_factory_string(index_type, n_vectors, dimension):
+    # Flat and HNSW are ID-mapped so a file's chunks can be removed or replaced;
+    # IVF indexes store ids natively
+    if index_type == "ivf_flat":
+        return f"IVF{ivf_nlist(n_vectors)},Flat"
+    if index_type == "ivf_pq":
+        return f"IVF{ivf_nlist(n_vectors)},PQ{pq_subquantizers(dimension)}"
+    if index_type == "hnsw":
+        return f"IDMap,HNSW{HNSW_M}"
+    return "IDMap,Flat"
+
+
+def is_hnsw(index):
+    return isinstance(index, faiss.IndexIDMap) and isinstance(faiss.downcast_index(index.index), faiss.IndexHNSW)
+
+
+def configure_search(index, nprobe=None, ef_search=None):
+    params = faiss.ParameterSpace()
+    if faiss.try_extract_index_ivf(index) is not None:
+        params.set_index_parameter(index, "nprobe", nprobe or IVF_NPROBE)
+    elif is_hnsw(index):
+        params.set_index_parameter(index, "efSearch", ef_search or HNSW_EF_SEARCH)
+
+
+def search_parameters(index, selector):
+    """Per-query FAISS parameters that restrict a search to selector's ids."""
+    if faiss.try_extract_index_ivf(index) is not None:
+        return faiss.SearchParametersIVF(sel=selector, nprobe=IVF_NPROBE)
+    if is_hnsw(index):
+        return faiss.SearchParametersHNSW(sel=selector, efSearch=HNSW_EF_SEARCH)
+    return faiss.SearchParameters(sel=selector)
+
+
+def training_sample_size(n_vectors):
+    # Enough for k-means on every centroid (and PQ codebooks) without embedding the whole corpus
+    return min(n_vectors, max(64 * ivf_nlist(n_vectors), 256 * MIN_TRAINING_POINTS_PER_CENTROID))
+
+
+def new_index(training_vectors, n_vectors=None, index_type=None):
+    """Create (and train, if needed) an empty index for n_vectors (default: the training set).
+
+    Returns the index and the type actually built, which may be a fallback.
+    """
+    dimension = training_vectors.shape[1]
+    n_vectors = n_vectors or len(training_vectors)
+    index_type = choose_index_type(n_vectors, index_type)
+    index = faiss.index_factory(dimension, index_factory_string(index_type, n_vectors, dimension))
+
+    if index_type == "hnsw":
+        faiss.downcast_index(index.index).hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+    if not index.is_trained:
+        index.train(training_vectors)
+    configure_search(index)
+    return index, index_type
 
-    if not stored_chunks:
+
+class IndexSnapshot:
+    """One consistent generation of the FAISS index and the chunks its ids point to.
+
+    Retrieval only reads the published snapshot. Ingestion mutates a private copy
+    and publishes it with a single reference swap, so a search never sees a
+    half-applied update. Snapshots share one append-only ChunkStore and the
+    KeywordIndex over it; each keeps its own `alive` flags saying which store
+    rows it still serves.
+
+    A chunk whose text nearly duplicates one already served is stored but not
+    embedded: it stays out of `alive`, and `duplicate_of` points it at the
+    chunk it was collapsed into, whose `copies` list its provenance.
+    """
+
+    def __init__(self, index=None, store=None, alive=None, manifest=None,
+                 mmapped=False, index_type="flat", dead_count=0, keywords=None, live_tokens=None,
+                 uploaded_at=None, duplicate_of=None, near_duplicates=None):
+        self.index = index
+        self.index_type = index_type
+        self.store = store if store is not None else ChunkStore()
+        if keywords is None:
+            keywords = KeywordIndex.from_texts(self.store.text(i) for i in range(len(self.store)))
+        self.keywords = keywords
+        # One byte per store row: 1 while the chunk is part of this snapshot
+        self.alive = alive if alive is not None else bytearray(len(self.store))
+        self.live_count = self.alive.count(1)
+        # Keyword terms over live chunks, for the BM25 average document length
+        if live_tokens is None:
+            live_tokens = self.keywords.tokens_in(self.live_ids().tolist())
+        self.live_tokens = live_tokens
+        # Removed chunks still present in an index that cannot delete (HNSW)
+        self.dead_count = dead_count
+        # source file -> content hash it was indexed from
+        self.manifest: Dict[str, str] = manifest if manifest is not None else {}
+        # source file -> modification time (epoch seconds) of the indexed version
+        self.uploaded_at: Dict[str, float] = uploaded_at if uploaded_at is not None else {}
+        # A memory-mapped index is read-only; FAISS aborts the process if it is resized
+        self.mmapped = mmapped
+        # Name of the generation directory this snapshot was saved as or loaded from
+        self.generation: Optional[str] = None
+        # Collapsed near-duplicate row -> the live row it was collapsed into, and the reverse
+        self.duplicate_of: Dict[int, int] = duplicate_of if duplicate_of is not None else {}
+        self.copies: Dict[int, List[int]] = self._copies_of(self.duplicate_of)
+        # LSH over the store's fingerprints, built on first ingestion and shared like the KeywordIndex
+        self.near_duplicates = near_duplicates
+        # Chunks this snapshot's ingestion extracted, and how many of them it collapsed
+        self.chunks_ingested = 0
+        self.chunks_collapsed = 0
+        # Files this snapshot's ingestion could not extract -> error
+        self.failed: Dict[str, str] = {}
+
+    @staticmethod
+    def _copies_of(duplicate_of):
+        copies = {}
+        for row, chunk_id in sorted(duplicate_of.items()):
+            copies.setdefault(chunk_id, []).append(row)
+        return copies
+
+    def copy(self):
         index = None
-        return
+        if self.index is not None:
+            if self.mmapped:
+                index = faiss.deserialize_index(faiss.serialize_index(self.index))
+            else:
+                index = faiss.clone_index(self.index)
+        return IndexSnapshot(
+            index,
+            self.store,
+            bytearray(self.alive),
+            dict(self.manifest),
+            index_type=self.index_type,
+            dead_count=self.dead_count,
+            keywords=self.keywords,
+            live_tokens=self.live_tokens,
+            uploaded_at=dict(self.uploaded_at),
+            duplicate_of=dict(self.duplicate_of),
+            near_duplicates=self.near_duplicates,
+        )
+
+    def get_chunk(self, chunk_id):
+        """The chunk as a dict, with "sources": every file holding its text, its own first."""
+        if chunk_id < 0 or chunk_id >= len(self.alive) or not self.alive[chunk_id]:
+            return None
+        chunk = self.store.get(chunk_id)
+        chunk["sources"] = list(dict.fromkeys(
+            [chunk["source"]] + [self.store.source(row) for row in self.copies.get(chunk_id, ())]))
+        return chunk
+
+    def live_ids(self):
+        return np.flatnonzero(np.frombuffer(bytes(self.alive), dtype="uint8")).astype("int64")
+
+    def filter_ids(self, chunk_filter):
+        """Sorted ids of the live chunks matching a ChunkFilter.
+
+        Source and date filters read only the matching files' rows; a page
+        filter alone has to look at every row's page.
+        """
+        sources = chunk_filter.sources
+        after, before = chunk_filter.uploaded_after, chunk_filter.uploaded_before
+        if after is not None or before is not None:
+            dated = {filename for filename, uploaded in self.uploaded_at.items()
+                     if (after is None or uploaded >= after) and (before is None or uploaded <= before)}
+            sources = [s for s in (sources if sources is not None else dated) if s in dated]
+
+        if sources is not None:
+            rows = [self.store.rows_for_source(source) for source in dict.fromkeys(sources)]
+            rows = np.concatenate(rows) if rows else np.empty(0, dtype="int64")
+            rows = rows[rows < len(self.alive)]
+            ids = rows[np.frombuffer(bytes(self.alive), dtype="uint8")[rows] == 1] if len(rows) else rows
+            copies = [row for row in rows.tolist() if row in self.duplicate_of] if self.duplicate_of else []
+        else:
+            ids = self.live_ids()
+            copies = list(self.duplicate_of)
+        copies = np.array(copies, dtype="int64")
+
+        if chunk_filter.pages:
+            ids = self._on_pages(ids, chunk_filter.pages)
+            copies = self._on_pages(copies, chunk_filter.pages)
+        if len(copies):
+            # A collapsed copy that matches makes the chunk it was collapsed into match
+            ids = np.concatenate([ids, np.array([self.duplicate_of[row] for row in copies.tolist()], dtype="int64")])
+        return np.unique(ids)
+
+    def _on_pages(self, ids, page_ranges):
+        if not len(ids):
+            return ids
+        pages = self.store.pages_of(ids)
+        keep = np.zeros(len(ids), dtype=bool)
+        for first, last in page_ranges:
+            keep |= (pages >= first) & (pages <= last)
+        return ids[keep]
+
+    def near_duplicate_index(self):
+        """The LSH index, caught up with the store (None when NEAR_DUPLICATE_DISTANCE disables dedup)."""
+        if NEAR_DUPLICATE_DISTANCE < 0:
+            return None
+        if self.near_duplicates is None:
+            self.near_duplicates = NearDuplicateIndex(self.store.fingerprints)
+        self.near_duplicates.catch_up()
+        return self.near_duplicates
+
+    def add_chunks(self, chunks):
+        """Store chunks; embed and index those that don't nearly duplicate a chunk already served."""
+        if not chunks:
+            return
+
+        near_duplicates = self.near_duplicate_index()
+        kept, kept_chunks = [], []
+        pending = set()
+
+        def serves(row):
+            return row in pending or (row < len(self.alive) and self.alive[row] == 1)
+
+        for c in chunks:
+            fingerprint = c.get("fingerprint")
+            if fingerprint is None:
+                fingerprint = simhash(c["text"])
+            row = self.store.append(c["text"], c["source"], c["page"], c["char_start"], c["char_end"], fingerprint)
+            self.keywords.add(c["text"])
+            original = near_duplicates.find(fingerprint, serves) if near_duplicates is not None else None
+            if near_duplicates is not None:
+                near_duplicates.add(row, fingerprint)
+            if original is None:
+                kept.append(row)
+                kept_chunks.append(c)
+                pending.add(row)
+            else:
+                self.duplicate_of[row] = original
+                self.copies.setdefault(original, []).append(row)
+
+        self.chunks_ingested += len(chunks)
+        self.chunks_collapsed += len(chunks) - len(kept)
+        INGESTED_CHUNKS.inc(len(kept), outcome="indexed")
+        INGESTED_CHUNKS.inc(len(chunks) - len(kept), outcome="near_duplicate")
+        self.alive.extend(b"\0" * (len(self.store) - len(self.alive)))
+        if kept:
+            self._index_rows(np.array(kept, dtype="int64"), kept_chunks)
+
+    def _index_rows(self, ids, chunks):
+        """Embed chunks (the dicts of store rows ids) into the vector index and make them live."""
+        embeddings = embed_chunks(chunks)
+        with metrics.stage("index_add", INGEST_STAGE_SECONDS):
+            if self.index is None:
+                self.index, self.index_type = new_index(embeddings)
+            self.index.add_with_ids(embeddings, ids)
+
+        for chunk_id in ids.tolist():
+            self.alive[chunk_id] = 1
+        self.live_count += len(ids)
+        self.live_tokens += self.keywords.tokens_in(ids.tolist())
+
+    def remove_file(self, filename):
+        removed = self.manifest.pop(filename, None) is not None
+        self.uploaded_at.pop(filename, None)
+        ids = self.store.rows_for_source(filename)
+        ids = ids[ids < len(self.alive)]
+        # The file's collapsed copies only drop out of their chunks' provenance
+        for row in ids.tolist() if self.duplicate_of else ():
+            original = self.duplicate_of.pop(row, None)
+            if original is not None:
+                self.copies[original].remove(row)
+                if not self.copies[original]:
+                    del self.copies[original]
+        ids = ids[np.frombuffer(bytes(self.alive), dtype="uint8")[ids] == 1]
+        if not len(ids):
+            return removed
+
+        if self.index is not None:
+            try:
+                self.index.remove_ids(ids)
+            except RuntimeError:
+                # HNSW: leave the vectors in place and filter them out at search time
+                self.dead_count += len(ids)
+        for chunk_id in ids.tolist():
+            self.alive[chunk_id] = 0
+        self.live_count -= len(ids)
+        self.live_tokens -= self.keywords.tokens_in(ids.tolist())
+
+        # A removed chunk that other files hold a copy of lives on as the first of those copies
+        promoted = []
+        for chunk_id in ids.tolist():
+            copies = self.copies.pop(chunk_id, None)
+            if copies:
+                head, rest = copies[0], copies[1:]
+                del self.duplicate_of[head]
+                for row in rest:
+                    self.duplicate_of[row] = head
+                if rest:
+                    self.copies[head] = rest
+                promoted.append(head)
+        if promoted:
+            self._index_rows(np.array(promoted, dtype="int64"), [self.store.get(row) for row in promoted])
+        return True
+
+    def index_files(self, digests):
+        """(Re-)index the given {filename: content hash}, embedding results as workers deliver them.
+
+        Returns the number of chunks added. Files that fail to extract end up in
+        self.failed and out of the snapshot, so the next sync retries them.
+        """
+        added = 0
+        for filename in digests:
+            self.remove_file(filename)
+        for batch in batched(iter_chunks(list(digests), self.failed), EMBED_BATCH_SIZE):
+            self.add_chunks(batch)
+            added += len(batch)
+        for filename in digests:
+            if filename in self.failed:
+                # Drop whatever page ranges of it were extracted before one failed
+                self.remove_file(filename)
+                continue
+            self.manifest[filename] = digests[filename]
+            self.uploaded_at[filename] = os.path.getmtime(os.path.join(DOCS_PATH, filename))
+        return added
+
+    def needs_retrain(self):
+        """True once the corpus can support a better index, HNSW is too stale, or the store is mostly garbage."""
+        if self.index is None or not self.live_count:
+            return False
+        if self.dead_count > MAX_DEAD_FRACTION * self.index.ntotal:
+            return True
+        if len(self.store) > 1000 and self.live_count + len(self.duplicate_of) < len(self.store) / 2:
+            return True
+
+        fallbacks = INDEX_FALLBACKS[INDEX_TYPE]
+        if self.index_type not in fallbacks:
+            return True
+        return fallbacks.index(choose_index_type(self.live_count)) > fallbacks.index(self.index_type)
+
+    @metrics.timed("retrain", INGEST_STAGE_SECONDS)
+    def retrain(self):
+        """Rebuild the index over a compacted copy of the live chunks.
+
+        Vectors come back from the embedding cache, so this costs no model inference.
+        """
+        old_ids = self.live_ids()
+        store = ChunkStore()
+        keywords = KeywordIndex()
+
+        def move(row):
+            chunk = self.store.get(row)
+            keywords.add(chunk["text"])
+            return store.append(chunk["text"], chunk["source"], chunk["page"], chunk["char_start"],
+                                chunk["char_end"], self.store.fingerprints[row])
+
+        new_ids = {chunk_id: move(chunk_id) for chunk_id in old_ids.tolist()}
+        # Collapsed copies follow their chunk, after every live row and still outside the index
+        duplicate_of = {move(row): new_ids[original] for row, original in sorted(self.duplicate_of.items())}
+        ids = np.arange(len(old_ids), dtype="int64")
+
+        sample = np.random.default_rng(0).choice(ids, training_sample_size(len(ids)), replace=False)
+        index, index_type = new_index(embed_chunks([store.get(i) for i in sample]), len(ids))
+
+        for start in range(0, len(ids), EMBED_BATCH_SIZE):
+            batch = ids[start:start + EMBED_BATCH_SIZE]
+            index.add_with_ids(embed_chunks([store.get(i) for i in batch]), batch)
+        logger.info("Rebuilt vector index as %s (%d vectors)", index_type, len(ids))
+
+        self.index, self.index_type = index, index_type
+        self.store = store
+        self.keywords = keywords
+        self.alive = bytearray(b"\1" * len(ids) + b"\0" * len(duplicate_of))
+        self.live_count = len(ids)
+        self.dead_count = 0
+        self.mmapped = False
+        self.duplicate_of = duplicate_of
+        self.copies = self._copies_of(duplicate_of)
+        self.near_duplicates = None
+
+
+@metrics.timed("build_vector_index", INGEST_STAGE_SECONDS)
+def build_vector_index():
+    snap = IndexSnapshot()
+    snap.index_files({filename: file_hash(filename) for filename in list_documents()})
+    # The index was sized from the first batch; train the configured type on everything
+    if snap.needs_retrain():
+        snap.retrain()
+    return snap
+
+
+snapshot = IndexSnapshot()
+
+# Figures from the most recent rebuild or incremental update
+last_build_stats: Dict = {}
+
 
-    embeddings = embed_chunks()
-    dimension = embeddings.shape[1]
+@contextmanager
+def build_report(label):
+    """Time an ingestion run and log its chunk count, cache use and memory high-water mark."""
+    peak_is_scoped = memstats.reset_peak_rss()
+    start = time.perf_counter()
+    hits, misses = embedding_cache.hits, embedding_cache.misses
+    stats = {"chunks": 0, "duplicates": 0, "failed": 0}
 
-    index = faiss.IndexFlatL2(dimension)
-    index.add(embeddings)
+    yield stats
+
+    stats.update({
+        "label": label,
+        # Share of the extracted chunks collapsed into a near-duplicate instead of embedded
+        "dedup_ratio": stats["duplicates"] / stats["chunks"] if stats["chunks"] else 0.0,
+        "seconds": time.perf_counter() - start,
+        "cache_hits": embedding_cache.hits - hits,
+        "embedded": embedding_cache.misses - misses,
+        "peak_rss_mb": memstats.peak_rss_mb(),
+        "peak_rss_scope": "build" if peak_is_scoped else "process",
+    })
+    last_build_stats.clear()
+    last_build_stats.update(stats)
+    logger.info("%s: %d chunks (%d near-duplicates, dedup ratio %.1f%%), %d file(s) failed, in %.1fs "
+                "(%d cache hits, %d embedded), peak RSS %.0f MB (%s)",
+                label, stats["chunks"], stats["duplicates"], 100 * stats["dedup_ratio"], stats["failed"],
+                stats["seconds"],
+                stats["cache_hits"], stats["embedded"], stats["peak_rss_mb"], stats["peak_rss_scope"])
+
+
+def publish(snap):
+    """Save snap as the newest generation and make it live in this process."""
+    save_index(snap)
+    swap(snap)
+
+
+def swap(snap):
+    global snapshot
+    previous, snapshot = snapshot, snap
+    record_index_metrics(snap)
+
+    # Cached answers were generated from chunks that may just have changed
+    if snap.store is not previous.store:
+        # Compaction renumbers chunk ids, so no cached id list can be trusted;
+        # a generation loaded from disk has its own store, so it lands here too
+        answer_cache.clear()
+    else:
+        changed = {filename for filename in set(previous.manifest) | set(snap.manifest)
+                   if previous.manifest.get(filename) != snap.manifest.get(filename)}
+        answer_cache.invalidate_sources(changed)
+
+
+def record_index_metrics(snap):
+    metrics.INDEX_CHUNKS.set(snap.live_count)
+    metrics.INDEX_VECTORS.set(snap.index.ntotal if snap.index is not None else 0)
+    metrics.INDEX_FILES.set(len(snap.manifest))
+    metrics.INDEX_DUPLICATES.set(len(snap.duplicate_of))
+    metrics.CHUNK_STORE_BYTES.set(snap.store.nbytes())
+    size = 0
+    if snap.generation is not None:
+        directory = generation_path(snap.generation)
+        try:
+            size = sum(entry.stat().st_size for entry in os.scandir(directory) if entry.is_file())
+        except OSError:
+            pass
+    metrics.INDEX_BYTES.set(size)
+
+
+@metrics.collector
+def record_embedding_metrics():
+    metrics.EMBEDDING_MODEL_LOADED.set(int(embedder.loaded))
+    metrics.EMBEDDING_CACHE_ENTRIES.set(embedding_cache.stats()["entries"])
 
 
 # ==============================
-# 6️⃣ RETRIEVE RELEVANT CHUNKS
+# 5️⃣ RETRIEVE RELEVANT CHUNKS
 # ==============================
-def retrieve_chunks(query, top_k=3):
-    if index is None:
-        return []
+class ChunkFilter(NamedTuple):
+    """Restricts retrieval to some files, page ranges and/or upload times (epoch seconds)."""
+    sources: Optional[List[str]] = None
+    pages: Optional[List[Tuple[int, int]]] = None
+    uploaded_after: Optional[float] = None
+    uploaded_before: Optional[float] = None
 
-    query_embedding = model.encode([query]).astype("float32")
-    distances, indices = index.search(query_embedding, top_k)
 
-    results = []
-    for idx in indices[0]:
-        if idx < len(stored_chunks):
-            results.append(stored_chunks[idx])
+class Retrieval(NamedTuple):
+    """Chunks found for one query, best first, plus the query embedding used to find them."""
+    chunks: List[Dict]
+    embedding: Optional[np.ndarray] = None
+
+    def top(self, k):
+        return Retrieval(self.chunks[:k], self.embedding)
+
+
+def reciprocal_rank_fusion(rankings, k=RRF_K):
+    """Merge ranked id lists; ids ranked well by several retrievers come first."""
+    scores = {}
+    for ranking in rankings:
+        for rank, chunk_id in enumerate(ranking, start=1):
+            scores[chunk_id] = scores.get(chunk_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores, key=scores.get, reverse=True)
+
+
+def keyword_search(snap, query, top_k, allowed_ids=None):
+    ids, _ = snap.keywords.search(query, snap.alive, snap.live_count, snap.live_tokens, top_k, allowed_ids)
+    return ids.tolist()
+
+
+def dense_search(snap, query_embeddings, k, allowed_ids=None):
+    """FAISS ids of the k nearest chunks per query, optionally only among allowed_ids (sorted)."""
+    if allowed_ids is None:
+        return snap.index.search(query_embeddings, k)[1]
+    if not len(allowed_ids):
+        return np.full((len(query_embeddings), k), -1, dtype="int64")
+
+    if snap.index_type != "flat" and len(allowed_ids) <= FILTER_EXACT_MAX_IDS:
+        # Stored vectors only: a request never runs the model over chunks, and
+        # uncached ones leave it to the id-selector search below
+        vectors = embedding_cache.lookup([snap.store.text(i) for i in allowed_ids.tolist()])
+        if vectors is not None:
+            exact = faiss.IndexIDMap(faiss.IndexFlatL2(query_embeddings.shape[1]))
+            exact.add_with_ids(vectors, allowed_ids)
+            return exact.search(query_embeddings, k)[1]
+
+    selector = faiss.IDSelectorBatch(allowed_ids)
+    return snap.index.search(query_embeddings, k, params=search_parameters(snap.index, selector))[1]
+
 
+def retrieve_batch(queries, top_k=3, chunk_filter=None):
+    """Embed and search many queries with one encode and one FAISS call.
+
+    With a ChunkFilter only matching chunks are searched; FAISS skips the rest
+    through an id selector instead of over-fetching and discarding them.
+    """
+    snap = snapshot
+    if snap.index is None or snap.index.ntotal == 0:
+        return [Retrieval([]) for _ in queries]
+
+    allowed_ids = None
+    if chunk_filter is not None:
+        with metrics.stage("filter"):
+            allowed_ids = snap.filter_ids(chunk_filter)
+    hybrid = RETRIEVAL_MODE == "hybrid"
+    # Context selection picks top_k out of this many fused candidates
+    fetch = top_k * max(1, CONTEXT_OVERFETCH)
+    candidates = max(top_k * HYBRID_CANDIDATES_PER_RESULT, fetch) if hybrid else fetch
+    with metrics.stage("encode"):
+        query_embeddings = np.asarray(embedder.encode(queries), dtype="float32")
+    # Over-fetch when dead HNSW entries may take some of the top slots
+    k = min(candidates + snap.dead_count, 4 * candidates)
+    with metrics.stage("dense_search"):
+        indices = dense_search(snap, query_embeddings, k, allowed_ids)
+
+    pools = []
+    for query, row in zip(queries, indices):
+        ranked = [idx for idx in row.tolist() if 0 <= idx < len(snap.alive) and snap.alive[idx]]
+        if hybrid:
+            with metrics.stage("keyword_search"):
+                keyword_ranked = keyword_search(snap, query, candidates, allowed_ids)
+            ranked = reciprocal_rank_fusion([ranked[:candidates], keyword_ranked])
+        # Only the hits that can make it into the context are materialized from the chunk store
+        pools.append([snap.get_chunk(idx) for idx in ranked[:fetch]])
+
+    if CONTEXT_OVERFETCH <= 1:
+        return [Retrieval(pool, embedding) for pool, embedding in zip(pools, query_embeddings)]
+
+    results = []
+    with metrics.stage("select_context"):
+        # Candidate vectors come back from the embedding cache, not the model
+        texts = [c["text"] for pool in pools for c in pool]
+        vectors = embedding_cache.encode(texts, embedder.encode)
+        offset = 0
+        for pool, embedding in zip(pools, query_embeddings):
+            chunks = select_context(pool, vectors[offset:offset + len(pool)], top_k)
+            offset += len(pool)
+            record_tokens_saved(pool[:top_k], chunks)
+            results.append(Retrieval(chunks, embedding))
     return results
 
 
+# Concurrent requests share encode/search calls instead of paying for one each
+query_batcher = QueryBatcher(retrieve_batch, max_batch=QUERY_BATCH_SIZE, max_wait_ms=QUERY_BATCH_WAIT_MS,
+                             trim=Retrieval.top)
+
+
+def retrieve(query, top_k=3, chunk_filter=None):
+    # Filtered queries search a different id set each, so they don't join a batch
+    if QUERY_BATCH_SIZE <= 1 or chunk_filter is not None:
+        return retrieve_batch([query], top_k, chunk_filter)[0]
+    return query_batcher.submit(query, top_k).result()
+
+
+async def aretrieve(query, top_k=3, chunk_filter=None):
+    """Async retrieve that waits on the batch without holding a threadpool thread."""
+    if QUERY_BATCH_SIZE <= 1 or chunk_filter is not None:
+        return await asyncio.to_thread(retrieve, query, top_k, chunk_filter)
+    return await asyncio.wrap_future(query_batcher.submit(query, top_k))
+
+
 # ==============================
-# 7️⃣ INITIALIZE ON STARTUP
+# 6️⃣ INITIALIZE ON STARTUP
 # ==============================
 def initialize_doc_system():
     os.makedirs(DOCS_PATH, exist_ok=True)
-    create_chunks()
-    build_vector_index()
+
+    with ingest_lock:
+        # Reuse the persisted index and only re-embed files that changed since it was saved
+        loaded = load_index()
+        if loaded is not None:
+            swap(loaded)
+            update = sync_index()
+            logger.info("Loaded persisted %s index (%d chunks), re-indexed %d changed file(s), %d failed",
+                        snapshot.index_type, snapshot.live_count, len(update.changed), len(update.failed))
+            if snapshot.needs_retrain():
+                work = snapshot.copy()
+                work.retrain()
+                publish(work)
+        else:
+            rebuild_index()
+        doc_system_initialized.set()
+    start_generation_watcher()
+
+
+def ensure_doc_system():
+    """Initialize the doc system on first use; a no-op afterwards."""
+    if not doc_system_initialized.is_set():
+        with ingest_lock:
+            if not doc_system_initialized.is_set():
+                initialize_doc_system()
+
+
+def warm_up():
+    """Everything the first /ask-doc would otherwise wait for: the index and the embedding model."""
+    ensure_doc_system()
+    embedder.load()
 
 
 # ==============================
-# 8️⃣ REBUILD AFTER NEW UPLOAD
+# 7️⃣ REBUILD AFTER NEW UPLOAD
 # ==============================
 def rebuild_index():
-    create_chunks()
-    build_vector_index()
+    with ingest_lock, build_report("Full rebuild") as stats:
+        snap = build_vector_index()
+        stats["chunks"] = snap.chunks_ingested
+        stats["duplicates"] = snap.chunks_collapsed
+        stats["failed"] = len(snap.failed)
+        publish(snap)
+
+
+# ==============================
+# 8️⃣ INCREMENTAL INDEXING
+# ==============================
+class IndexUpdate(NamedTuple):
+    """Outcome of index_files: files (re-)indexed or removed, and files that failed -> error."""
+    changed: List[str]
+    failed: Dict[str, str]
+
+
+def index_files(filenames, removed=()):
+    """Apply a batch of file changes as one new snapshot.
+
+    Files whose content hash matches the manifest are skipped, so callers can
+    pass every candidate. A file that fails to extract is reported in
+    IndexUpdate.failed (and dropped from the index) while the rest are indexed.
+    """
+    with ingest_lock:
+        # Build on the newest generation, which another worker may have published
+        refresh_snapshot()
+        current = snapshot
+        updates = {}
+        deletions = [filename for filename in removed if filename in current.manifest]
+
+        for filename in dict.fromkeys(filenames):
+            if not os.path.exists(os.path.join(DOCS_PATH, filename)):
+                if filename in current.manifest:
+                    deletions.append(filename)
+                continue
+            digest = file_hash(filename)
+            if current.manifest.get(filename) != digest:
+                updates[filename] = digest
+
+        if not updates and not deletions:
+            return IndexUpdate([], {})
+
+        with build_report(f"Indexed {len(updates)} file(s), removed {len(deletions)}") as stats:
+            work = current.copy()
+            for filename in deletions:
+                work.remove_file(filename)
+            stats["chunks"] = work.index_files(updates)
+            stats["duplicates"] = work.chunks_collapsed
+            stats["failed"] = len(work.failed)
+            changed = [filename for filename in updates if filename not in work.failed] + deletions
+            # A failed file only changes the index if an older version of it was served
+            if changed or any(filename in current.manifest for filename in work.failed):
+                if work.needs_retrain():
+                    work.retrain()
+                publish(work)
+        return IndexUpdate(changed, work.failed)
+
+
+def sync_index():
+    """Bring the index in line with DOCS_PATH, touching only new, changed or deleted files."""
+    with ingest_lock:
+        present = list_documents()
+        vanished = set(snapshot.manifest) - set(present)
+        return index_files(present, removed=vanished)
+
+
+# ==============================
+# 9️⃣ PERSISTENCE
+# ==============================
+def _atomic_write(path, write):
+    tmp_path = path + ".tmp"
+    write(tmp_path)
+    os.replace(tmp_path, path)
+
+
+def generation_path(generation):
+    return os.path.join(GENERATIONS_PATH, generation)
+
+
+def generation_numbers():
+    try:
+        names = os.listdir(GENERATIONS_PATH)
+    except OSError:
+        return []
+    return sorted(int(name) for name in names if name.isdigit())
+
+
+def current_generation():
+    """The generation CURRENT points at, or None. This is the cheap per-poll version check."""
+    try:
+        with open(CURRENT_FILE, "r", encoding="utf-8") as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+
+@metrics.timed("save_index", INGEST_STAGE_SECONDS)
+def save_index(snap):
+    """Write snap as a new generation and point CURRENT at it; the caller holds ingest_lock."""
+    numbers = generation_numbers()
+    generation = f"{(numbers[-1] + 1 if numbers else 1):08d}"
+    directory = generation_path(generation)
+    tmp_dir = directory + ".tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    if snap.index is not None:
+        faiss.write_index(snap.index, os.path.join(tmp_dir, INDEX_FILE))
+    # Rows appended past this snapshot's alive flags (e.g. by a failed ingestion) are left out
+    snap.store.save(tmp_dir, n_rows=len(snap.alive))
+    snap.keywords.save(tmp_dir, n_rows=len(snap.alive))
+    with open(os.path.join(tmp_dir, ALIVE_FILE), "wb") as f:
+        f.write(snap.alive)
+    with open(os.path.join(tmp_dir, DUPLICATES_FILE), "wb") as f:
+        # (collapsed row, row it was collapsed into) pairs
+        np.array(sorted(snap.duplicate_of.items()), dtype="int64").reshape(-1, 2).tofile(f)
+    with open(os.path.join(tmp_dir, MANIFEST_FILE), "w", encoding="utf-8") as f:
+        json.dump({
+            "version": INDEX_FORMAT_VERSION,
+            "model": embedder.name,
+            "chunks": len(snap.alive),
+            "ntotal": snap.index.ntotal if snap.index is not None else 0,
+            "index_type": snap.index_type,
+            "dead_count": snap.dead_count,
+            "files": snap.manifest,
+            "uploaded_at": snap.uploaded_at,
+        }, f)
+
+    # Files are never changed once the directory has its final name; CURRENT
+    # moving to it is what makes the generation live, for every process
+    def write_current(path):
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(generation)
+
+    os.rename(tmp_dir, directory)
+    _atomic_write(CURRENT_FILE, write_current)
+    snap.generation = generation
+
+    for number in generation_numbers()[:-INDEX_KEEP_GENERATIONS]:
+        # Unlinked files stay readable by processes that still have them mapped
+        shutil.rmtree(generation_path(f"{number:08d}"), ignore_errors=True)
+
+
+@metrics.timed("load_index", INGEST_STAGE_SECONDS)
+def load_index(generation=None):
+    """Load a persisted generation (default: the current one), or return None if there is nothing usable."""
+    generation = generation or current_generation()
+    if generation is None:
+        return None
+    directory = generation_path(generation)
+    try:
+        with open(os.path.join(directory, MANIFEST_FILE), "r", encoding="utf-8") as f:
+            saved = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    if saved.get("version") != INDEX_FORMAT_VERSION or saved.get("model") != embedder.name:
+        return None
+
+    try:
+        store = ChunkStore.load(directory, saved["chunks"])
+        keywords = KeywordIndex.load(directory, saved["chunks"])
+        with open(os.path.join(directory, ALIVE_FILE), "rb") as f:
+            alive = bytearray(f.read())
+        pairs = np.fromfile(os.path.join(directory, DUPLICATES_FILE), dtype="int64").reshape(-1, 2)
+        duplicate_of = dict(zip(pairs[:, 0].tolist(), pairs[:, 1].tolist()))
+
+        loaded_index = None
+        if os.path.exists(os.path.join(directory, INDEX_FILE)):
+            loaded_index = faiss.read_index(os.path.join(directory, INDEX_FILE), MMAP_FLAG)
+    except (OSError, ValueError, EOFError, RuntimeError):
+        logger.warning("Persisted index in %s is unreadable, rebuilding", directory)
+        return None
+
+    ntotal = loaded_index.ntotal if loaded_index is not None else 0
+    if (ntotal != saved["ntotal"] or len(alive) != saved["chunks"]
+            or ntotal != alive.count(1) + saved["dead_count"]
+            or (len(pairs) and int(pairs.max()) >= saved["chunks"])):
+        logger.warning("Persisted index in %s is inconsistent, rebuilding", directory)
+        return None
+    if loaded_index is not None:
+        configure_search(loaded_index)
+
+    snap = IndexSnapshot(
+        loaded_index,
+        store,
+        alive,
+        saved["files"],
+        mmapped=loaded_index is not None and MMAP_FLAG != faiss.IO_FLAG_MMAP,
+        index_type=saved["index_type"],
+        dead_count=saved["dead_count"],
+        keywords=keywords,
+        uploaded_at=saved["uploaded_at"],
+        duplicate_of=duplicate_of,
+    )
+    snap.generation = generation
+    return snap
+
+
+# ==============================
+# 🔟 FOLLOW OTHER WORKERS
+# ==============================
+_watcher_thread: Optional[threading.Thread] = None
+_watcher_lock = threading.Lock()
+# A generation this process could not load (e.g. written with another embedding model)
+_skipped_generation: Optional[str] = None
+
+
+def refresh_snapshot():
+    """Switch to the current generation if another process published it. Returns True if it did."""
+    global _skipped_generation
+    generation = current_generation()
+    if generation is None or generation in (snapshot.generation, _skipped_generation):
+        return False
+
+    loaded = load_index(generation)
+    if loaded is None:
+        if generation == current_generation():
+            logger.warning("Cannot load index generation %s published by another process", generation)
+            _skipped_generation = generation
+        return False
+    swap(loaded)
+    logger.info("Switched to index generation %s (%d chunks)", generation, loaded.live_count)
+    return True
+
+
+def _watch_generations():
+    while True:
+        time.sleep(INDEX_POLL_SECONDS)
+        # If a writer (here or in another process) holds the lock, its generation is picked up next round
+        if not ingest_lock.acquire(blocking=False):
+            continue
+        try:
+            refresh_snapshot()
+        except Exception:
+            logger.exception("Checking for a new index generation failed")
+        finally:
+            ingest_lock.release()
+
+
+def start_generation_watcher():
+    global _watcher_thread
+    with _watcher_lock:
+        if _watcher_thread is None and INDEX_POLL_SECONDS > 0:
+            _watcher_thread = threading.Thread(target=_watch_generations, name="index-watcher", daemon=True)
+            _watcher_thread.start()
@@ -0,0 +1,211 @@
+"""Embedding backends: the same sentence-transformers model run by PyTorch or ONNX Runtime.
+
+    EMBEDDING_BACKEND=torch          # default, sentence-transformers on PyTorch
+    EMBEDDING_BACKEND=onnx           # ONNX export of the same model on ONNX Runtime
+    EMBEDDING_QUANTIZE=int8          # onnx only: dynamically quantized weights
+    EMBEDDING_THREADS=4              # intra-op threads (0 = library default)
+
+The ONNX backend needs the optional `onnxruntime` package. The model files
+come from the Hugging Face repo (or a local directory with the same layout),
+and the int8 variant is quantized once and kept in ONNX_MODEL_DIR.
+"""
+import json
+import logging
+import os
+import threading
+from typing import List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch").lower()
+EMBEDDING_QUANTIZE = os.getenv("EMBEDDING_QUANTIZE", "").lower() or None
+EMBEDDING_THREADS = int(os.getenv("EMBEDDING_THREADS", "0"))
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "32"))
+ONNX_MODEL_DIR = os.getenv("ONNX_MODEL_DIR", os.path.join("index_data", "onnx"))
+
+BACKENDS = ("torch", "onnx")
+QUANTIZATIONS = (None, "int8")
+
+
+class EmbeddingBackend:
+    """Turns texts into float32 embeddings, one row per text.
+
+    `name` identifies the vectors a backend produces. Embedding caches and
+    persisted indexes are keyed by it, so backends whose outputs are not
+    interchangeable must use different names.
+    """
+
+    name: str
+    dimension: int
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        raise NotImplementedError
+
+
+class SentenceTransformerBackend(EmbeddingBackend):
+    def __init__(self, model_name: str, threads: int = EMBEDDING_THREADS,
+                 batch_size: int = EMBEDDING_BATCH_SIZE):
+        from sentence_transformers import SentenceTransformer
+
+        if threads:
+            import torch
+            torch.set_num_threads(threads)
+        self.model = SentenceTransformer(model_name)
+        self.name = model_name
+        self.dimension = self.model.get_sentence_embedding_dimension()
+        self.batch_size = batch_size
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        return np.asarray(self.model.encode(texts, batch_size=self.batch_size), dtype="float32")
+
+
+class OnnxBackend(EmbeddingBackend):
+    """ONNX Runtime port of a sentence-transformers model: transformer, mean pooling, optional L2 norm."""
+
+    def __init__(self, model_name: str, quantize: Optional[str] = None, threads: int = EMBEDDING_THREADS,
+                 batch_size: int = EMBEDDING_BATCH_SIZE, model_dir: str = ONNX_MODEL_DIR):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        if quantize not in QUANTIZATIONS:
+            raise ValueError(f"EMBEDDING_QUANTIZE must be empty or 'int8', got {quantize!r}")
+        self.model_name = model_name
+        self.batch_size = batch_size
+
+        model_path = self._model_file("onnx/model.onnx")
+        if quantize == "int8":
+            model_path = self._quantized(model_path, model_dir)
+        self.name = backend_name(model_name, quantize)
+
+        config = self._json("sentence_bert_config.json", {})
+        modules = self._json("modules.json", [])
+        self.normalize = any(m.get("type", "").endswith("Normalize") for m in modules)
+
+        self.tokenizer = Tokenizer.from_file(self._model_file("tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=config.get("max_seq_length", 256))
+        if self.tokenizer.padding is None:
+            self.tokenizer.enable_padding()
+
+        options = ort.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+            options.inter_op_num_threads = 1
+        self.session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        outputs = [o.name for o in self.session.get_outputs()]
+        self.output_name = "last_hidden_state" if "last_hidden_state" in outputs else outputs[0]
+        self.dimension = int(self.encode(["dimension probe"]).shape[1])
+
+    def _model_file(self, filename: str) -> str:
+        if os.path.isdir(self.model_name):
+            return os.path.join(self.model_name, filename)
+        from huggingface_hub import hf_hub_download
+
+        repo = self.model_name if "/" in self.model_name else f"sentence-transformers/{self.model_name}"
+        return hf_hub_download(repo, filename)
+
+    def _json(self, filename: str, default):
+        try:
+            with open(self._model_file(filename), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return default
+
+    def _quantized(self, model_path: str, model_dir: str) -> str:
+        """Int8 dynamic quantization of the exported model, done once and reused."""
+        os.makedirs(model_dir, exist_ok=True)
+        safe_name = self.model_name.strip("/").replace("/", "--")
+        target = os.path.join(model_dir, f"{safe_name}-int8.onnx")
+        if not os.path.exists(target):
+            from onnxruntime.quantization import QuantType, quantize_dynamic
+
+            logger.info("Quantizing %s to int8 at %s", model_path, target)
+            tmp_path = target + ".tmp.onnx"
+            quantize_dynamic(model_path, tmp_path, weight_type=QuantType.QInt8)
+            os.replace(tmp_path, target)
+        return target
+
+    def _encode_batch(self, texts: List[str]) -> np.ndarray:
+        encodings = self.tokenizer.encode_batch(texts)
+        mask = np.array([e.attention_mask for e in encodings], dtype="int64")
+        feeds = {
+            "input_ids": np.array([e.ids for e in encodings], dtype="int64"),
+            "attention_mask": mask,
+            "token_type_ids": np.array([e.type_ids for e in encodings], dtype="int64"),
+        }
+        hidden = self.session.run([self.output_name], {k: v for k, v in feeds.items() if k in self.input_names})[0]
+
+        weights = mask[:, :, None].astype("float32")
+        pooled = (hidden * weights).sum(axis=1) / np.clip(weights.sum(axis=1), 1e-9, None)
+        if self.normalize:
+            pooled /= np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+        return pooled.astype("float32")
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        if not texts:
+            return np.empty((0, getattr(self, "dimension", 0)), dtype="float32")
+        # Batching texts of similar length keeps padding (wasted compute) low
+        order = np.argsort([-len(t) for t in texts], kind="stable")
+        result = [None] * len(texts)
+        for start in range(0, len(texts), self.batch_size):
+            batch = order[start:start + self.batch_size]
+            for i, vector in zip(batch, self._encode_batch([texts[i] for i in batch])):
+                result[i] = vector
+        return np.stack(result)
+
+
+def check_config(backend: str, quantize: Optional[str]):
+    if backend not in BACKENDS:
+        raise ValueError(f"EMBEDDING_BACKEND must be one of {BACKENDS}, got {backend!r}")
+    if quantize and backend != "onnx":
+        raise ValueError("EMBEDDING_QUANTIZE is only supported with EMBEDDING_BACKEND=onnx")
+
+
+def create_backend(model_name: str, backend: str = EMBEDDING_BACKEND,
+                   quantize: Optional[str] = EMBEDDING_QUANTIZE, threads: int = EMBEDDING_THREADS) -> EmbeddingBackend:
+    check_config(backend, quantize)
+    if backend == "onnx":
+        return OnnxBackend(model_name, quantize=quantize, threads=threads)
+    return SentenceTransformerBackend(model_name, threads=threads)
+
+
+def backend_name(model_name: str, quantize: Optional[str]) -> str:
+    """The `name` create_backend's backend will have, without loading anything."""
+    return model_name if quantize is None else f"{model_name}:{quantize}"
+
+
+class LazyBackend(EmbeddingBackend):
+    """Defers create_backend (and its torch / ONNX Runtime imports) until the model is first needed.
+
+    `name` is known up front, so caches and persisted indexes can be checked
+    against it without paying for the model.
+    """
+
+    def __init__(self, model_name: str, backend: str = EMBEDDING_BACKEND,
+                 quantize: Optional[str] = EMBEDDING_QUANTIZE, threads: int = EMBEDDING_THREADS):
+        check_config(backend, quantize)
+        self.name = backend_name(model_name, quantize)
+        self._args = (model_name, backend, quantize, threads)
+        self._backend: Optional[EmbeddingBackend] = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._backend is not None
+
+    def load(self) -> EmbeddingBackend:
+        if self._backend is None:
+            with self._lock:
+                if self._backend is None:
+                    logger.info("Loading embedding model %s", self.name)
+                    self._backend = create_backend(*self._args)
+        return self._backend
+
+    @property
+    def dimension(self) -> int:
+        return self.load().dimension
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        return self.load().encode(texts)
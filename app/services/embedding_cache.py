@@ -0,0 +1,103 @@
+import hashlib
+import os
+import sqlite3
+import threading
+from typing import Callable, List, Optional
+
+import numpy as np
+
+from app.services.metrics import EMBEDDING_CACHE_LOOKUPS
+
+# SQLite caps the number of bound parameters per statement
+_LOOKUP_BATCH = 500
+
+
+class EmbeddingCache:
+    """File-backed embedding store keyed by sha256(model name, chunk text).
+
+    Re-indexing identical text is then a lookup instead of a model call.
+    """
+
+    def __init__(self, path: str, model_name: str):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.model_name = model_name
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings (key BLOB PRIMARY KEY, vector BLOB NOT NULL)"
+        )
+
+    def key(self, text: str) -> bytes:
+        return hashlib.sha256(f"{self.model_name}\0{text}".encode("utf-8")).digest()
+
+    def _lookup(self, keys: List[bytes]) -> dict:
+        found = {}
+        for start in range(0, len(keys), _LOOKUP_BATCH):
+            batch = keys[start:start + _LOOKUP_BATCH]
+            placeholders = ",".join("?" * len(batch))
+            rows = self._conn.execute(
+                f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch
+            )
+            for key, vector in rows:
+                found[key] = np.frombuffer(vector, dtype="float32")
+        return found
+
+    def lookup(self, texts: List[str]) -> Optional[np.ndarray]:
+        """Cached embeddings for texts, or None if any is missing; never encodes or counts hits."""
+        keys = [self.key(text) for text in texts]
+        with self._lock:
+            found = self._lookup(list(set(keys)))
+        if len(found) < len(set(keys)):
+            return None
+        if not texts:
+            return np.empty((0, 0), dtype="float32")
+        return np.stack([found[key] for key in keys])
+
+    def encode(self, texts: List[str], encode_fn: Callable[[List[str]], np.ndarray]) -> np.ndarray:
+        """Return float32 embeddings for texts, calling encode_fn only for uncached ones."""
+        keys = [self.key(text) for text in texts]
+        with self._lock:
+            found = self._lookup(list(set(keys)))
+
+        # Duplicate texts within one call are encoded once
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in found and key not in missing:
+                missing[key] = text
+
+        if missing:
+            vectors = np.asarray(encode_fn(list(missing.values())), dtype="float32")
+            new = dict(zip(missing.keys(), vectors))
+            with self._lock:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+                    [(key, vector.tobytes()) for key, vector in new.items()],
+                )
+                self._conn.commit()
+            found.update(new)
+
+        hits = len(texts) - len(missing)
+        with self._lock:
+            self.hits += hits
+            self.misses += len(missing)
+        EMBEDDING_CACHE_LOOKUPS.inc(hits, result="hit")
+        EMBEDDING_CACHE_LOOKUPS.inc(len(missing), result="miss")
+
+        if not texts:
+            return np.empty((0, 0), dtype="float32")
+        return np.stack([found[key] for key in keys])
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            entries = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "entries": entries,
+        }
@@ -0,0 +1,297 @@
+"""Text extraction and chunking, kept free of the embedding model and FAISS.
+
+These functions run inside ingestion worker processes, which import this
+module on their own; keeping it light keeps worker start-up cheap. pdfplumber
+and tiktoken are imported on first use, since the API process imports this
+module for TOKENIZER_ENCODING alone.
+"""
+import os
+import re
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.services.near_duplicates import simhash
+
+# Large PDFs are split into page ranges of this size so one file can use several workers
+PDF_PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", "16"))
+# Tokenizer for chunk sizes; the prompt builder counts with the same one
+TOKENIZER_ENCODING = "cl100k_base"
+# Threads tiktoken encodes a batch of texts with (it releases the GIL)
+TOKENIZER_THREADS = int(os.getenv("TOKENIZER_THREADS", str(min(4, os.cpu_count() or 1))))
+# End chunks at paragraph / sentence breaks rather than wherever the token count runs out
+CHUNK_SNAP = os.getenv("CHUNK_SNAP", "true").lower() in ("1", "true", "yes")
+
+
+# ==============================
+# 1️⃣ LOAD DOCUMENTS
+# ==============================
+def extract_file(path: str, source: str, first_page: int = 1,
+                 last_page: Optional[int] = None) -> Tuple[List[Dict], Optional[int]]:
+    """Extract the text of one file; for PDFs optionally only pages first_page..last_page.
+
+    Returns the docs and, for a PDF, its total page count.
+    """
+    docs = []
+    n_pages = None
+
+    if source.endswith(".txt"):
+        with open(path, "r", encoding="utf-8") as f:
+            text = f.read()
+            docs.append({"text": text, "source": source})
+
+    elif source.endswith(".pdf"):
+        import pdfplumber
+
+        with pdfplumber.open(path) as pdf:
+            n_pages = len(pdf.pages)
+            pages = pdf.pages[first_page - 1:last_page]
+            for i, page in enumerate(pages, start=first_page):
+                text = page.extract_text()
+                if text:
+                    docs.append({
+                        "text": text,
+                        "source": source,
+                        "page": i
+                    })
+    return docs, n_pages
+
+
+def first_task(path: str, source: str) -> tuple:
+    """The (path, source, first_page, last_page) task a file starts with: all of it, or a PDF's first pages."""
+    if source.endswith(".pdf"):
+        return (path, source, 1, PDF_PAGES_PER_TASK)
+    return (path, source, 1, None)
+
+
+def remaining_tasks(task: tuple, n_pages: Optional[int]) -> List[tuple]:
+    """Tasks for the pages after a PDF's first range, once the worker running it has counted them.
+
+    Page counting happens in the workers, so the parent never opens a PDF itself.
+    """
+    path, source, first_page, last_page = task
+    if first_page != 1 or last_page is None or n_pages is None:
+        return []
+    return [
+        (path, source, first, min(first + PDF_PAGES_PER_TASK - 1, n_pages))
+        for first in range(last_page + 1, n_pages + 1, PDF_PAGES_PER_TASK)
+    ]
+
+
+# ==============================
+# 2️⃣ CHUNKING WITH TOKENS
+# ==============================
+class Chunker:
+    """Token-sized, overlapping chunks, returned as character spans of the text.
+
+    Texts are tokenized in one encode_ordinary_batch call across threads (long
+    texts in several pieces), and each token's character offset comes from a
+    table of token byte lengths, so no window is ever decoded. With snap, a chunk
+    ends at the last paragraph or sentence break in its final snap_window share
+    of tokens, and the next one starts at the first sentence inside the overlap
+    (falling back to a word start in both cases).
+    """
+
+    def __init__(self, chunk_size=400, overlap=80, snap=CHUNK_SNAP, snap_window=0.25,
+                 threads=TOKENIZER_THREADS):
+        if not 0 <= overlap < chunk_size:
+            raise ValueError(f"overlap must be in [0, chunk_size), got {overlap}")
+        self.chunk_size = chunk_size
+        self.overlap = overlap
+        self.snap = snap
+        self.snap_window = snap_window
+        self.threads = threads
+        import tiktoken
+
+        self.tokenizer = tiktoken.get_encoding(TOKENIZER_ENCODING)
+        self._token_lengths = token_byte_lengths(self.tokenizer)
+
+    def split_text(self, text: str) -> List[str]:
+        return [text[start:end] for start, end in self.split_spans(text)]
+
+    def split_spans(self, text: str) -> List[Tuple[int, int]]:
+        return self.split_batch([text])[0]
+
+    def split_batch(self, texts: List[str]) -> List[List[Tuple[int, int]]]:
+        """(char_start, char_end) of every chunk of each text."""
+        pieces, owners = [], []
+        for i, text in enumerate(texts):
+            for piece in _tokenizer_segments(text):
+                pieces.append(piece)
+                owners.append(i)
+        encoded = self.tokenizer.encode_ordinary_batch(pieces, num_threads=self.threads) if pieces else []
+
+        tokens: List[List[int]] = [[] for _ in texts]
+        for i, piece_tokens in zip(owners, encoded):
+            tokens[i].extend(piece_tokens)
+        return [self._spans(text, text_tokens) for text, text_tokens in zip(texts, tokens)]
+
+    def _char_offsets(self, text: str, tokens: List[int]) -> np.ndarray:
+        """Character offset where each token starts, followed by len(text)."""
+        lengths = self._token_lengths[np.array(tokens, dtype="int64")]
+        byte_offsets = np.zeros(len(tokens) + 1, dtype="int64")
+        np.cumsum(lengths, out=byte_offsets[1:])
+        data = text.encode("utf-8")
+        if len(data) == len(text):
+            return byte_offsets
+        # Characters starting before each byte; a token that begins inside a
+        # multi-byte character leaves that character to the previous chunk
+        char_starts = (np.frombuffer(data, dtype="uint8") & 0xC0) != 0x80
+        chars_before = np.zeros(len(data) + 1, dtype="int64")
+        np.cumsum(char_starts, out=chars_before[1:])
+        return chars_before[byte_offsets]
+
+    def _spans(self, text: str, tokens: List[int]) -> List[Tuple[int, int]]:
+        n = len(tokens)
+        if not n:
+            return []
+        offsets = self._char_offsets(text, tokens)
+        if self.snap:
+            paragraphs = _break_tokens(_PARAGRAPH_BREAK, text, offsets)
+            breaks = np.union1d(paragraphs, _break_tokens(_SENTENCE_BREAK, text, offsets))
+        window = max(1, int(self.chunk_size * self.snap_window))
+
+        spans = []
+        start = 0
+        while True:
+            end = min(start + self.chunk_size, n)
+            if self.snap and end < n:
+                end = (_last_in(paragraphs, end - window, end) or _last_in(breaks, end - window, end)
+                       or _last_word_start(text, offsets, end - window, end) or end)
+            span = _strip(text, int(offsets[start]), int(offsets[end]))
+            # Small chunk_size / overlap settings can snap two windows to the same span
+            if span and (not spans or span != spans[-1]):
+                spans.append(span)
+            if end == n:
+                return spans
+
+            next_start = end - self.overlap
+            if self.snap and self.overlap:
+                next_start = (_first_in(breaks, next_start, end - 1)
+                              or _first_word_start(text, offsets, next_start, end - 1) or next_start)
+            start = max(next_start, start + 1)
+
+
+def token_byte_lengths(tokenizer) -> np.ndarray:
+    """UTF-8 length of every token id, so offsets need no decoding (ids the vocabulary skips are 0)."""
+    lengths = np.zeros(tokenizer.max_token_value + 1, dtype="int64")
+    for token in range(len(lengths)):
+        try:
+            lengths[token] = len(tokenizer.decode_single_token_bytes(token))
+        except KeyError:
+            pass
+    return lengths
+
+
+# Pre-tokenization never joins a newline to the non-space character after it,
+# so long texts are cut there into pieces that tokenize independently
+TOKENIZE_SEGMENT_CHARS = 64 * 1024
+_SEGMENT_CUT = re.compile(r"\n(?=\S)")
+# Breaks as (end of the previous unit, start of the next one); a token starts
+# somewhere in between, since the gap is whitespace
+_PARAGRAPH_BREAK = re.compile(r"()\n[ \t]*\n\s*")
+_SENTENCE_BREAK = re.compile(r"[.!?][\"')\]\u2019\u201d]*()\s+")
+
+
+def _tokenizer_segments(text: str) -> List[str]:
+    pieces = []
+    start = 0
+    while len(text) - start > TOKENIZE_SEGMENT_CHARS:
+        match = _SEGMENT_CUT.search(text, start + TOKENIZE_SEGMENT_CHARS)
+        if match is None:
+            break
+        pieces.append(text[start:match.end()])
+        start = match.end()
+    pieces.append(text[start:])
+    return pieces
+
+
+def _break_tokens(pattern: re.Pattern, text: str, offsets: np.ndarray) -> np.ndarray:
+    """Sorted indexes of the tokens that start a new paragraph or sentence."""
+    gaps = np.array([(m.start(1), m.end()) for m in pattern.finditer(text)], dtype="int64").reshape(-1, 2)
+    tokens = np.searchsorted(offsets, gaps[:, 0])
+    inside = tokens < len(offsets) - 1
+    tokens, gaps = tokens[inside], gaps[inside]
+    return np.unique(tokens[(tokens > 0) & (offsets[tokens] <= gaps[:, 1])])
+
+
+def _last_in(sorted_tokens: np.ndarray, low: int, high: int) -> Optional[int]:
+    i = np.searchsorted(sorted_tokens, high, side="right") - 1
+    return int(sorted_tokens[i]) if i >= 0 and sorted_tokens[i] >= low else None
+
+
+def _first_in(sorted_tokens: np.ndarray, low: int, high: int) -> Optional[int]:
+    i = np.searchsorted(sorted_tokens, low)
+    return int(sorted_tokens[i]) if i < len(sorted_tokens) and sorted_tokens[i] <= high else None
+
+
+def _starts_word(text: str, offsets: np.ndarray, token: int) -> bool:
+    offset = int(offsets[token])
+    # A token inside the first or last multi-byte character sits at the edge of the text
+    if offset <= 0 or offset >= len(text):
+        return True
+    return text[offset].isspace() or text[offset - 1].isspace()
+
+
+def _last_word_start(text: str, offsets: np.ndarray, low: int, high: int) -> Optional[int]:
+    """Last token in [low, high] that starts a word, for texts with no nearby sentence break."""
+    for token in range(high, max(low, 1) - 1, -1):
+        if _starts_word(text, offsets, token):
+            return token
+    return None
+
+
+def _first_word_start(text: str, offsets: np.ndarray, low: int, high: int) -> Optional[int]:
+    for token in range(max(low, 1), high + 1):
+        if _starts_word(text, offsets, token):
+            return token
+    return None
+
+
+def _strip(text: str, start: int, end: int) -> Optional[Tuple[int, int]]:
+    """(start, end) narrowed past surrounding whitespace, or None if nothing else is left."""
+    while start < end and text[start].isspace():
+        start += 1
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    return (start, end) if start < end else None
+
+
+# ==============================
+# 3️⃣ CREATE CHUNKS FROM DOCS
+# ==============================
+def chunk_docs(docs, chunker=None):
+    """Chunk dicts with the character span ("char_start", "char_end") of each chunk in its doc's text.
+
+    Each also carries its SimHash "fingerprint", computed here so ingestion
+    workers share the hashing.
+    """
+    chunker = chunker or Chunker()
+    chunks = []
+
+    for doc, spans in zip(docs, chunker.split_batch([doc["text"] for doc in docs])):
+        for start, end in spans:
+            text = doc["text"][start:end]
+            chunks.append({
+                "text": text,
+                "source": doc["source"],
+                "page": doc.get("page", None),
+                "char_start": start,
+                "char_end": end,
+                "fingerprint": simhash(text),
+            })
+    return chunks
+
+
+# One tokenizer per process, reused across tasks
+_chunker: Optional[Chunker] = None
+
+
+def extract_and_chunk(path: str, source: str, first_page: int = 1,
+                      last_page: Optional[int] = None) -> Tuple[List[Dict], Optional[int]]:
+    """Worker task: extract one file (or page range); returns its chunks and, for a PDF, its page count."""
+    global _chunker
+    if _chunker is None:
+        _chunker = Chunker()
+    docs, n_pages = extract_file(path, source, first_page, last_page)
+    return chunk_docs(docs, _chunker), n_pages
@@ -0,0 +1,113 @@
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# How long the worker waits for more uploads before applying a batch
+COALESCE_SECONDS = float(os.getenv("INGEST_COALESCE_MS", "200")) / 1000
+MAX_BATCH = int(os.getenv("INGEST_MAX_BATCH", "64"))
+# Finished jobs kept around for the status endpoint
+MAX_TRACKED_JOBS = 1000
+
+_queue: "queue.Queue[str]" = queue.Queue()
+_jobs: "OrderedDict[str, Dict]" = OrderedDict()
+_jobs_lock = threading.Lock()
+_worker_thread: Optional[threading.Thread] = None
+
+
+def submit(filename: str) -> str:
+    """Queue a file for indexing and return its job id."""
+    job_id = uuid.uuid4().hex
+    with _jobs_lock:
+        _jobs[job_id] = {
+            "job_id": job_id,
+            "filename": filename,
+            "status": "queued",
+            "submitted_at": time.time(),
+            "finished_at": None,
+            "changed": None,
+            "error": None,
+        }
+        while len(_jobs) > MAX_TRACKED_JOBS:
+            oldest_id, oldest = next(iter(_jobs.items()))
+            if oldest["status"] in ("queued", "running"):
+                break
+            _jobs.pop(oldest_id)
+
+    _ensure_worker()
+    _queue.put(job_id)
+    return job_id
+
+
+def get_job(job_id: str) -> Optional[Dict]:
+    with _jobs_lock:
+        job = _jobs.get(job_id)
+        return dict(job) if job else None
+
+
+def _update(job_ids, **fields):
+    with _jobs_lock:
+        for job_id in job_ids:
+            if job_id in _jobs:
+                _jobs[job_id].update(fields)
+
+
+def _next_batch():
+    """Block for one job, then gather whatever else arrives within the coalescing window."""
+    batch = [_queue.get()]
+    deadline = time.monotonic() + COALESCE_SECONDS
+    while len(batch) < MAX_BATCH:
+        try:
+            batch.append(_queue.get(timeout=max(deadline - time.monotonic(), 0.001)))
+        except queue.Empty:
+            break
+    return batch
+
+
+def _worker():
+    # Imported here so that importing the API doesn't load FAISS and the extraction stack
+    from app.services import doc_service
+
+    while True:
+        batch = _next_batch()
+        with _jobs_lock:
+            filenames = [_jobs[job_id]["filename"] for job_id in batch if job_id in _jobs]
+        _update(batch, status="running")
+
+        try:
+            # Uploads can arrive before the startup warm-up has loaded the index
+            doc_service.ensure_doc_system()
+            # One snapshot swap for the whole burst, however many files it holds
+            update = doc_service.index_files(filenames)
+        except Exception as e:
+            logger.exception("Ingestion of %d file(s) failed", len(filenames))
+            _update(batch, status="failed", error=str(e), finished_at=time.time())
+        else:
+            # A file that could not be extracted fails only its own jobs
+            with _jobs_lock:
+                for job_id in batch:
+                    job = _jobs.get(job_id)
+                    if job is None:
+                        continue
+                    error = update.failed.get(job["filename"])
+                    if error is not None:
+                        job.update(status="failed", error=error, finished_at=time.time())
+                    else:
+                        job.update(status="done", changed=job["filename"] in update.changed,
+                                   finished_at=time.time())
+
+
+def _ensure_worker():
+    # A single writer is enough: index updates are serialized by doc_service anyway
+    global _worker_thread
+    with _jobs_lock:
+        if _worker_thread is None:
+            _worker_thread = threading.Thread(target=_worker, name="ingest-worker", daemon=True)
+            _worker_thread.start()
+
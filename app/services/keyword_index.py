@@ -0,0 +1,238 @@
+import math
+import mmap
+import os
+import re
+from array import array
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.services.mapped_column import MappedColumn
+
+# Saved terms as one sorted UTF-8 buffer, and where each term starts in it
+TERMS_FILE = "keyword_terms.bin"
+TERM_OFFSETS_FILE = "keyword_term_offsets.npy"
+# Every term's postings back to back, and where each term's run starts
+POSTING_OFFSETS_FILE = "keyword_posting_offsets.npy"
+POSTING_IDS_FILE = "keyword_posting_ids.npy"
+POSTING_TFS_FILE = "keyword_posting_tfs.npy"
+DOC_LENGTHS_FILE = "keyword_doc_lengths.npy"
+
+# BM25 parameters (the usual defaults)
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+STOP_WORDS = {
+    'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to',
+    'for', 'of', 'with', 'by', 'as', 'is', 'are', 'was', 'were',
+    'be', 'been', 'being', 'have', 'has', 'had', 'do', 'does',
+    'did', 'will', 'would', 'shall', 'should', 'may', 'might',
+    'must', 'can', 'could', 'i', 'you', 'we', 'they', 'he', 'she',
+    'it', 'my', 'your', 'our', 'their', 'this', 'that', 'these',
+    'those', 'what', 'which', 'who', 'whom', 'whose', 'how', 'why',
+    'when', 'where'
+}
+
+# Words, plus identifiers joined by - _ . / (part numbers, versions, file names)
+_TOKEN_RE = re.compile(r"[^\W_]+(?:[-_./][^\W_]+)*")
+_PART_RE = re.compile(r"[^\W_]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lower-cased terms; an identifier like "XR-200" yields "xr-200", "xr" and "200"."""
+    terms = []
+    for match in _TOKEN_RE.finditer(text.lower()):
+        token = match.group()
+        if token in STOP_WORDS:
+            continue
+        terms.append(token)
+        if not token.isalnum():
+            terms.extend(part for part in _PART_RE.findall(token) if part not in STOP_WORDS)
+    return terms
+
+
+class KeywordIndex:
+    """Append-only BM25 inverted index whose row ids match the ChunkStore's.
+
+    Like the ChunkStore it is shared by every snapshot over the same store;
+    which rows count is decided at query time by the snapshot's alive flags.
+    A query only reads the postings of its own terms. A loaded index
+    memory-maps its saved postings read-only and finds a term by binary
+    search over the sorted term table; rows added after loading go to
+    in-memory postings.
+    """
+
+    def __init__(self):
+        # Saved postings: term i is _terms[_term_offsets[i]:_term_offsets[i + 1]], and its
+        # chunk ids and term frequencies are _ids/_tfs[_posting_offsets[i]:_posting_offsets[i + 1]]
+        self._terms = b""
+        self._term_offsets = np.zeros(1, dtype="int64")
+        self._posting_offsets = np.zeros(1, dtype="int64")
+        self._ids = np.empty(0, dtype="int32")
+        self._tfs = np.empty(0, dtype="int32")
+        # term -> (chunk ids, term frequencies, document lengths) of rows added since loading,
+        # ids ascending. Lengths are repeated per posting so scoring never copies a corpus-sized array
+        self.postings: Dict[str, Tuple[array, array, array]] = {}
+        self.doc_lengths = MappedColumn("i")
+
+    def __len__(self):
+        return len(self.doc_lengths)
+
+    def add(self, text: str) -> int:
+        """Index one chunk and return its row id. Only the single ingestion writer may call this."""
+        terms = tokenize(text)
+        row = len(self.doc_lengths)
+        self.doc_lengths.append(len(terms))
+        for term, tf in Counter(terms).items():
+            posting = self.postings.get(term)
+            if posting is None:
+                posting = self.postings[term] = (array("i"), array("i"), array("i"))
+            # The id goes in last, so a concurrent reader never sees a posting without its values
+            posting[2].append(len(terms))
+            posting[1].append(tf)
+            posting[0].append(row)
+        return row
+
+    def _saved_term(self, term: str) -> Optional[int]:
+        """Position of term in the saved term table, if it is there."""
+        key = term.encode("utf-8")
+        offsets = self._term_offsets
+        lo, hi = 0, len(offsets) - 1
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._terms[offsets[mid]:offsets[mid + 1]] < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < len(offsets) - 1 and self._terms[offsets[lo]:offsets[lo + 1]] == key:
+            return lo
+        return None
+
+    def _posting(self, term: str) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """(chunk ids, term frequencies, document lengths) of term, saved rows first."""
+        ids_parts, tf_parts, length_parts = [], [], []
+        saved = self._saved_term(term)
+        if saved is not None:
+            start, end = self._posting_offsets[saved], self._posting_offsets[saved + 1]
+            ids = self._ids[start:end]
+            ids_parts.append(ids)
+            tf_parts.append(self._tfs[start:end])
+            length_parts.append(self.doc_lengths.base[ids])
+        posting = self.postings.get(term)
+        if posting is not None:
+            ids = np.array(posting[0], dtype="int32")
+            ids_parts.append(ids)
+            tf_parts.append(np.array(posting[1], dtype="int32")[:len(ids)])
+            length_parts.append(np.array(posting[2], dtype="int32")[:len(ids)])
+        if not ids_parts:
+            return np.empty(0, dtype="int64"), np.empty(0, dtype="float32"), np.empty(0, dtype="float32")
+        return (np.concatenate(ids_parts).astype("int64"), np.concatenate(tf_parts).astype("float32"),
+                np.concatenate(length_parts).astype("float32"))
+
+    def search(self, query: str, alive, live_count: int, live_tokens: int, top_k: int,
+               allowed_ids: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Top-k (ids, BM25 scores) among rows flagged in alive, best first.
+
+        With allowed_ids (sorted live row ids), only those rows are scored:
+        each posting list is intersected with them instead of checked against
+        alive. live_count and live_tokens are corpus-wide statistics, so
+        scores don't change when the search is narrowed to a filtered subset.
+        """
+        if not live_count:
+            return np.empty(0, dtype="int64"), np.empty(0, dtype="float32")
+
+        # Published snapshots never resize their alive flags, so a zero-copy view is safe
+        alive_flags = np.frombuffer(alive, dtype="uint8")
+        avg_length = live_tokens / live_count
+        ids_parts, score_parts = [], []
+
+        for term in set(tokenize(query)):
+            ids, tfs, lengths = self._posting(term)
+            if allowed_ids is not None:
+                found = np.searchsorted(allowed_ids, ids)
+                keep = found < len(allowed_ids)
+                keep[keep] = allowed_ids[found[keep]] == ids[keep]
+            else:
+                keep = ids < len(alive_flags)
+                keep[keep] = alive_flags[ids[keep]] == 1
+            ids, tfs, lengths = ids[keep], tfs[keep], lengths[keep]
+            if not len(ids):
+                continue
+
+            df = len(ids)
+            idf = math.log(1 + (live_count - df + 0.5) / (df + 0.5))
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths / avg_length)
+            ids_parts.append(ids)
+            score_parts.append(idf * tfs * (BM25_K1 + 1) / (tfs + norm))
+
+        if not ids_parts:
+            return np.empty(0, dtype="int64"), np.empty(0, dtype="float32")
+
+        ids, inverse = np.unique(np.concatenate(ids_parts), return_inverse=True)
+        scores = np.bincount(inverse, weights=np.concatenate(score_parts)).astype("float32")
+        if len(ids) > top_k:
+            best = np.argpartition(-scores, top_k)[:top_k]
+            ids, scores = ids[best], scores[best]
+        order = np.argsort(-scores, kind="stable")
+        return ids[order], scores[order]
+
+    def tokens_in(self, ids) -> int:
+        """Total indexed terms over the given rows (the BM25 document lengths)."""
+        return int(self.doc_lengths.take(np.asarray(ids, dtype="int64")).sum(dtype="int64"))
+
+    # ==============================
+    # Persistence
+    # ==============================
+    def save(self, directory: str, n_rows: int):
+        """Write postings for the first n_rows rows."""
+        offsets = self._term_offsets.tolist()
+        saved = bytes(self._terms)
+        saved = {saved[a:b].decode("utf-8"): i for i, (a, b) in enumerate(zip(offsets, offsets[1:]))}
+
+        terms, term_offsets, posting_offsets, id_parts, tf_parts = [], [0], [0], [], []
+        for term in sorted(saved.keys() | self.postings.keys()):
+            ids, tfs, _ = self._posting(term)
+            keep = ids < n_rows
+            if not keep.any():
+                continue
+            data = term.encode("utf-8")
+            terms.append(data)
+            term_offsets.append(term_offsets[-1] + len(data))
+            id_parts.append(ids[keep].astype("int32"))
+            tf_parts.append(tfs[keep].astype("int32"))
+            posting_offsets.append(posting_offsets[-1] + int(keep.sum()))
+
+        with open(os.path.join(directory, TERMS_FILE), "wb") as f:
+            f.write(b"".join(terms))
+        for name, values in ((TERM_OFFSETS_FILE, np.array(term_offsets, dtype="int64")),
+                             (POSTING_OFFSETS_FILE, np.array(posting_offsets, dtype="int64")),
+                             (POSTING_IDS_FILE, np.concatenate(id_parts) if id_parts else np.empty(0, dtype="int32")),
+                             (POSTING_TFS_FILE, np.concatenate(tf_parts) if tf_parts else np.empty(0, dtype="int32"))):
+            np.save(os.path.join(directory, name), values)
+        self.doc_lengths.save(os.path.join(directory, DOC_LENGTHS_FILE), n_rows)
+
+    @classmethod
+    def load(cls, directory: str, n_rows: int) -> "KeywordIndex":
+        keywords = cls()
+        keywords.doc_lengths = MappedColumn.load(os.path.join(directory, DOC_LENGTHS_FILE), "i", n_rows)
+        keywords._term_offsets = np.load(os.path.join(directory, TERM_OFFSETS_FILE), mmap_mode="r")
+        keywords._posting_offsets = np.load(os.path.join(directory, POSTING_OFFSETS_FILE), mmap_mode="r")
+        terms_path = os.path.join(directory, TERMS_FILE)
+        if (not len(keywords._term_offsets) or len(keywords._term_offsets) != len(keywords._posting_offsets)
+                or keywords._term_offsets[-1] != os.path.getsize(terms_path)):
+            raise ValueError(f"Keyword index in {directory} does not match its term table")
+        n_postings = int(keywords._posting_offsets[-1])
+        keywords._ids = MappedColumn.load(os.path.join(directory, POSTING_IDS_FILE), "i", n_postings).base
+        keywords._tfs = MappedColumn.load(os.path.join(directory, POSTING_TFS_FILE), "i", n_postings).base
+        if keywords._term_offsets[-1]:
+            with open(terms_path, "rb") as f:
+                keywords._terms = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return keywords
+
+    @classmethod
+    def from_texts(cls, texts) -> "KeywordIndex":
+        keywords = cls()
+        for text in texts:
+            keywords.add(text)
+        return keywords
@@ -0,0 +1,68 @@
+import os
+from array import array
+from typing import Optional
+
+import numpy as np
+
+
+class MappedColumn:
+    """An append-only typed column: a read-only, memory-mapped base plus an in-memory tail.
+
+    A loaded column maps its .npy file with np.load(mmap_mode="r"), so every
+    worker process shares the same page-cache copy instead of building its own;
+    values appended after loading go to an in-memory array.
+    """
+
+    def __init__(self, typecode: str, base: Optional[np.ndarray] = None, values=()):
+        self.tail = array(typecode, values)
+        self.base = base if base is not None else np.empty(0, dtype=typecode)
+        self._base_len = len(self.base)
+        # Appends go straight to the tail, without a wrapper call per value
+        self.append = self.tail.append
+        self.extend = self.tail.extend
+
+    def __len__(self):
+        return self._base_len + len(self.tail)
+
+    def __getitem__(self, i: int) -> int:
+        if i < 0:
+            i += len(self)
+        if i < self._base_len:
+            return int(self.base[i])
+        return self.tail[i - self._base_len]
+
+    @property
+    def itemsize(self) -> int:
+        return self.tail.itemsize
+
+    def slice(self, start: int, end: int) -> np.ndarray:
+        """Values [start, end) as an array; a read-only view of the map when they are all in the base."""
+        base = self.base[min(start, self._base_len):min(end, self._base_len)]
+        if end <= self._base_len:
+            return base
+        tail = np.array(self.tail[max(start - self._base_len, 0):end - self._base_len], dtype=self.base.dtype)
+        return np.concatenate((base, tail)) if len(base) else tail
+
+    def take(self, ids: np.ndarray) -> np.ndarray:
+        """Values at the given row ids."""
+        values = np.empty(len(ids), dtype=self.base.dtype)
+        in_base = ids < self._base_len
+        values[in_base] = self.base[ids[in_base]]
+        if not in_base.all():
+            tail_ids = ids[~in_base] - self._base_len
+            if len(tail_ids) > len(self.tail) // 8:
+                values[~in_base] = np.array(self.tail, dtype=self.base.dtype)[tail_ids]
+            else:
+                values[~in_base] = [self.tail[i] for i in tail_ids.tolist()]
+        return values
+
+    def save(self, path: str, n: int):
+        """Write the first n values as a .npy file."""
+        np.save(path, self.slice(0, n))
+
+    @classmethod
+    def load(cls, path: str, typecode: str, count: int) -> "MappedColumn":
+        base = np.load(path, mmap_mode="r")
+        if base.dtype != np.dtype(typecode) or base.shape != (count,):
+            raise ValueError(f"{os.path.basename(path)} does not hold {count} {np.dtype(typecode)} values")
+        return cls(typecode, base)
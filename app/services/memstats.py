@@ -0,0 +1,42 @@
+"""Process memory readings: ingestion high-water marks and the resident-memory gauge on /metrics."""
+import resource
+import sys
+
+
+def _status_kb(field):
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def current_rss_mb():
+    kb = _status_kb("VmRSS")
+    return kb / 1024 if kb is not None else None
+
+
+def peak_rss_mb():
+    kb = _status_kb("VmHWM")
+    if kb is None:
+        # ru_maxrss is bytes on macOS, kilobytes elsewhere
+        kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        if sys.platform == "darwin":
+            kb //= 1024
+    return kb / 1024
+
+
+def reset_peak_rss():
+    """Reset the kernel's peak-RSS counter so the next reading covers only what follows.
+
+    Linux only; returns False where unsupported, in which case the peak is process-lifetime.
+    """
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
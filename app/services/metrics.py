@@ -0,0 +1,246 @@
+"""In-process counters, gauges and histograms, rendered in the Prometheus text format for GET /metrics.
+
+Kept dependency-free and cheap: recording a value is a perf_counter call and
+one short lock. `stage()` times a block into a histogram and, while a request
+has timing enabled (METRICS_TIMING_HEADER), also into that request's
+Server-Timing header. Values are per process; with several uvicorn workers,
+each worker reports its own.
+"""
+import contextvars
+import functools
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Sequence
+
+from app.services import memstats
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+INGEST_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 300, 900, 3600)
+TOKEN_BUCKETS = (0, 50, 100, 200, 400, 800, 1600, 3200, 6400)
+
+_registry: List["Metric"] = []
+# Called before each render to refresh values that are read rather than recorded
+_collectors: List[Callable[[], None]] = []
+
+# Per-request stage totals, set by the HTTP middleware only when the timing header is on
+_request_timings: contextvars.ContextVar[Optional[Dict[str, float]]] = contextvars.ContextVar(
+    "request_timings", default=None)
+
+
+def _format(value: float) -> str:
+    if isinstance(value, int):
+        return str(value)
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: Dict[tuple, object] = {}
+        _registry.append(self)
+
+    def _key(self, labels: Dict[str, object]) -> tuple:
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"{self.name} takes labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _labels(self, key: tuple, extra=()) -> str:
+        pairs = list(zip(self.labelnames, key)) + list(extra)
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}", *self.samples()]
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        return [f"{self.name}{self._labels(key)} {_format(value)}" for key, value in values]
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def samples(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        return [f"{self.name}{self._labels(key)} {_format(value)}" for key, value in values]
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        # Linear scan: a dozen buckets is cheaper than bisect's call overhead
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                break
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                # [per-bucket counts, sum, count]
+                entry = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            entry[0][i] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def samples(self):
+        with self._lock:
+            values = sorted((key, (list(counts), total, count))
+                            for key, (counts, total, count) in self._values.items())
+        lines = []
+        for key, (counts, total, count) in values:
+            cumulative = 0
+            for bound, n in zip(self.buckets, counts):
+                cumulative += n
+                lines.append(f"{self.name}_bucket{self._labels(key, [('le', _format(bound))])} {cumulative}")
+            lines.append(f"{self.name}_sum{self._labels(key)} {_format(total)}")
+            lines.append(f"{self.name}_count{self._labels(key)} {count}")
+        return lines
+
+
+def collector(func: Callable[[], None]) -> Callable[[], None]:
+    """Decorator: run func before every render, to set gauges from state read on demand."""
+    _collectors.append(func)
+    return func
+
+
+def render() -> str:
+    for func in list(_collectors):
+        func()
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# ==============================
+# Metrics the app records
+# ==============================
+HTTP_REQUEST_SECONDS = Histogram(
+    "assistant_http_request_duration_seconds", "HTTP request latency until the response starts.",
+    ["method", "route", "status"])
+STAGE_SECONDS = Histogram(
+    "assistant_stage_duration_seconds", "Time spent in one stage of the chat / ask-doc pipeline.", ["stage"])
+INGEST_STAGE_SECONDS = Histogram(
+    "assistant_ingest_stage_duration_seconds", "Time spent in one stage of document ingestion.", ["stage"],
+    buckets=INGEST_BUCKETS)
+LLM_TOKENS = Counter(
+    "assistant_llm_tokens_total", "Tokens billed by the LLM API, as reported in its usage field.", ["kind"])
+INGESTED_CHUNKS = Counter(
+    "assistant_ingested_chunks_total", "Chunks extracted by ingestion, by whether they were indexed or collapsed.",
+    ["outcome"])
+CONTEXT_TOKENS = Counter(
+    "assistant_context_tokens_total",
+    "Retrieved-context tokens of /ask-doc queries: the plain top-k (top_k) and what selection kept (selected).",
+    ["kind"])
+CONTEXT_TOKENS_SAVED = Histogram(
+    "assistant_context_tokens_saved", "Context tokens per query removed by span merging and MMR.",
+    buckets=TOKEN_BUCKETS)
+INDEX_CHUNKS = Gauge("assistant_index_chunks", "Chunks served by the live index snapshot.")
+INDEX_VECTORS = Gauge("assistant_index_vectors", "Vectors in the live FAISS index, removed-but-kept ones included.")
+INDEX_FILES = Gauge("assistant_index_files", "Documents in the live index snapshot.")
+INDEX_DUPLICATES = Gauge(
+    "assistant_index_duplicate_chunks", "Near-duplicate chunks collapsed into a served chunk instead of embedded.")
+INDEX_BYTES = Gauge("assistant_index_bytes", "On-disk size of the live index generation.")
+CHUNK_STORE_BYTES = Gauge("assistant_chunk_store_bytes", "Chunk text and metadata columns held by the chunk store.")
+EMBEDDING_CACHE_LOOKUPS = Counter(
+    "assistant_embedding_cache_lookups_total", "Chunk embeddings looked up in the embedding cache, by result.",
+    ["result"])
+EMBEDDING_CACHE_ENTRIES = Gauge("assistant_embedding_cache_entries", "Embeddings stored in the embedding cache.")
+EMBEDDING_MODEL_LOADED = Gauge("assistant_embedding_model_loaded", "1 once the embedding model is loaded.")
+CHAT_CACHE_LOOKUPS = Counter(
+    "assistant_conversation_cache_lookups_total",
+    "Recent-chat lookups in the conversation cache: hit, miss, or stale (another worker wrote since).",
+    ["result"])
+CHAT_CACHE_USERS = Gauge("assistant_conversation_cache_users", "Users whose recent chats are cached.")
+CHAT_CACHE_TURNS = Gauge("assistant_conversation_cache_turns", "Chats held by the conversation cache.")
+PROCESS_RSS_BYTES = Gauge("assistant_process_resident_memory_bytes", "Resident memory of this process.")
+
+
+@collector
+def _process_memory():
+    rss_mb = memstats.current_rss_mb()
+    if rss_mb is not None:
+        PROCESS_RSS_BYTES.set(int(rss_mb * 1024 * 1024))
+
+
+# ==============================
+# Stage timing
+# ==============================
+@contextmanager
+def stage(name: str, histogram: Histogram = STAGE_SECONDS):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - start, histogram)
+
+
+def record(name: str, seconds: float, histogram: Histogram = STAGE_SECONDS):
+    histogram.observe(seconds, stage=name)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings[name] = timings.get(name, 0.0) + seconds
+
+
+def timed(name: str, histogram: Histogram = STAGE_SECONDS):
+    """Decorator form of stage() for plain functions."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage(name, histogram):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def start_request_timing() -> Dict[str, float]:
+    """Collect stage() timings of the current request (and threads it hands work to) into a dict."""
+    timings: Dict[str, float] = {}
+    _request_timings.set(timings)
+    return timings
+
+
+def server_timing(timings: Dict[str, float], total: float) -> str:
+    """Server-Timing header value (durations in ms), which browser dev tools display per request."""
+    parts = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in timings.items()]
+    parts.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(parts)
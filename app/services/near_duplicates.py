@@ -0,0 +1,89 @@
+"""Near-duplicate chunk detection: 64-bit SimHash fingerprints and a banded LSH index.
+
+A fingerprint is the SimHash of a chunk's word 3-shingles, so re-wrapped or
+lightly edited copies of a text land a few bits apart while unrelated texts
+over the same vocabulary do not. NearDuplicateIndex cuts fingerprints into
+NEAR_DUPLICATE_DISTANCE + 1 bands: by pigeonhole, two fingerprints within that
+Hamming distance agree on at least one band, so looking up each band's bucket
+finds every near-duplicate without comparing against the whole corpus.
+"""
+import hashlib
+import os
+import re
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+# Largest Hamming distance (of 64 bits) at which two chunks count as copies; negative disables dedup
+NEAR_DUPLICATE_DISTANCE = int(os.getenv("NEAR_DUPLICATE_DISTANCE", "3"))
+SHINGLE_WORDS = 3
+
+_WORD_RE = re.compile(r"\w+")
+
+
+@lru_cache(maxsize=1 << 16)
+def _word_hash(word: str) -> int:
+    # Stable across processes and restarts, unlike hash(); fingerprints are persisted
+    return int.from_bytes(hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def _rotate_left(values: np.ndarray, bits: int) -> np.ndarray:
+    return (values << np.uint64(bits)) | (values >> np.uint64(64 - bits))
+
+
+def simhash(text: str) -> int:
+    words = _WORD_RE.findall(text.lower())
+    if not words:
+        return 0
+    hashes = np.fromiter(map(_word_hash, words), dtype="uint64", count=len(words))
+    if len(hashes) > SHINGLE_WORDS:
+        # A shingle's hash XORs its words' hashes, each rotated by its position in the shingle
+        n = len(hashes) - SHINGLE_WORDS + 1
+        shingles = hashes[:n].copy()
+        for i in range(1, SHINGLE_WORDS):
+            shingles = _rotate_left(shingles, 1) ^ hashes[i:i + n]
+        hashes = shingles
+    # Each bit is set when most shingle hashes have it set
+    bits = np.unpackbits(hashes.astype("<u8").view("uint8"), bitorder="little").reshape(-1, 64)
+    majority = 2 * bits.sum(axis=0, dtype="int64") > len(hashes)
+    return int(np.packbits(majority, bitorder="little").view("<u8")[0])
+
+
+class NearDuplicateIndex:
+    """Append-only LSH index over the fingerprint column of a ChunkStore.
+
+    Rows are never removed; find() takes an `accept` predicate so each
+    IndexSnapshot only matches the rows it still serves.
+    """
+
+    def __init__(self, fingerprints, max_distance: int = NEAR_DUPLICATE_DISTANCE):
+        self.fingerprints = fingerprints
+        self.max_distance = max_distance
+        n_bands = max_distance + 1
+        width = -(-64 // n_bands)
+        self._bands = [(shift, (1 << min(width, 64 - shift)) - 1) for shift in range(0, 64, width)]
+        self._buckets: List[Dict[int, List[int]]] = [{} for _ in self._bands]
+        self.rows = 0
+
+    def catch_up(self):
+        """Index the rows appended to the fingerprint column since the last call."""
+        for row in range(self.rows, len(self.fingerprints)):
+            self.add(row, self.fingerprints[row])
+
+    def add(self, row: int, fingerprint: int):
+        for buckets, (shift, mask) in zip(self._buckets, self._bands):
+            buckets.setdefault((fingerprint >> shift) & mask, []).append(row)
+        self.rows = max(self.rows, row + 1)
+
+    def find(self, fingerprint: int, accept: Callable[[int], bool]) -> Optional[int]:
+        """The earliest accepted row within max_distance of fingerprint, if any."""
+        best = None
+        for buckets, (shift, mask) in zip(self._buckets, self._bands):
+            for row in buckets.get((fingerprint >> shift) & mask, ()):
+                if best is not None and row >= best:
+                    break
+                if bin(fingerprint ^ self.fingerprints[row]).count("1") <= self.max_distance and accept(row):
+                    best = row
+                    break
+        return best
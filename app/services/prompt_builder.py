@@ -0,0 +1,129 @@
+"""Assemble chat prompts that fit a token budget.
+
+The system prompt and the new question are always sent. For /ask-doc the
+retrieved chunks are added in rank order, up to a share of the budget, and
+chunks that don't fit are dropped. History fills what is left, newest turn
+first. The first turn that doesn't fit whole is truncated and everything
+older is dropped.
+"""
+import logging
+import os
+from functools import lru_cache
+from typing import Dict, List, Tuple
+
+from app.services.extraction import TOKENIZER_ENCODING
+
+logger = logging.getLogger(__name__)
+
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "6000"))
+# Share of the budget (after the fixed parts) that retrieved context may use when there is history
+PROMPT_CONTEXT_SHARE = float(os.getenv("PROMPT_CONTEXT_SHARE", "0.6"))
+# Below this many tokens a truncated turn is not worth sending
+MIN_COMPRESSED_TURN_TOKENS = 48
+# Role and separator tokens the chat format adds around each message
+TOKENS_PER_MESSAGE = 4
+ELLIPSIS = " …"
+
+CHAT_SYSTEM_PROMPT = "You are a helpful support assistant."
+DOC_SYSTEM_PROMPT = "Answer ONLY using the provided context. If not found, say you don't know."
+CONTEXT_HEADER = "CONTEXT:\n"
+CONTEXT_SEPARATOR = "\n\n"
+
+
+@lru_cache(maxsize=None)
+def encoding():
+    """The tokenizer, imported and loaded on first use (loading may download the BPE ranks)."""
+    import tiktoken
+
+    return tiktoken.get_encoding(TOKENIZER_ENCODING)
+
+
+@lru_cache(maxsize=65536)
+def count_tokens(text: str) -> int:
+    """Token count of text; stored turns and chunks repeat across requests, so counts are cached."""
+    return len(encoding().encode(text, disallowed_special=()))
+
+
+def message_tokens(content: str) -> int:
+    return count_tokens(content) + TOKENS_PER_MESSAGE
+
+
+def truncate(text: str, max_tokens: int) -> str:
+    if count_tokens(text) <= max_tokens:
+        return text
+    tokens = encoding().encode(text, disallowed_special=())
+    return encoding().decode(tokens[:max(0, max_tokens - count_tokens(ELLIPSIS))]) + ELLIPSIS
+
+
+def fit_history(previous_chats, budget: int) -> Tuple[List[Dict], int]:
+    """History messages (oldest first) for the newest turns that fit in budget, and tokens used."""
+    turns = []
+    used = 0
+
+    for chat in previous_chats:   # newest first
+        cost = message_tokens(chat.message) + message_tokens(chat.reply)
+        if used + cost <= budget:
+            turns.append((chat.message, chat.reply))
+            used += cost
+            continue
+
+        room = budget - used - 2 * TOKENS_PER_MESSAGE
+        if room >= MIN_COMPRESSED_TURN_TOKENS:
+            # Keep the gist of the oldest turn that still partly fits: the question first, then the answer
+            question = truncate(chat.message, room // 2)
+            answer = truncate(chat.reply, room - count_tokens(question))
+            turns.append((question, answer))
+            used += message_tokens(question) + message_tokens(answer)
+        break
+
+    messages = []
+    for question, answer in reversed(turns):
+        messages.append({"role": "user", "content": question})
+        messages.append({"role": "assistant", "content": answer})
+    return messages, used
+
+
+def fit_context(chunks: List[Dict], budget: int) -> Tuple[List[Dict], int]:
+    """The highest-ranked chunks that fit in budget, in rank order, and tokens used."""
+    kept = []
+    used = 0
+    separator = count_tokens(CONTEXT_SEPARATOR)
+
+    for chunk in chunks:
+        cost = count_tokens(chunk["text"]) + separator
+        if used + cost <= budget:
+            kept.append(chunk)
+            used += cost
+    return kept, used
+
+
+def build_chat_messages(previous_chats, message: str, budget: int = PROMPT_TOKEN_BUDGET) -> List[Dict]:
+    remaining = budget - message_tokens(CHAT_SYSTEM_PROMPT) - message_tokens(message)
+    history, _ = fit_history(previous_chats, remaining)
+
+    return [
+        {"role": "system", "content": CHAT_SYSTEM_PROMPT},
+        *history,
+        {"role": "user", "content": message},
+    ]
+
+
+def build_doc_messages(previous_chats, chunks: List[Dict], message: str,
+                       budget: int = PROMPT_TOKEN_BUDGET) -> List[Dict]:
+    remaining = (budget - message_tokens(DOC_SYSTEM_PROMPT) - message_tokens(CONTEXT_HEADER)
+                 - message_tokens(message))
+    context_budget = int(remaining * PROMPT_CONTEXT_SHARE) if previous_chats else remaining
+    kept, context_used = fit_context(chunks, context_budget)
+    history, _ = fit_history(previous_chats, remaining - context_used)
+
+    if len(kept) < len(chunks) or len(history) < 2 * len(previous_chats):
+        logger.debug("Prompt budget %d: kept %d/%d chunks and %d/%d turns",
+                     budget, len(kept), len(chunks), len(history) // 2, len(previous_chats))
+
+    context = CONTEXT_SEPARATOR.join(c["text"] for c in kept)
+    return [
+        {"role": "system", "content": DOC_SYSTEM_PROMPT},
+        *history,
+        {"role": "user", "content": CONTEXT_HEADER + context},
+        {"role": "user", "content": message},
+    ]
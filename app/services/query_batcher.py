@@ -0,0 +1,74 @@
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBatcher:
+    """Collects queries that arrive within a few milliseconds and runs them as one batch.
+
+    `batch_fn(queries, top_k)` must return one result per query; every caller
+    waiting on the batch gets `trim(result, its_top_k)` back through a Future
+    (by default, a slice of the result).
+    """
+
+    def __init__(self, batch_fn: Callable[[List[str], int], list], max_batch: int = 32,
+                 max_wait_ms: float = 5, trim: Optional[Callable[[Any, int], Any]] = None):
+        self.batch_fn = batch_fn
+        self.trim = trim or (lambda result, k: result[:k])
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self._queue: "queue.Queue[tuple]" = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def submit(self, query: str, top_k: int) -> Future:
+        future = Future()
+        self._ensure_thread()
+        self._queue.put((query, top_k, future))
+        return future
+
+    def _ensure_thread(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="query-batcher", daemon=True)
+                self._thread.start()
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            # Callers that gave up while queued are dropped; the rest can no longer be cancelled
+            batch = [item for item in self._collect() if item[2].set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            try:
+                self._run_batch(batch)
+            except Exception as e:
+                # Never let one batch end the only thread that serves every caller
+                logger.exception("Batched retrieval of %d queries failed", len(batch))
+                for _, _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+    def _run_batch(self, batch):
+        queries = [query for query, _, _ in batch]
+        top_k = max(k for _, k, _ in batch)
+        results = self.batch_fn(queries, top_k)
+        for (_, k, future), result in zip(batch, results):
+            future.set_result(self.trim(result, k))
@@ -0,0 +1,123 @@
+"""Chat history write throughput and recent-history lookup latency at scale.
+
+    python -m benchmarks.bench_chat_history --rows 10000000 --users 100000
+    python -m benchmarks.bench_chat_history --rows 1000000 --schema legacy
+
+Bulk-loads --rows chats into a scratch SQLite file, then times crud.save_chat
+(one commit per chat, as the API does) and crud.get_recent_chats for random
+users. --schema legacy recreates the original indexes on message/reply/id/
+user_id for comparison.
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from sqlalchemy.orm import sessionmaker
+
+from app import crud
+from app.database import Base, create_db_engine
+from app.models import ChatHistory
+from app.services.conversation_cache import conversation_cache
+from benchmarks.common import Timer, percentile, print_table, random_sentence
+
+LEGACY_INDEXES = [
+    "CREATE INDEX ix_chat_db_message ON chat_db (message)",
+    "CREATE INDEX ix_chat_db_user_id ON chat_db (user_id)",
+    "CREATE INDEX ix_chat_db_reply ON chat_db (reply)",
+    "CREATE INDEX ix_chat_db_id ON chat_db (id)",
+]
+LOAD_BATCH = 50000
+
+
+def create_schema(engine, schema):
+    if schema == "current":
+        Base.metadata.create_all(bind=engine)
+        return
+    table = ChatHistory.__table__
+    table.create(bind=engine)
+    with engine.begin() as conn:
+        for index in table.indexes:
+            index.drop(conn)
+        for ddl in LEGACY_INDEXES:
+            conn.exec_driver_sql(ddl)
+
+
+def bulk_load(engine, n_rows, n_users, rng):
+    # A pool of sentences keeps generation from dominating the load time;
+    # the row number makes each message distinct like real traffic
+    pool = [random_sentence(rng) for _ in range(1000)]
+    raw = engine.raw_connection()
+    try:
+        cursor = raw.cursor()
+        for start in range(0, n_rows, LOAD_BATCH):
+            rows = [
+                (f"user{rng.randrange(n_users)}", f"{rng.choice(pool)} #{i}", rng.choice(pool))
+                for i in range(start, min(start + LOAD_BATCH, n_rows))
+            ]
+            cursor.executemany("INSERT INTO chat_db (user_id, message, reply) VALUES (?, ?, ?)", rows)
+            raw.commit()
+            if (start // LOAD_BATCH) % 20 == 0:
+                print(f"  loaded {start + len(rows):,} rows", flush=True)
+    finally:
+        raw.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--inserts", type=int, default=5000)
+    parser.add_argument("--lookups", type=int, default=5000)
+    parser.add_argument("--schema", choices=["current", "legacy"], default="current")
+    parser.add_argument("--db", help="SQLite file to (re)use; a scratch file is created by default")
+    args = parser.parse_args()
+
+    path = args.db or os.path.join(tempfile.mkdtemp(prefix="chat-bench-"), "chat.db")
+    fresh = not os.path.exists(path)
+    engine = create_db_engine(f"sqlite:///{path}")
+    Session = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
+    rng = random.Random(0)
+    # Measure the database path, not the in-process window cache
+    conversation_cache.max_users = 0
+
+    if fresh:
+        create_schema(engine, args.schema)
+        print(f"Loading {args.rows:,} rows for {args.users:,} users into {path}")
+        with Timer() as load:
+            bulk_load(engine, args.rows, args.users, rng)
+        print(f"  {args.rows / load.elapsed:,.0f} rows/s bulk load")
+
+    rows = []
+    db = Session()
+    try:
+        latencies = []
+        with Timer() as total:
+            for i in range(args.inserts):
+                start = time.perf_counter()
+                crud.save_chat(db, f"user{rng.randrange(args.users)}", f"bench message {i}", "bench reply")
+                latencies.append(time.perf_counter() - start)
+        latencies.sort()
+        rows.append({"operation": "save_chat", "count": args.inserts, "per_s": args.inserts / total.elapsed,
+                     "p50_ms": percentile(latencies, 50) * 1000, "p99_ms": percentile(latencies, 99) * 1000})
+
+        latencies = []
+        with Timer() as total:
+            for _ in range(args.lookups):
+                start = time.perf_counter()
+                crud.get_recent_chats(db, f"user{rng.randrange(args.users)}")
+                latencies.append(time.perf_counter() - start)
+        latencies.sort()
+        rows.append({"operation": "get_recent_chats", "count": args.lookups, "per_s": args.lookups / total.elapsed,
+                     "p50_ms": percentile(latencies, 50) * 1000, "p99_ms": percentile(latencies, 99) * 1000})
+    finally:
+        db.close()
+
+    size_mb = sum(os.path.getsize(p) for p in (path, path + "-wal") if os.path.exists(p)) / 1e6
+    print(f"schema={args.schema}, {size_mb:,.0f} MB on disk")
+    print_table(rows, ["operation", "count", "per_s", "p50_ms", "p99_ms"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""Memory per chunk: list-of-dicts chunk storage vs ChunkStore.
+
+    python -m benchmarks.bench_chunk_store --chunks 200000 --sources 500
+"""
+import argparse
+import gc
+import random
+import tracemalloc
+
+from app.services.chunk_store import ChunkStore
+from benchmarks.common import Timer, print_table, random_paragraph
+
+
+def synthetic_chunks(n_chunks, n_sources, rng):
+    # Distinct strings per chunk, as they would be after extraction; pages repeat like real PDFs
+    for i in range(n_chunks):
+        source = f"document_{i % n_sources:05d}.pdf"
+        yield random_paragraph(rng, sentences=3), source, (i // n_sources) % 300 + 1
+
+
+def measure(build):
+    gc.collect()
+    tracemalloc.start()
+    with Timer() as t:
+        store = build()
+    gc.collect()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return store, current, peak, t.elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--chunks", type=int, default=200000)
+    parser.add_argument("--sources", type=int, default=500)
+    args = parser.parse_args()
+
+    def build_dicts():
+        rng = random.Random(0)
+        return [{"text": text, "source": source, "page": page}
+                for text, source, page in synthetic_chunks(args.chunks, args.sources, rng)]
+
+    def build_store():
+        rng = random.Random(0)
+        store = ChunkStore()
+        for text, source, page in synthetic_chunks(args.chunks, args.sources, rng):
+            store.append(text, source, page)
+        return store
+
+    rows = []
+    text_bytes = None
+    for name, build in (("list of dicts", build_dicts), ("ChunkStore", build_store)):
+        store, current, peak, elapsed = measure(build)
+        if isinstance(store, ChunkStore):
+            text_bytes = store.offsets[-1]
+        rows.append({
+            "storage": name,
+            "total_mb": current / 1e6,
+            "bytes_per_chunk": current / args.chunks,
+            "peak_mb": peak / 1e6,
+            "build_s": elapsed,
+        })
+        del store
+
+    print(f"{args.chunks} chunks from {args.sources} sources, "
+          f"{text_bytes / args.chunks:.0f} bytes of UTF-8 text per chunk")
+    print_table(rows, ["storage", "total_mb", "bytes_per_chunk", "peak_mb", "build_s"])
+
+
+if __name__ == "__main__":
+    main()
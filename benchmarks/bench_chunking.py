@@ -0,0 +1,79 @@
+"""Chunking throughput: the previous decode-per-window loop vs the offset-based Chunker.
+
+    python -m benchmarks.bench_chunking --docs 2000 --paragraphs 40 --threads 1,4,8
+
+Builds a synthetic corpus in memory (documents of filler paragraphs, as
+benchmarks.synthetic_corpus writes them) and chunks all of it with each
+variant. Reports MB/s, chunk count, mean chunk size in tokens, and the share
+of chunks that end at a sentence end, which is what snapping buys.
+"""
+import argparse
+import random
+
+from app.services.extraction import Chunker
+from benchmarks.common import Timer, print_table
+from benchmarks.synthetic_corpus import fact, page_text
+
+
+def decode_windows(chunker, text):
+    """The chunker this repo used before: encode, then decode every chunk_size window."""
+    tokens = chunker.tokenizer.encode(text)
+    chunks = []
+    start = 0
+    while start < len(tokens):
+        chunks.append(chunker.tokenizer.decode(tokens[start:start + chunker.chunk_size]))
+        start += chunker.chunk_size - chunker.overlap
+    return chunks
+
+
+def offset_chunks(chunker, texts):
+    return [text[start:end] for text, spans in zip(texts, chunker.split_batch(texts)) for start, end in spans]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--docs", type=int, default=2000)
+    parser.add_argument("--paragraphs", type=int, default=40, help="filler paragraphs per document")
+    parser.add_argument("--batch", type=int, default=16,
+                        help="documents per split_batch call (ingestion passes one PDF page range)")
+    parser.add_argument("--threads", default="1,4")
+    parser.add_argument("--chunk-size", type=int, default=400)
+    parser.add_argument("--overlap", type=int, default=80)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    texts = [page_text(rng, args.paragraphs, fact(rng)) for _ in range(args.docs)]
+    megabytes = sum(len(text.encode("utf-8")) for text in texts) / 1e6
+    print(f"{args.docs} documents, {megabytes:.1f} MB")
+
+    variants = [("decode windows", None, None)]
+    for threads in (int(t) for t in args.threads.split(",")):
+        variants.append((f"offsets, {threads} threads", False, threads))
+        variants.append((f"offsets + snap, {threads} threads", True, threads))
+
+    rows = []
+    for name, snap, threads in variants:
+        chunker = Chunker(args.chunk_size, args.overlap, snap=bool(snap), threads=threads or 1)
+        with Timer() as t:
+            if snap is None:
+                chunks = [chunk for text in texts for chunk in decode_windows(chunker, text)]
+            else:
+                chunks = []
+                for i in range(0, len(texts), args.batch):
+                    chunks.extend(offset_chunks(chunker, texts[i:i + args.batch]))
+        sizes = [len(tokens) for tokens in chunker.tokenizer.encode_ordinary_batch(chunks, num_threads=8)]
+        rows.append({
+            "chunker": name,
+            "mb_per_s": megabytes / t.elapsed,
+            "seconds": t.elapsed,
+            "chunks": len(chunks),
+            "mean_tokens": sum(sizes) / len(sizes),
+            "sentence_end_pct": 100.0 * sum(chunk.rstrip().endswith((".", "!", "?")) for chunk in chunks)
+                                / len(chunks),
+        })
+
+    print_table(rows, ["chunker", "mb_per_s", "seconds", "chunks", "mean_tokens", "sentence_end_pct"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""Context tokens and answer recall: plain top-k vs redundancy-aware selection.
+
+    python -m benchmarks.bench_context_selection --txt 200 --pdf 20 --queries 300 --top-k 3,5
+    python -m benchmarks.bench_context_selection --docs documents
+
+Indexes a synthetic corpus (benchmarks.synthetic_corpus) in a scratch
+directory, then retrieves context with CONTEXT_OVERFETCH=1 (the plain top-k)
+and with each --overfetch value for two kinds of question: "fact" asks about a
+planted fact, "passage" is a short slice of indexed text, which often falls in
+the overlap of two neighbouring chunks. For every variant it reports the mean
+context tokens per query, how often the context still contains the answer
+(the fact sentence or the passage), and retrieval latency.
+
+Synthetic filler shares one small vocabulary, so its chunks are all alike and
+rarely retrieved next to their neighbours; --docs runs the passage questions
+on a real document folder instead, where that redundancy shows.
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from benchmarks import synthetic_corpus
+from benchmarks.common import percentile, print_table
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--txt", type=int, default=200)
+    parser.add_argument("--pdf", type=int, default=20)
+    parser.add_argument("--pages", type=int, default=5)
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--top-k", default="3,5")
+    parser.add_argument("--overfetch", default="2,4")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--docs", default=None, help="index this folder instead of a synthetic corpus")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench_context_")
+    if args.docs:
+        os.symlink(os.path.abspath(args.docs), os.path.join(workdir, "documents"))
+        facts = []
+    else:
+        facts = synthetic_corpus.generate(os.path.join(workdir, "documents"), args.txt, args.pdf,
+                                          pages=args.pages, seed=args.seed)
+    # doc_service keeps documents/ and index_data/ relative to the working directory
+    os.chdir(workdir)
+    from app.services import context_selection, doc_service, prompt_builder
+
+    doc_service.initialize_doc_system()
+    print(f"{doc_service.snapshot.live_count} chunks from {len(doc_service.snapshot.manifest)} files")
+
+    rng = random.Random(args.seed)
+    questions = {
+        "fact": [(synthetic_corpus.question(fact), synthetic_corpus.fact_sentence(fact))
+                 for fact in rng.sample(facts, min(args.queries, len(facts)))],
+        "passage": [passage_question(doc_service.snapshot, rng) for _ in range(args.queries)],
+    }
+
+    rows = []
+    for kind, sample in questions.items():
+        if not sample:
+            continue
+        for top_k in (int(k) for k in args.top_k.split(",")):
+            for overfetch in [1] + [int(o) for o in args.overfetch.split(",")]:
+                doc_service.CONTEXT_OVERFETCH = overfetch
+                row = evaluate(doc_service, context_selection, sample, top_k)
+                rows.append({"questions": kind, "top_k": top_k,
+                             "selection": f"overfetch x{overfetch}" if overfetch > 1 else "plain top-k", **row})
+
+    print_table(rows, ["questions", "top_k", "selection", "context_tokens", "answer_found_pct", "p50_ms",
+                       "p99_ms"])
+    print(f"\nPrompt budget for reference: {prompt_builder.PROMPT_TOKEN_BUDGET} tokens")
+
+
+def passage_question(snap, rng, words=12):
+    """(question, answer): a run of words from a random chunk, which is its own answer."""
+    chunk = snap.store.get(int(rng.choice(snap.live_ids())))
+    tokens = chunk["text"].split()
+    start = rng.randint(0, max(0, len(tokens) - words))
+    passage = " ".join(tokens[start:start + words])
+    return passage, passage
+
+
+def evaluate(doc_service, context_selection, sample, top_k):
+    tokens, found, latencies = 0, 0, []
+    for question, answer in sample:
+        start = time.perf_counter()
+        chunks = doc_service.retrieve_batch([question], top_k)[0].chunks
+        latencies.append(time.perf_counter() - start)
+        tokens += context_selection.context_tokens(chunks)
+        # Whitespace-insensitive: PDF extraction and merging may re-flow lines
+        found += any(" ".join(answer.split()) in " ".join(chunk["text"].split()) for chunk in chunks)
+    latencies.sort()
+    return {
+        "context_tokens": tokens / len(sample),
+        "answer_found_pct": 100.0 * found / len(sample),
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+    }
+
+
+if __name__ == "__main__":
+    main()
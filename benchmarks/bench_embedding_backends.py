@@ -0,0 +1,84 @@
+"""Throughput and output parity of the embedding backends on the local corpus.
+
+    python -m benchmarks.bench_embedding_backends --backends torch,onnx,onnx-int8 --threads 1,4
+
+Chunks the files in documents/ exactly as ingestion does (falling back to
+synthetic text when it is empty), embeds them with each backend, and reports
+texts/sec plus cosine similarity to the PyTorch embeddings of the same chunks.
+"""
+import argparse
+import os
+import random
+
+import numpy as np
+
+from app.services.embedding_backend import create_backend
+from app.services.extraction import chunk_docs, extract_file
+from benchmarks.common import Timer, print_table, random_paragraph
+
+BACKEND_VARIANTS = {
+    "torch": ("torch", None),
+    "onnx": ("onnx", None),
+    "onnx-int8": ("onnx", "int8"),
+}
+
+
+def corpus_chunks(docs_path, limit):
+    texts = []
+    if os.path.isdir(docs_path):
+        for filename in sorted(os.listdir(docs_path)):
+            if filename.endswith((".txt", ".pdf")):
+                docs, _ = extract_file(os.path.join(docs_path, filename), filename)
+                texts.extend(c["text"] for c in chunk_docs(docs))
+            if len(texts) >= limit:
+                break
+    if not texts:
+        rng = random.Random(0)
+        texts = [random_paragraph(rng, sentences=12) for _ in range(limit)]
+    return texts[:limit]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--model", default="all-MiniLM-L6-v2")
+    parser.add_argument("--docs", default="documents")
+    parser.add_argument("--limit", type=int, default=2000, help="maximum number of chunks to embed")
+    parser.add_argument("--backends", default="torch,onnx,onnx-int8")
+    parser.add_argument("--threads", default="0", help="comma-separated intra-op thread counts (0 = default)")
+    args = parser.parse_args()
+
+    texts = corpus_chunks(args.docs, args.limit)
+    print(f"{len(texts)} chunks, model {args.model}")
+
+    # PyTorch output is the reference every backend is compared with
+    reference = create_backend(args.model, "torch", None).encode(texts)
+    reference /= np.linalg.norm(reference, axis=1, keepdims=True)
+
+    rows = []
+    for variant in args.backends.split(","):
+        backend_name, quantize = BACKEND_VARIANTS[variant]
+        for threads in (int(t) for t in args.threads.split(",")):
+            try:
+                backend = create_backend(args.model, backend_name, quantize, threads)
+            except ImportError as e:
+                print(f"skipping {variant}: {e}")
+                break
+            backend.encode(texts[:32])   # warm-up: lazy allocations and kernel selection
+            with Timer() as t:
+                vectors = backend.encode(texts)
+            vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+            cosine = (vectors * reference).sum(axis=1)
+            rows.append({
+                "backend": variant,
+                "threads": threads or "default",
+                "texts_per_s": len(texts) / t.elapsed,
+                # Four decimals: parity differences are well below print_table's two
+                "mean_cosine": f"{cosine.mean():.4f}",
+                "min_cosine": f"{cosine.min():.4f}",
+            })
+
+    print_table(rows, ["backend", "threads", "texts_per_s", "mean_cosine", "min_cosine"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""Filtered dense-search latency and recall: FAISS id selectors vs over-fetch + post-filter.
+
+    python -m benchmarks.bench_filtered_search --chunks 200000 --sources 1000 --index-type hnsw
+
+Builds a synthetic snapshot (random unit vectors, --sources files with up to
+50 pages each) and times doc_service.dense_search for queries restricted to
+one file, and to one file and a page range. Recall@k is measured against an
+exact search over just the matching chunks.
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from app.services import doc_service
+from app.services.chunk_store import ChunkStore
+from app.services.embedding_cache import EmbeddingCache
+from benchmarks.common import percentile, print_table
+
+PAGES_PER_SOURCE = 50
+
+
+def build_snapshot(n_chunks, n_sources, index_type, rng):
+    dimension = doc_service.embedder.dimension
+    vectors = rng.standard_normal((n_chunks, dimension)).astype("float32")
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    store = ChunkStore()
+    for i in range(n_chunks):
+        store.append(f"chunk {i}", f"doc{i % n_sources:05d}.pdf", (i // n_sources) % PAGES_PER_SOURCE + 1)
+
+    # The exact path for small filtered sets reads vectors through the embedding
+    # cache; point it at a scratch file holding the synthetic vectors
+    doc_service.embedding_cache = EmbeddingCache(os.path.join(tempfile.mkdtemp(), "embeddings.sqlite"),
+                                                 doc_service.embedder.name)
+    texts = [store.text(i) for i in range(n_chunks)]
+    doc_service.embedding_cache.encode(texts, lambda missing: vectors[[int(t.split()[1]) for t in missing]])
+
+    ids = np.arange(n_chunks, dtype="int64")
+    sample = rng.choice(n_chunks, doc_service.training_sample_size(n_chunks), replace=False)
+    index, built_type = doc_service.new_index(vectors[sample], n_chunks, index_type)
+    index.add_with_ids(vectors, ids)
+    snap = doc_service.IndexSnapshot(index, store, bytearray(b"\1" * n_chunks), index_type=built_type)
+    return snap, vectors
+
+
+def exact_ids(vectors, query, allowed_ids, k):
+    candidates = vectors if allowed_ids is None else vectors[allowed_ids]
+    # Unit vectors: ranking by inner product is ranking by L2 distance
+    best = np.argsort(-(candidates @ query))[:k]
+    return set((best if allowed_ids is None else allowed_ids[best]).tolist())
+
+
+def run(search, queries, truth, k):
+    latencies, hits = [], 0
+    for query, expected in zip(queries, truth):
+        start = time.perf_counter()
+        found = search(query[None, :])
+        latencies.append(time.perf_counter() - start)
+        hits += len(set(found) & expected)
+    latencies.sort()
+    return {
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "recall": hits / sum(len(expected) for expected in truth),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--chunks", type=int, default=200000)
+    parser.add_argument("--sources", type=int, default=1000)
+    parser.add_argument("--index-type", default="hnsw", choices=sorted(doc_service.INDEX_FALLBACKS))
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=12)
+    parser.add_argument("--overfetch", type=int, default=1000,
+                        help="candidates the post-filter baseline fetches before filtering")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"Building {args.index_type} snapshot over {args.chunks} chunks...")
+    snap, vectors = build_snapshot(args.chunks, args.sources, args.index_type, rng)
+    queries = vectors[rng.choice(args.chunks, args.queries)] + 0.1 * rng.standard_normal(
+        (args.queries, vectors.shape[1])).astype("float32")
+
+    filters = {
+        "one file": [doc_service.ChunkFilter(sources=[f"doc{rng.integers(args.sources):05d}.pdf"])
+                     for _ in range(args.queries)],
+        "one file, pages 1-10": [doc_service.ChunkFilter(sources=[f"doc{rng.integers(args.sources):05d}.pdf"],
+                                                         pages=[(1, 10)])
+                                 for _ in range(args.queries)],
+    }
+
+    rows = []
+    truth = [exact_ids(vectors, q, None, args.k) for q in queries]
+    rows.append({"filter": "none", "method": "unfiltered", "matching": args.chunks,
+                 **run(lambda q: doc_service.dense_search(snap, q, args.k)[0].tolist(), queries, truth, args.k)})
+
+    for name, chunk_filters in filters.items():
+        allowed = [snap.filter_ids(f) for f in chunk_filters]
+        truth = [exact_ids(vectors, q, ids, args.k) for q, ids in zip(queries, allowed)]
+        pending = iter(chunk_filters)
+        position = iter(allowed)
+
+        def selector_search(q):
+            ids = snap.filter_ids(next(pending))
+            return doc_service.dense_search(snap, q, args.k, ids)[0].tolist()
+
+        def post_filter_search(q):
+            ids = next(position)
+            found = doc_service.dense_search(snap, q, args.overfetch)[0]
+            return found[np.isin(found, ids)][:args.k].tolist()
+
+        matching = int(np.mean([len(ids) for ids in allowed]))
+        rows.append({"filter": name, "method": "pre-filter", "matching": matching,
+                     **run(selector_search, queries, truth, args.k)})
+        rows.append({"filter": name, "method": f"post-filter top {args.overfetch}", "matching": matching,
+                     **run(post_filter_search, queries, truth, args.k)})
+
+    print(f"{snap.index_type} index, {args.chunks} chunks in {args.sources} files, k={args.k}, "
+          f"exact below {doc_service.FILTER_EXACT_MAX_IDS} matching chunks")
+    print_table(rows, ["filter", "method", "matching", "p50_ms", "p99_ms", "recall"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,285 @@
+"""End-to-end load test: synthetic corpus, fake LLM, and the real app under concurrent requests.
+
+    python -m benchmarks.bench_load --txt 200 --pdf 20 --concurrency 32 --duration 20 --json run.json
+    python -m benchmarks.bench_load --endpoints ask-doc,ask-doc-stream --llm-latency-ms 500 --token-delay-ms 20
+
+Runs benchmarks.fake_openrouter and `uvicorn app.main:app` as subprocesses in
+a scratch directory that holds only the generated corpus, so runs are
+isolated and repeatable. It reports:
+- ingestion: seconds from launch until /ready (full build of the corpus), and
+  seconds to index --upload more files through /upload-doc until their jobs finish
+- for each endpoint, in turn: requests, errors, QPS and p50/p95/p99 latency,
+  plus time to first token for the streaming endpoints
+- the app's own stage timings from /metrics (mean ms per stage)
+
+--json writes all of it, with the configuration and git commit, so runs can
+be compared.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from benchmarks import synthetic_corpus
+from benchmarks.common import free_port, print_table, random_sentence, summarize
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ENDPOINTS = ("chat", "chat-stream", "ask-doc", "ask-doc-stream", "history")
+STREAMING = {"chat-stream", "ask-doc-stream"}
+_METRIC_RE = re.compile(r'^assistant_(stage|ingest_stage)_duration_seconds_(sum|count)\{stage="([^"]+)"\} (\S+)$')
+
+
+def python_env(**extra):
+    env = dict(os.environ, **extra)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [REPO_ROOT, os.getenv("PYTHONPATH")]))
+    return env
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=REPO_ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def wait_until(client, path, timeout, process=None):
+    """Poll GET path until it returns 200; returns the seconds it took."""
+    start = time.perf_counter()
+    while time.perf_counter() - start < timeout:
+        if process is not None and process.poll() is not None:
+            raise SystemExit(f"{process.args[0]} exited with code {process.returncode}")
+        try:
+            if (await client.get(path)).status_code == 200:
+                return time.perf_counter() - start
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.05)
+    raise SystemExit(f"{path} not ready after {timeout:.0f}s")
+
+
+async def upload_files(client, directory, timeout):
+    """Upload every file in directory at once; seconds until all their ingestion jobs are done."""
+    start = time.perf_counter()
+    job_ids = []
+    for name in sorted(os.listdir(directory)):
+        with open(os.path.join(directory, name), "rb") as f:
+            response = await client.post("/upload-doc", files={"file": (name, f.read())})
+        response.raise_for_status()
+        job_ids.append(response.json()["job_id"])
+
+    pending = set(job_ids)
+    while pending:
+        if time.perf_counter() - start > timeout:
+            raise SystemExit(f"{len(pending)} upload job(s) unfinished after {timeout:.0f}s")
+        for job_id in list(pending):
+            job = (await client.get(f"/jobs/{job_id}")).json()
+            if job["status"] == "failed":
+                raise SystemExit(f"Ingestion of {job['filename']} failed: {job['error']}")
+            if job["status"] == "done":
+                pending.discard(job_id)
+        await asyncio.sleep(0.05)
+    return time.perf_counter() - start
+
+
+def make_request(endpoint, rng, users, questions):
+    """(method, path, json body) for one request to endpoint."""
+    user_id = f"user{rng.randrange(users)}"
+    if endpoint == "history":
+        return "GET", f"/history/{user_id}", None
+    if endpoint in ("chat", "chat-stream"):
+        body = {"user_id": user_id, "message": random_sentence(rng)}
+    else:
+        body = {"user_id": user_id, "message": rng.choice(questions)}
+    path = {"chat": "/chat", "chat-stream": "/chat/stream",
+            "ask-doc": "/ask-doc", "ask-doc-stream": "/ask-doc/stream"}[endpoint]
+    return "POST", path, body
+
+
+async def send(client, endpoint, method, path, body):
+    """(seconds, seconds to first streamed token or None, ok) for one request."""
+    start = time.perf_counter()
+    if endpoint not in STREAMING:
+        response = await client.request(method, path, json=body)
+        return time.perf_counter() - start, None, response.status_code == 200
+
+    first_token = None
+    ok = False
+    async with client.stream(method, path, json=body) as response:
+        async for line in response.aiter_lines():
+            if first_token is None and line.startswith("data: {"):
+                first_token = time.perf_counter() - start
+            if line == "data: [DONE]":
+                ok = response.status_code == 200
+    return time.perf_counter() - start, first_token, ok
+
+
+async def run_endpoint(client, endpoint, args, questions):
+    """Closed loop: --concurrency clients send back-to-back requests until the duration or count is reached."""
+    latencies, first_tokens = [], []
+    errors = 0
+    sent = 0
+    deadline = time.perf_counter() + args.duration
+
+    async def worker(seed):
+        nonlocal errors, sent
+        rng = random.Random(seed)
+        while time.perf_counter() < deadline and (not args.requests or sent < args.requests):
+            sent += 1
+            try:
+                elapsed, first_token, ok = await send(client, endpoint, *make_request(
+                    endpoint, rng, args.users, questions))
+            except httpx.HTTPError:
+                errors += 1
+                continue
+            if not ok:
+                errors += 1
+                continue
+            latencies.append(elapsed)
+            if first_token is not None:
+                first_tokens.append(first_token)
+
+    # Unrecorded warm-up, so connection setup and first-use costs don't land in the percentiles
+    rng = random.Random(-1)
+    for _ in range(args.warmup):
+        await send(client, endpoint, *make_request(endpoint, rng, args.users, questions))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(i) for i in range(args.concurrency)))
+    elapsed = time.perf_counter() - start
+
+    result = {"endpoint": endpoint, **summarize(latencies, elapsed), "errors": errors}
+    if endpoint in STREAMING:
+        ttft = summarize(first_tokens, elapsed)
+        result.update(ttft_p50_ms=ttft["p50_ms"], ttft_p99_ms=ttft["p99_ms"])
+    return result
+
+
+def stage_means(metrics_text):
+    """{"stage" or "ingest:stage": mean ms} from the app's /metrics output."""
+    sums, counts = {}, {}
+    for line in metrics_text.splitlines():
+        match = _METRIC_RE.match(line)
+        if match:
+            kind, field, stage, value = match.groups()
+            name = stage if kind == "stage" else f"ingest:{stage}"
+            (sums if field == "sum" else counts)[name] = float(value)
+    return {name: sums[name] / counts[name] * 1000 for name in sorted(sums) if counts.get(name)}
+
+
+async def benchmark(args, workdir, questions, upload_dir):
+    llm_port, app_port = free_port(), free_port()
+    fake_llm = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.fake_openrouter", "--port", str(llm_port),
+         "--latency-ms", str(args.llm_latency_ms), "--token-delay-ms", str(args.token_delay_ms)],
+        cwd=REPO_ROOT, env=python_env())
+    app_env = python_env(OPENROUTER_URL=f"http://127.0.0.1:{llm_port}/api/v1/chat/completions",
+                         API_KEY="benchmark")
+    if args.no_answer_cache:
+        app_env["ANSWER_CACHE_MAX_ENTRIES"] = "0"
+    app = None
+    limits = httpx.Limits(max_connections=args.concurrency + 8, max_keepalive_connections=args.concurrency + 8)
+
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{llm_port}", timeout=5) as llm_client:
+            await wait_until(llm_client, "/docs", 60, fake_llm)
+
+        start = time.perf_counter()
+        app = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(app_port),
+             "--workers", str(args.workers), "--log-level", "warning"],
+            cwd=workdir, env=app_env)
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{app_port}", timeout=args.request_timeout,
+                                     limits=limits) as client:
+            await wait_until(client, "/ready", args.startup_timeout, app)
+            ingestion = {"startup_to_ready_s": time.perf_counter() - start}
+            if upload_dir is not None:
+                ingestion["upload_s"] = await upload_files(client, upload_dir, args.startup_timeout)
+
+            results = []
+            for endpoint in args.endpoints.split(","):
+                print(f"Running {endpoint} ({args.concurrency} concurrent)...")
+                results.append(await run_endpoint(client, endpoint, args, questions))
+            stages = stage_means((await client.get("/metrics")).text)
+    finally:
+        for process in (app, fake_llm):
+            if process is not None:
+                process.terminate()
+                process.wait()
+    return ingestion, results, stages
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    corpus = parser.add_argument_group("corpus")
+    corpus.add_argument("--txt", type=int, default=100)
+    corpus.add_argument("--pdf", type=int, default=20)
+    corpus.add_argument("--pages", type=int, default=10)
+    corpus.add_argument("--upload", type=int, default=10, help="extra .txt files indexed through /upload-doc")
+    corpus.add_argument("--seed", type=int, default=0)
+    load = parser.add_argument_group("load")
+    load.add_argument("--endpoints", default=",".join(ENDPOINTS))
+    load.add_argument("--concurrency", type=int, default=16)
+    load.add_argument("--duration", type=float, default=10, help="seconds per endpoint")
+    load.add_argument("--requests", type=int, default=0, help="stop an endpoint after this many requests")
+    load.add_argument("--warmup", type=int, default=5, help="unrecorded requests per endpoint")
+    load.add_argument("--users", type=int, default=100)
+    load.add_argument("--no-answer-cache", action="store_true", help="measure every /ask-doc through the LLM")
+    server = parser.add_argument_group("servers")
+    server.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    server.add_argument("--llm-latency-ms", type=float, default=200)
+    server.add_argument("--token-delay-ms", type=float, default=10)
+    server.add_argument("--startup-timeout", type=float, default=900)
+    server.add_argument("--request-timeout", type=float, default=120)
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--workdir", help="run here instead of a fresh temporary directory")
+    args = parser.parse_args()
+
+    unknown = set(args.endpoints.split(",")) - set(ENDPOINTS)
+    if unknown:
+        parser.error(f"unknown endpoints {sorted(unknown)}; choose from {ENDPOINTS}")
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="bench_load_")
+    print(f"Generating corpus in {workdir}...")
+    facts = synthetic_corpus.generate(os.path.join(workdir, "documents"), args.txt, args.pdf, args.pages,
+                                      seed=args.seed)
+    upload_dir = None
+    if args.upload:
+        upload_dir = os.path.join(workdir, "uploads")
+        facts += synthetic_corpus.generate(upload_dir, args.upload, 0, seed=args.seed + 1, prefix="upload")
+    questions = synthetic_corpus.questions(facts)
+
+    ingestion, results, stages = asyncio.run(benchmark(args, workdir, questions, upload_dir))
+
+    print(f"\nIngestion: ready {ingestion['startup_to_ready_s']:.2f}s after launch"
+          + (f", {args.upload} uploads indexed in {ingestion['upload_s']:.2f}s" if "upload_s" in ingestion else ""))
+    print_table([{"ttft_p50_ms": "-", "ttft_p99_ms": "-", **row} for row in results],
+                ["endpoint", "requests", "errors", "qps", "p50_ms", "p95_ms", "p99_ms", "ttft_p50_ms", "ttft_p99_ms"])
+    print("\nMean ms per stage (app /metrics):")
+    print_table([{"stage": name, "mean_ms": ms} for name, ms in stages.items()], ["stage", "mean_ms"])
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({
+                "config": vars(args),
+                "git_commit": git_commit(),
+                "python": platform.python_version(),
+                "cpu_count": os.cpu_count(),
+                "ingestion": ingestion,
+                "endpoints": {row["endpoint"]: row for row in results},
+                "stages_ms": stages,
+            }, f, indent=2)
+        print(f"\nWrote {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""Compare per-request retrieval with the micro-batched path under concurrency.
+
+    python -m benchmarks.bench_query_batching --chunks 50000 --concurrency 32 --requests 2000
+"""
+import argparse
+import random
+import threading
+import time
+
+import faiss
+import numpy as np
+
+from app.services import doc_service
+from app.services.chunk_store import ChunkStore
+from app.services.query_batcher import QueryBatcher
+from benchmarks.common import Timer, print_table, random_sentence, summarize
+
+
+def build_synthetic_snapshot(n_chunks, seed=0):
+    # Random unit vectors stand in for chunk embeddings; only query encoding hits the model
+    rng = np.random.default_rng(seed)
+    dimension = doc_service.embedder.dimension
+    vectors = rng.standard_normal((n_chunks, dimension)).astype("float32")
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    index = faiss.IndexIDMap(faiss.IndexFlatL2(dimension))
+    index.add_with_ids(vectors, np.arange(n_chunks, dtype="int64"))
+    store = ChunkStore()
+    for i in range(n_chunks):
+        store.append(f"chunk {i}", "synthetic.txt", None)
+    return doc_service.IndexSnapshot(index, store, bytearray(b"\1" * n_chunks))
+
+
+def run(retrieve, queries, concurrency, top_k):
+    latencies = []
+    lock = threading.Lock()
+    position = iter(range(len(queries)))
+
+    def client():
+        local = []
+        while True:
+            with lock:
+                i = next(position, None)
+            if i is None:
+                break
+            start = time.perf_counter()
+            retrieve(queries[i], top_k)
+            local.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    with Timer() as t:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    return summarize(latencies, t.elapsed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--chunks", type=int, default=50000)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--max-batch", type=int, default=32)
+    parser.add_argument("--max-wait-ms", type=float, default=3)
+    args = parser.parse_args()
+
+    doc_service.snapshot = build_synthetic_snapshot(args.chunks)
+    rng = random.Random(1)
+    queries = [random_sentence(rng) for _ in range(args.requests)]
+    batcher = QueryBatcher(doc_service.retrieve_batch, args.max_batch, args.max_wait_ms,
+                           trim=doc_service.Retrieval.top)
+
+    modes = {
+        "per-request": lambda q, k: doc_service.retrieve_batch([q], k)[0],
+        "batched": lambda q, k: batcher.submit(q, k).result(),
+    }
+    # Warm up the model and FAISS threads before timing anything
+    for retrieve in modes.values():
+        run(retrieve, queries[:50], args.concurrency, args.top_k)
+
+    rows = []
+    for name, retrieve in modes.items():
+        rows.append({"mode": name, **run(retrieve, queries, args.concurrency, args.top_k)})
+
+    print(f"{args.chunks} chunks, {args.concurrency} concurrent clients, top_k={args.top_k}")
+    print_table(rows, ["mode", "requests", "qps", "p50_ms", "p95_ms", "p99_ms"])
+
+
+if __name__ == "__main__":
+    main()
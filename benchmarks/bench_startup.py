@@ -0,0 +1,125 @@
+"""Import-time profile of the API, and time until it is live and ready.
+
+    python -m benchmarks.bench_startup --runs 5 --max-seconds 2
+    python -m benchmarks.bench_startup --serve
+
+Each run imports the module in a fresh interpreter with `-X importtime` (in a
+scratch directory, so chat.db and documents/ are not touched). The slowest
+imports are listed, and the run fails if the import takes longer than
+--max-seconds or pulls in one of HEAVY_MODULES, which must only load in the
+warm-up task or on the first document request. --serve also starts uvicorn
+and times the first answer from / (live) and from /ready.
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.common import free_port, percentile, print_table
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ("torch", "sentence_transformers", "transformers", "onnxruntime", "faiss",
+                 "pdfplumber", "tiktoken", "app.services.doc_service")
+
+_IMPORTTIME_RE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|\s+(\S+)$")
+
+
+def profile_import(module, workdir):
+    """(wall seconds, [(cumulative us, self us, name)], heavy modules loaded) for one fresh import."""
+    script = (f"import sys, time; start = time.perf_counter(); import {module}; "
+              f"print(time.perf_counter() - start); "
+              f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))")
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [REPO_ROOT, os.getenv("PYTHONPATH")])),
+               WARMUP_ON_STARTUP="false")
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", script], cwd=workdir, env=env,
+                            capture_output=True, text=True)
+    if result.returncode:
+        raise SystemExit(f"import {module} failed:\n{result.stderr[-2000:]}")
+
+    imports = []
+    for line in result.stderr.splitlines():
+        match = _IMPORTTIME_RE.match(line)
+        if match:
+            own, cumulative, name = match.groups()
+            imports.append((int(cumulative), int(own), name))
+    elapsed, heavy = result.stdout.splitlines()[-2:]
+    return float(elapsed), imports, [m for m in heavy.split(",") if m]
+
+
+def time_serving(module, workdir, timeout):
+    """Seconds from launching uvicorn until / answers and until /ready returns 200."""
+    import httpx
+
+    port = free_port()
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [REPO_ROOT, os.getenv("PYTHONPATH")])))
+    start = time.perf_counter()
+    server = subprocess.Popen([sys.executable, "-m", "uvicorn", f"{module}:app", "--port", str(port),
+                               "--log-level", "warning"], cwd=workdir, env=env)
+    live = ready = None
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=1.0) as client:
+            while ready is None and time.perf_counter() - start < timeout:
+                if server.poll() is not None:
+                    raise SystemExit("uvicorn exited during startup")
+                try:
+                    if live is None and client.get("/").status_code == 200:
+                        live = time.perf_counter() - start
+                    if live is not None and client.get("/ready").status_code == 200:
+                        ready = time.perf_counter() - start
+                except httpx.TransportError:
+                    pass
+                time.sleep(0.02)
+    finally:
+        server.terminate()
+        server.wait()
+    return live, ready
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--module", default="app.main")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15, help="slowest imports to list")
+    parser.add_argument("--max-seconds", type=float, default=None,
+                        help="fail if the median import takes longer than this")
+    parser.add_argument("--serve", action="store_true", help="also time / and /ready under uvicorn")
+    parser.add_argument("--serve-timeout", type=float, default=300)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench_startup_")
+    walls, heavy = [], set()
+    for _ in range(args.runs):
+        elapsed, imports, loaded = profile_import(args.module, workdir)
+        walls.append(elapsed)
+        heavy.update(loaded)
+    walls.sort()
+
+    # Slowest modules of the last run by cumulative time (a package includes its submodules)
+    rows = [{"module": name, "cumulative_ms": cumulative / 1000, "self_ms": own / 1000}
+            for cumulative, own, name in sorted(imports, reverse=True)[:args.top]]
+    print_table(rows, ["module", "cumulative_ms", "self_ms"])
+    print(f"\nimport {args.module}: median {percentile(walls, 50):.3f}s, "
+          f"min {walls[0]:.3f}s, max {walls[-1]:.3f}s over {args.runs} runs")
+
+    if args.serve:
+        live, ready = time_serving(args.module, workdir, args.serve_timeout)
+        def seconds(value):
+            return f"{value:.2f}s" if value is not None else f"not within {args.serve_timeout:.0f}s"
+
+        print(f"live (/) after {seconds(live)}, ready (/ready) after {seconds(ready)}")
+
+    failures = []
+    if heavy:
+        failures.append(f"heavy modules imported at startup: {', '.join(sorted(heavy))}")
+    if args.max_seconds is not None and percentile(walls, 50) > args.max_seconds:
+        failures.append(f"median import {percentile(walls, 50):.3f}s exceeds {args.max_seconds}s")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""Helpers shared by the benchmark scripts."""
+import random
+import socket
+import time
+
+WORDS = (
+    "invoice shipment warranty refund battery charger screen model serial order "
+    "account password delivery return policy customer support manual install "
+    "update firmware device network router cable adapter license payment card "
+    "balance report quarterly revenue margin forecast contract clause renewal "
+    "engine pump valve sensor pressure temperature calibration maintenance"
+).split()
+
+
+def random_sentence(rng: random.Random, min_words=8, max_words=20) -> str:
+    words = rng.choices(WORDS, k=rng.randint(min_words, max_words))
+    return " ".join(words).capitalize() + "."
+
+
+def random_paragraph(rng: random.Random, sentences=6) -> str:
+    return " ".join(random_sentence(rng) for _ in range(sentences))
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    k = min(len(sorted_values) - 1, max(0, round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[k]
+
+
+def summarize(latencies, elapsed):
+    """QPS and latency percentiles (ms) for one run."""
+    values = sorted(latencies)
+    return {
+        "requests": len(values),
+        "qps": len(values) / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(values, 50) * 1000,
+        "p95_ms": percentile(values, 95) * 1000,
+        "p99_ms": percentile(values, 99) * 1000,
+    }
+
+
+def print_table(rows, columns):
+    widths = [max(len(col), *(len(f"{row[col]:.2f}" if isinstance(row[col], float) else str(row[col]))
+                              for row in rows)) for col in columns]
+    print("  ".join(col.rjust(w) for col, w in zip(columns, widths)))
+    for row in rows:
+        cells = [f"{row[col]:.2f}" if isinstance(row[col], float) else str(row[col]) for col in columns]
+        print("  ".join(cell.rjust(w) for cell, w in zip(cells, widths)))
+
+
+class Timer:
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.elapsed = time.perf_counter() - self.start
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
@@ -0,0 +1,110 @@
+"""Measure recall@k and latency of each index type against exact Flat search on the current corpus.
+
+    python -m benchmarks.eval_index_modes --k 10 --queries 200 --nprobe 1,4,16,64 --ef-search 16,64,128
+
+Uses the persisted index in index_data/ (building it first if needed); chunk
+vectors come from the embedding cache, so only the sample queries hit the model.
+"""
+import argparse
+import random
+import time
+
+import faiss
+
+from app.services import doc_service
+from benchmarks.common import Timer, percentile, print_table
+
+
+def sample_queries(chunks, n, rng):
+    # A short slice of a chunk is a realistic "question" whose answer is in the corpus
+    texts = []
+    for chunk in rng.sample(chunks, min(n, len(chunks))):
+        words = chunk["text"].split()
+        start = rng.randint(0, max(0, len(words) - 12))
+        texts.append(" ".join(words[start:start + 12]))
+    return doc_service.embedder.encode(texts)
+
+
+def evaluate(index, queries, exact, k):
+    latencies = []
+    hits = 0
+    for i in range(len(queries)):
+        start = time.perf_counter()
+        _, found = index.search(queries[i:i + 1], k)
+        latencies.append(time.perf_counter() - start)
+        hits += len(set(found[0].tolist()) & set(exact[i].tolist()))
+
+    latencies.sort()
+    return {
+        "recall": hits / (k * len(queries)),
+        "mean_ms": sum(latencies) / len(latencies) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--modes", default="flat,ivf_flat,ivf_pq,hnsw")
+    parser.add_argument("--nprobe", default="1,4,16,64")
+    parser.add_argument("--ef-search", default="16,32,64,128")
+    args = parser.parse_args()
+
+    snap = doc_service.load_index()
+    if snap is None:
+        doc_service.initialize_doc_system()
+        snap = doc_service.snapshot
+    if not snap.live_count:
+        raise SystemExit(f"No chunks indexed; add documents to {doc_service.DOCS_PATH}/ first")
+
+    ids = snap.live_ids()
+    chunks = [snap.store.get(i) for i in ids]
+    vectors = doc_service.embed_chunks(chunks)
+    n, dimension = vectors.shape
+    queries = sample_queries(chunks, args.queries, random.Random(0))
+
+    exact_index = faiss.IndexIDMap(faiss.IndexFlatL2(dimension))
+    exact_index.add_with_ids(vectors, ids)
+    _, exact = exact_index.search(queries, args.k)
+
+    rows = []
+    for mode in args.modes.split(","):
+        description = doc_service.index_factory_string(mode, n, dimension)
+        index = faiss.index_factory(dimension, description)
+        with Timer() as build:
+            if mode == "hnsw":
+                faiss.downcast_index(index.index).hnsw.efConstruction = doc_service.HNSW_EF_CONSTRUCTION
+            if not index.is_trained:
+                if n < doc_service.ivf_nlist(n):
+                    print(f"skipping {mode}: {n} vectors cannot train {description}")
+                    continue
+                index.train(vectors)
+            index.add_with_ids(vectors, ids)
+        size_mb = len(faiss.serialize_index(index)) / 1e6
+
+        if mode.startswith("ivf"):
+            sweep = [("nprobe", int(v)) for v in args.nprobe.split(",")]
+        elif mode == "hnsw":
+            sweep = [("efSearch", int(v)) for v in args.ef_search.split(",")]
+        else:
+            sweep = [(None, None)]
+
+        for param, value in sweep:
+            if param:
+                faiss.ParameterSpace().set_index_parameter(index, param, value)
+            rows.append({
+                "mode": mode,
+                "index": description,
+                "param": f"{param}={value}" if param else "-",
+                "build_s": build.elapsed,
+                "size_mb": size_mb,
+                **evaluate(index, queries, exact, args.k),
+            })
+
+    print(f"{n} vectors, dim {dimension}, {len(queries)} queries, recall@{args.k} vs exact Flat")
+    print_table(rows, ["mode", "index", "param", "build_s", "size_mb", "recall", "mean_ms", "p99_ms"])
+
+
+if __name__ == "__main__":
+    main()
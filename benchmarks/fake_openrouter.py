@@ -0,0 +1,108 @@
+"""Local stand-in for the OpenRouter chat completions API.
+
+Point the app at it with OPENROUTER_URL=http://127.0.0.1:8001/api/v1/chat/completions
+and run:
+
+    python -m benchmarks.fake_openrouter --port 8001 --latency-ms 300 --token-delay-ms 20
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+import uuid
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+# Time before the first token, and between streamed tokens
+LATENCY_MS = float(os.getenv("FAKE_LLM_LATENCY_MS", "0"))
+TOKEN_DELAY_MS = float(os.getenv("FAKE_LLM_TOKEN_DELAY_MS", "0"))
+
+app = FastAPI(title="Fake OpenRouter")
+
+
+def fake_reply(messages):
+    last = messages[-1]["content"] if messages else ""
+    return f"Echo: {last}"
+
+
+def completion_id():
+    return f"chatcmpl-{uuid.uuid4().hex[:12]}"
+
+
+@app.post("/api/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    messages = body.get("messages", [])
+    model = body.get("model", "fake")
+    reply = fake_reply(messages)
+    prompt_tokens = sum(len(m.get("content", "").split()) for m in messages)
+    words = reply.split(" ")
+
+    await asyncio.sleep(LATENCY_MS / 1000)
+
+    if not body.get("stream"):
+        return JSONResponse({
+            "id": completion_id(),
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": reply},
+                "finish_reason": "stop",
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": len(words),
+                "total_tokens": prompt_tokens + len(words),
+            },
+        })
+
+    async def events():
+        cid = completion_id()
+        # OpenRouter interleaves comment lines while the model warms up
+        yield ": OPENROUTER PROCESSING\n\n"
+        for i, word in enumerate(words):
+            token = word if i == 0 else " " + word
+            chunk = {
+                "id": cid,
+                "object": "chat.completion.chunk",
+                "model": model,
+                "choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}],
+            }
+            yield f"data: {json.dumps(chunk)}\n\n"
+            await asyncio.sleep(TOKEN_DELAY_MS / 1000)
+        if body.get("stream_options", {}).get("include_usage"):
+            # Like OpenAI: a last chunk without choices carrying the request's usage
+            final = {
+                "id": cid,
+                "object": "chat.completion.chunk",
+                "model": model,
+                "choices": [],
+                "usage": {
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": len(words),
+                    "total_tokens": prompt_tokens + len(words),
+                },
+            }
+            yield f"data: {json.dumps(final)}\n\n"
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--latency-ms", type=float, default=LATENCY_MS)
+    parser.add_argument("--token-delay-ms", type=float, default=TOKEN_DELAY_MS)
+    args = parser.parse_args()
+
+    LATENCY_MS = args.latency_ms
+    TOKEN_DELAY_MS = args.token_delay_ms
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
@@ -0,0 +1,127 @@
+"""Generate a reproducible corpus of .txt and .pdf documents for benchmarks.
+
+    python -m benchmarks.synthetic_corpus --out /tmp/corpus --txt 200 --pdf 50 --pages 20
+
+Text is filler from benchmarks.common plus one planted fact per file (and per
+PDF page): a part number and its service interval. questions() turns those
+facts into /ask-doc questions whose answer is known to be in the corpus. The
+same seed always produces byte-identical files.
+"""
+import argparse
+import os
+import random
+from typing import Dict, List
+
+from benchmarks.common import random_paragraph
+
+# Part-number prefixes skip I, O and Q so they never read as digits
+PART_LETTERS = "ABCDEFGHJKLMNPRSTUVWXYZ"
+PDF_LINE_CHARS = 90
+PDF_LINES_PER_PAGE = 60
+
+
+def fact(rng: random.Random) -> Dict:
+    part = f"{rng.choice(PART_LETTERS)}{rng.choice(PART_LETTERS)}-{rng.randint(1000, 9999)}"
+    return {"part": part, "days": rng.randint(7, 365)}
+
+
+def fact_sentence(f: Dict) -> str:
+    return f"Part {f['part']} must be serviced every {f['days']} days."
+
+
+def question(f: Dict) -> str:
+    return f"How often must part {f['part']} be serviced?"
+
+
+def page_text(rng: random.Random, paragraphs: int, planted: Dict) -> str:
+    parts = [random_paragraph(rng) for _ in range(paragraphs)]
+    parts.insert(rng.randint(0, len(parts)), fact_sentence(planted))
+    return "\n\n".join(parts)
+
+
+def _pdf_escape(line: str) -> str:
+    return line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def write_pdf(path: str, pages: List[str]):
+    """Minimal valid PDF (Helvetica text, one content stream per page) that pdfplumber can read."""
+    objects = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        "<< /Type /Pages /Kids [{}] /Count {} >>".format(
+            " ".join(f"{4 + 2 * i} 0 R" for i in range(len(pages))), len(pages)),
+        "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    for i, text in enumerate(pages):
+        lines = []
+        for paragraph in text.split("\n\n"):
+            lines.extend(paragraph[j:j + PDF_LINE_CHARS] for j in range(0, len(paragraph), PDF_LINE_CHARS))
+            lines.append("")
+        ops = ["BT", "/F1 10 Tf", "12 TL", "40 800 Td"]
+        ops += [f"({_pdf_escape(line)}) Tj T*" for line in lines[:PDF_LINES_PER_PAGE]]
+        ops.append("ET")
+        stream = "\n".join(ops)
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 842] "
+                       f"/Resources << /Font << /F1 3 0 R >> >> /Contents {5 + 2 * i} 0 R >>")
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n{body}\nendobj\n".encode("latin-1")
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode("latin-1")
+    out += "".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode("latin-1")
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode("latin-1")
+    with open(path, "wb") as f:
+        f.write(out)
+
+
+def generate(out_dir: str, n_txt: int, n_pdf: int, pages: int = 10, paragraphs: int = 8,
+             seed: int = 0, prefix: str = "doc") -> List[Dict]:
+    """Write the corpus and return its planted facts as {"part", "days", "source", "page"}."""
+    os.makedirs(out_dir, exist_ok=True)
+    rng = random.Random(seed)
+    facts = []
+
+    for i in range(n_txt):
+        name = f"{prefix}{i:05d}.txt"
+        planted = fact(rng)
+        with open(os.path.join(out_dir, name), "w", encoding="utf-8") as f:
+            f.write(page_text(rng, paragraphs, planted))
+        facts.append({**planted, "source": name, "page": None})
+
+    for i in range(n_pdf):
+        name = f"{prefix}{i:05d}.pdf"
+        page_texts = []
+        for page in range(1, pages + 1):
+            # Three filler paragraphs and the fact fit on one page
+            planted = fact(rng)
+            page_texts.append(page_text(rng, 3, planted))
+            facts.append({**planted, "source": name, "page": page})
+        write_pdf(os.path.join(out_dir, name), page_texts)
+    return facts
+
+
+def questions(facts: List[Dict]) -> List[str]:
+    return [question(f) for f in facts]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--out", required=True)
+    parser.add_argument("--txt", type=int, default=100, help="number of .txt files")
+    parser.add_argument("--pdf", type=int, default=20, help="number of .pdf files")
+    parser.add_argument("--pages", type=int, default=10, help="pages per PDF")
+    parser.add_argument("--paragraphs", type=int, default=8, help="filler paragraphs per .txt file")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    facts = generate(args.out, args.txt, args.pdf, args.pages, args.paragraphs, args.seed)
+    size = sum(os.path.getsize(os.path.join(args.out, name)) for name in os.listdir(args.out))
+    print(f"Wrote {args.txt} .txt and {args.pdf} .pdf files ({size / 1e6:.1f} MB, "
+          f"{len(facts)} planted facts) to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,13 @@
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def pytest_configure(config):
+    # The app resolves chat.db, documents/ and index_data/ against the working
+    # directory (the database when app.database is imported), so the suite runs
+    # in a scratch directory rather than on the checkout's own data
+    sys.path.insert(0, ROOT)
+    os.chdir(tempfile.mkdtemp(prefix="assistant-tests-"))
@@ -0,0 +1,30 @@
+import pytest
+
+from app.services.extraction import Chunker
+
+
+@pytest.mark.parametrize("text, chunk_size, overlap", [
+    ("wo " * 199 + "a\U0001F600", 400, 80),
+    ("abc def ghi \U0001F600", 4, 1),
+    ("abc def ghi \U0001F600", 3, 2),
+    ("\U0001F600abc def ghi", 4, 1),
+])
+def test_multibyte_character_at_the_edge(text, chunk_size, overlap):
+    spans = Chunker(chunk_size, overlap).split_spans(text)
+    assert spans
+    assert all(0 <= start < end <= len(text) for start, end in spans)
+    assert spans[-1][1] == len(text)
+
+
+@pytest.mark.parametrize("chunk_size, overlap", [(2, 1), (3, 2), (4, 1), (8, 3)])
+def test_no_repeated_spans(chunk_size, overlap):
+    text = "abc def ghi \U0001F600 jkl. Mno pqr stu."
+    spans = Chunker(chunk_size, overlap).split_spans(text)
+    assert all(a != b for a, b in zip(spans, spans[1:]))
+
+
+def test_chunks_cover_text_in_order():
+    text = " ".join(f"Sentence number {i} ends here." for i in range(300))
+    spans = Chunker(50, 10).split_spans(text)
+    assert spans[0][0] == 0 and spans[-1][1] == len(text)
+    assert all(a[0] < b[0] <= a[1] + 1 for a, b in zip(spans, spans[1:]))
@@ -0,0 +1,67 @@
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+from app import crud
+from app.database import Base, create_db_engine
+from app.models import ChatHistory
+from app.services import metrics
+from app.services.conversation_cache import conversation_cache
+
+
+@pytest.fixture
+def sessions(tmp_path):
+    engine = create_db_engine(f"sqlite:///{tmp_path / 'chat.db'}")
+    Base.metadata.create_all(bind=engine)
+    conversation_cache.clear()
+    yield sessionmaker(bind=engine, expire_on_commit=False)
+    engine.dispose()
+
+
+def test_write_through_keeps_the_window_cached(sessions):
+    db = sessions()
+    crud.save_chat(db, "u", "first", "reply 1")
+    assert [c.message for c in crud.get_recent_chats(db, "u")] == ["first"]
+    hits = conversation_cache.hits
+    crud.save_chat(db, "u", "second", "reply 2")
+    assert [c.message for c in crud.get_recent_chats(db, "u")] == ["second", "first"]
+    assert conversation_cache.hits == hits + 1
+
+
+def test_single_process_hits_skip_the_database(sessions, monkeypatch):
+    monkeypatch.setattr(conversation_cache, "shared_db", False)
+    db = sessions()
+    crud.save_chat(db, "u", "first", "reply 1")
+    crud.get_recent_chats(db, "u")
+
+    def no_database(*args, **kwargs):
+        raise AssertionError("a cache hit queried the database")
+
+    monkeypatch.setattr(db, "query", no_database)
+    assert [c.message for c in crud.get_recent_chats(db, "u")] == ["first"]
+
+
+def test_write_by_another_worker_is_not_served_stale(sessions, monkeypatch):
+    monkeypatch.setattr(conversation_cache, "shared_db", True)
+    db, other_worker = sessions(), sessions()
+    crud.save_chat(db, "u", "first", "reply 1")
+    crud.get_recent_chats(db, "u")
+
+    # Another process writes straight to the shared database, bypassing this cache
+    other_worker.add(ChatHistory(user_id="u", message="elsewhere", reply="reply 2"))
+    other_worker.commit()
+
+    stale = conversation_cache.stale
+    assert [c.message for c in crud.get_recent_chats(db, "u")] == ["elsewhere", "first"]
+    assert conversation_cache.stale == stale + 1
+    assert [c.message for c in crud.get_recent_chats(db, "u")] == ["elsewhere", "first"]
+
+
+def test_cache_figures_on_metrics(sessions):
+    db = sessions()
+    crud.save_chat(db, "metrics-user", "hello", "hi")
+    crud.get_recent_chats(db, "metrics-user")
+    crud.get_recent_chats(db, "metrics-user")
+    text = metrics.render()
+    assert 'assistant_conversation_cache_lookups_total{result="hit"}' in text
+    assert "assistant_conversation_cache_users 1" in text
+    assert "assistant_conversation_cache_turns 1" in text
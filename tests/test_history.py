@@ -0,0 +1,31 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app import crud
+from app.database import SessionLocal
+from app.main import app
+
+
+@pytest.fixture(scope="module")
+def client():
+    return TestClient(app)
+
+
+@pytest.mark.parametrize("user_id, fallback, encoded", [
+    ("alice", "history-alice.ndjson", "history-alice.ndjson"),
+    ("日本", "history-__.ndjson", "history-%E6%97%A5%E6%9C%AC.ndjson"),
+    ('x"; filename=evil.sh', "history-x___filename_evil.sh.ndjson",
+     "history-x%22%3B%20filename%3Devil.sh.ndjson"),
+])
+def test_export_filename_is_header_safe(client, user_id, fallback, encoded):
+    db = SessionLocal()
+    try:
+        crud.save_chat(db, user_id, "question", "answer")
+    finally:
+        db.close()
+
+    response = client.get(f"/history/{user_id}/export")
+    assert response.status_code == 200
+    assert response.headers["content-disposition"] == (
+        f"attachment; filename=\"{fallback}\"; filename*=UTF-8''{encoded}")
+    assert [line for line in response.text.splitlines()][-1].endswith('"reply":"answer"}')
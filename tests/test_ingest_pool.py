@@ -0,0 +1,43 @@
+import os
+
+import pytest
+
+from app.services import doc_service
+from app.services.extraction import extract_and_chunk
+
+
+def extract_or_crash(path, source, first_page=1, last_page=None):
+    """Extraction that takes its worker process down for files named crash*."""
+    if source.startswith("crash"):
+        os._exit(1)
+    return extract_and_chunk(path, source, first_page, last_page)
+
+
+@pytest.fixture
+def documents(tmp_path, monkeypatch):
+    monkeypatch.setattr(doc_service, "DOCS_PATH", str(tmp_path))
+    monkeypatch.setattr(doc_service, "INGEST_WORKERS", 2)
+    monkeypatch.setattr(doc_service, "extract_and_chunk", extract_or_crash)
+    for name in ("a.txt", "b.txt", "c.txt", "crash.txt"):
+        (tmp_path / name).write_text(f"The file {name} has a sentence in it. " * 20)
+    yield tmp_path
+    if doc_service._ingest_pool is not None:
+        doc_service._ingest_pool.shutdown()
+        doc_service._ingest_pool = None
+
+
+def sources(filenames, failed):
+    return {chunk["source"] for chunk in doc_service.iter_chunks(filenames, failed)}
+
+
+def test_worker_crash_fails_only_its_file(documents):
+    failed = {}
+    assert sources(["a.txt", "crash.txt", "b.txt", "c.txt"], failed) == {"a.txt", "b.txt", "c.txt"}
+    assert list(failed) == ["crash.txt"]
+
+
+def test_pool_is_replaced_after_a_crash(documents):
+    sources(["crash.txt", "a.txt"], {})
+    failed = {}
+    assert sources(["b.txt", "c.txt"], failed) == {"b.txt", "c.txt"}
+    assert failed == {}
@@ -0,0 +1,24 @@
+import random
+
+import numpy as np
+
+from app.services.keyword_index import KeywordIndex
+
+
+def test_allowed_ids_match_narrowed_alive_flags():
+    rng = random.Random(0)
+    words = [f"w{i}" for i in range(50)]
+    keywords = KeywordIndex.from_texts(" ".join(rng.choice(words) for _ in range(20)) for _ in range(500))
+    alive = bytearray([1, 1, 0, 1] * 125)
+    live_tokens = keywords.tokens_in(np.flatnonzero(np.frombuffer(alive, dtype="uint8")).tolist())
+    allowed = np.array([i for i in range(0, 500, 7) if alive[i]], dtype="int64")
+    narrowed = bytearray(500)
+    for i in allowed.tolist():
+        narrowed[i] = 1
+
+    for query in ["w1", "w2 w3 w4", "w49 nothing"]:
+        want = keywords.search(query, narrowed, alive.count(1), live_tokens, 10)
+        ids, scores = keywords.search(query, alive, alive.count(1), live_tokens, 10, allowed)
+        assert ids.tolist() == want[0].tolist() and len(ids)
+        assert np.allclose(scores, want[1])
+    assert not len(keywords.search("w1", alive, alive.count(1), live_tokens, 10, allowed[:0])[0])
@@ -0,0 +1,214 @@
+"""/chat, /ask-doc and their SSE variants against benchmarks.fake_openrouter."""
+import json
+import os
+import threading
+import time
+
+import pytest
+import uvicorn
+from fastapi import Request
+from fastapi.responses import JSONResponse
+
+from benchmarks import fake_openrouter
+from benchmarks.common import free_port
+
+DOCUMENT = "Zebras have black and white stripes. Each zebra has a unique stripe pattern. " * 20
+
+
+class FakeLLM:
+    """The fake OpenRouter app on a local port, noting each call's messages and client port.
+
+    POSTs to error_url answer like a rate-limited OpenRouter, and POSTs to
+    unexpected_url with a body that has neither choices nor an error.
+    """
+
+    def __init__(self):
+        self.port = free_port()
+        self.url = f"http://127.0.0.1:{self.port}/api/v1/chat/completions"
+        self.error_url = f"http://127.0.0.1:{self.port}/error/chat/completions"
+        self.unexpected_url = f"http://127.0.0.1:{self.port}/unexpected/chat/completions"
+        # One entry per completion call: {"messages": [...]}
+        self.calls = []
+        # Client-side port of every request; one port per TCP connection
+        self.client_ports = []
+
+    def __enter__(self):
+        app = fake_openrouter.app
+        reply = fake_openrouter.fake_reply
+
+        @app.middleware("http")
+        async def note_client_port(request: Request, call_next):
+            self.client_ports.append(request.client.port)
+            return await call_next(request)
+
+        @app.post("/error/chat/completions")
+        async def rate_limited():
+            return JSONResponse({"error": {"message": "Rate limit exceeded"}}, status_code=429)
+
+        @app.post("/unexpected/chat/completions")
+        async def unexpected():
+            return JSONResponse({}, status_code=502)
+
+        def recording_reply(messages):
+            self.calls.append({"messages": messages})
+            return reply(messages)
+
+        fake_openrouter.fake_reply = recording_reply
+        self._reply = reply
+        self.server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=self.port, log_level="warning"))
+        self._thread = threading.Thread(target=self.server.run, daemon=True)
+        self._thread.start()
+        deadline = time.monotonic() + 10
+        while not self.server.started:
+            assert time.monotonic() < deadline, "fake OpenRouter did not start"
+            time.sleep(0.01)
+        return self
+
+    def __exit__(self, *exc):
+        self.server.should_exit = True
+        self._thread.join(10)
+        fake_openrouter.fake_reply = self._reply
+
+
+@pytest.fixture(scope="module")
+def fake_llm():
+    with FakeLLM() as llm:
+        yield llm
+
+
+@pytest.fixture(scope="module")
+def client(fake_llm, tmp_path_factory):
+    # chat.db, documents/ and index_data/ are relative to the working directory
+    workdir = tmp_path_factory.mktemp("app")
+    os.makedirs(workdir / "documents")
+    (workdir / "documents" / "zebras.txt").write_text(DOCUMENT)
+    previous = os.getcwd()
+    os.chdir(workdir)
+
+    from fastapi.testclient import TestClient
+
+    from app.main import app
+    from app.services import ai_service
+
+    original_url = ai_service.OPENROUTER_URL
+    ai_service.OPENROUTER_URL = fake_llm.url
+    try:
+        # One event loop for the module, so the pooled LLM client lives across requests
+        with TestClient(app) as test_client:
+            yield test_client
+    finally:
+        ai_service.OPENROUTER_URL = original_url
+        os.chdir(previous)
+
+
+@pytest.fixture(autouse=True)
+def empty_answer_cache():
+    # A cached answer would skip the LLM call a test is about
+    from app.services.answer_cache import answer_cache
+
+    answer_cache.clear()
+
+
+@pytest.fixture
+def llm_url(client, monkeypatch):
+    from app.services import ai_service
+
+    return lambda url: monkeypatch.setattr(ai_service, "OPENROUTER_URL", url)
+
+
+def sse_tokens(response):
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = [line[len("data: "):] for line in response.text.splitlines() if line.startswith("data: ")]
+    assert events[-1] == "[DONE]"
+    return [json.loads(event)["token"] for event in events[:-1]]
+
+
+def history(client, user_id):
+    return [(item["message"], item["reply"]) for item in client.get(f"/history/{user_id}").json()["items"]]
+
+
+def test_chat(client, fake_llm):
+    response = client.post("/chat", json={"user_id": "chat-user", "message": "hello there"})
+    assert response.status_code == 200
+    assert response.json() == {"reply": "Echo: hello there"}
+    assert history(client, "chat-user") == [("hello there", "Echo: hello there")]
+
+    # The stored turn is part of the next prompt
+    client.post("/chat", json={"user_id": "chat-user", "message": "and again"})
+    contents = [message["content"] for message in fake_llm.calls[-1]["messages"]]
+    assert "hello there" in contents and "Echo: hello there" in contents
+
+
+def test_chat_stream(client):
+    response = client.post("/chat/stream", json={"user_id": "stream-user", "message": "stream me"})
+    assert "".join(sse_tokens(response)) == "Echo: stream me"
+    assert history(client, "stream-user") == [("stream me", "Echo: stream me")]
+
+
+def test_ask_doc_sends_retrieved_context(client, fake_llm):
+    response = client.post("/ask-doc", json={"user_id": "doc-user", "message": "What do zebras look like?"})
+    assert response.status_code == 200
+    assert response.json() == {"reply": "Echo: What do zebras look like?"}
+    context = fake_llm.calls[-1]["messages"][-2]["content"]
+    assert "black and white stripes" in context
+
+
+def test_ask_doc_stream(client, fake_llm):
+    calls = len(fake_llm.calls)
+    response = client.post("/ask-doc/stream", json={"user_id": "doc-stream-user", "message": "zebra stripes?"})
+    assert "".join(sse_tokens(response)) == "Echo: zebra stripes?"
+    assert len(fake_llm.calls) == calls + 1
+    assert "black and white stripes" in fake_llm.calls[-1]["messages"][-2]["content"]
+    assert history(client, "doc-stream-user") == [("zebra stripes?", "Echo: zebra stripes?")]
+
+
+def test_reversed_page_range_is_rejected(client):
+    response = client.post("/ask-doc", json={"user_id": "doc-user", "message": "zebras?",
+                                             "filters": {"pages": [{"first": 5, "last": 2}]}})
+    assert response.status_code == 422
+
+
+def test_requests_reuse_pooled_connections(client, fake_llm):
+    from app.services import ai_service
+
+    pooled = ai_service.get_client()
+    first = len(fake_llm.client_ports)
+    for i in range(5):
+        client.post("/chat", json={"user_id": "pool-user", "message": f"message {i}"})
+    client.post("/chat/stream", json={"user_id": "pool-user", "message": "streamed"})
+
+    assert ai_service.get_client() is pooled
+    # Sequential calls, streamed or not, ride one keep-alive connection
+    assert len(fake_llm.client_ports) - first == 6
+    assert len(set(fake_llm.client_ports[first:])) == 1
+
+
+def test_error_reply_is_returned_but_not_stored(client, fake_llm, llm_url):
+    llm_url(fake_llm.error_url)
+    response = client.post("/chat", json={"user_id": "error-user", "message": "hi"})
+    assert response.json() == {"reply": "(AI Error) Rate limit exceeded"}
+
+    tokens = sse_tokens(client.post("/chat/stream", json={"user_id": "error-user", "message": "hi"}))
+    assert tokens == ["(AI Error) Rate limit exceeded"]
+    assert history(client, "error-user") == []
+
+
+def test_unexpected_reply_is_an_error(client, fake_llm, llm_url):
+    llm_url(fake_llm.unexpected_url)
+    response = client.post("/chat", json={"user_id": "unexpected-user", "message": "hi"})
+    assert response.json() == {"reply": "(AI Error) AI returned unexpected response"}
+
+    tokens = sse_tokens(client.post("/chat/stream", json={"user_id": "unexpected-user", "message": "hi"}))
+    assert tokens == ["(AI Error) AI returned unexpected response"]
+    assert history(client, "unexpected-user") == []
+
+
+def test_unreachable_llm(client, llm_url):
+    llm_url(f"http://127.0.0.1:{free_port()}/api/v1/chat/completions")
+    reply = client.post("/chat", json={"user_id": "down-user", "message": "hi"}).json()["reply"]
+    assert reply.startswith("(AI Error)")
+
+    tokens = sse_tokens(client.post("/ask-doc/stream", json={"user_id": "down-user", "message": "zebras?"}))
+    assert len(tokens) == 1 and tokens[0].startswith("(AI Error)")
+    assert history(client, "down-user") == []
@@ -0,0 +1,61 @@
+import asyncio
+import threading
+
+from app.services.query_batcher import QueryBatcher
+
+
+def make_batcher(gate=None, fail=False):
+    def batch_fn(queries, top_k):
+        if gate is not None:
+            gate.wait(5)
+        if fail:
+            raise RuntimeError("search failed")
+        return [[f"{query}-{i}" for i in range(top_k)] for query in queries]
+
+    return QueryBatcher(batch_fn, max_batch=8, max_wait_ms=20)
+
+
+def test_callers_get_their_own_top_k():
+    batcher = make_batcher()
+    small, large = batcher.submit("a", 1), batcher.submit("b", 3)
+    assert small.result(5) == ["a-0"]
+    assert large.result(5) == ["b-0", "b-1", "b-2"]
+
+
+def test_cancelled_caller_does_not_stop_the_batcher():
+    gate = threading.Event()
+    batcher = make_batcher(gate)
+
+    async def scenario():
+        waiting = asyncio.ensure_future(asyncio.wrap_future(batcher.submit("gone", 2)))
+        queued = batcher.submit("queued", 1)
+        await asyncio.sleep(0.05)   # the first batch is now running and blocked on the gate
+        waiting.cancel()
+        cancelled_in_queue = batcher.submit("late", 1)
+        cancelled_in_queue.cancel()
+        gate.set()
+        return await asyncio.wait_for(asyncio.wrap_future(batcher.submit("next", 1)), 5), queued
+
+    result, queued = asyncio.run(scenario())
+    assert result == ["next-0"]
+    assert queued.result(5) == ["queued-0"]
+    assert batcher._thread.is_alive()
+
+
+def test_cancelled_while_queued_is_skipped():
+    gate = threading.Event()
+    batcher = make_batcher(gate)
+    blocker = batcher.submit("blocker", 1)
+    cancelled = batcher.submit("cancelled", 1)
+    assert cancelled.cancel()
+    gate.set()
+    assert blocker.result(5) == ["blocker-0"]
+    assert batcher.submit("after", 1).result(5) == ["after-0"]
+
+
+def test_batch_errors_reach_every_caller():
+    batcher = make_batcher(fail=True)
+    futures = [batcher.submit(query, 1) for query in ("a", "b")]
+    for future in futures:
+        assert isinstance(future.exception(5), RuntimeError)
+    assert batcher._thread.is_alive()
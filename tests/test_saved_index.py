@@ -0,0 +1,54 @@
+import random
+
+import numpy as np
+import pytest
+
+from app.services.chunk_store import ChunkStore
+from app.services.keyword_index import KeywordIndex
+
+WORDS = [f"w{i}" for i in range(200)] + ["zébra", "XR-200", "straße"]
+
+
+@pytest.fixture
+def texts():
+    rng = random.Random(0)
+    return [" ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 30))) for _ in range(600)]
+
+
+def test_keyword_index_survives_save_and_appends(texts, tmp_path):
+    expected = KeywordIndex.from_texts(texts)
+    KeywordIndex.from_texts(texts[:400]).save(str(tmp_path), 400)
+    loaded = KeywordIndex.load(str(tmp_path), 400)
+    assert isinstance(loaded._ids, np.memmap) and not loaded.postings
+    for text in texts[400:]:
+        loaded.add(text)
+    (tmp_path / "again").mkdir()
+    loaded.save(str(tmp_path / "again"), 600)
+    reloaded = KeywordIndex.load(str(tmp_path / "again"), 600)
+
+    alive = bytearray([1, 1, 0] * 200)
+    live_tokens = expected.tokens_in(np.flatnonzero(np.frombuffer(alive, dtype="uint8")).tolist())
+    for query in ["w1 w2", "zébra", "xr-200 w7", "straße", "unknown"]:
+        want = expected.search(query, alive, alive.count(1), live_tokens, 10)
+        for index in (loaded, reloaded):
+            ids, scores = index.search(query, alive, alive.count(1), live_tokens, 10)
+            assert ids.tolist() == want[0].tolist()
+            assert np.allclose(scores, want[1])
+    assert reloaded.tokens_in(range(600)) == expected.tokens_in(range(600))
+
+
+def test_chunk_store_survives_save_and_appends(texts, tmp_path):
+    store = ChunkStore()
+    for i, text in enumerate(texts[:400]):
+        store.append(text, f"file{i % 3}.pdf", i % 4 or None, fingerprint=i)
+    store.save(str(tmp_path))
+    loaded = ChunkStore.load(str(tmp_path), 400)
+    for i, text in enumerate(texts[400:], 400):
+        loaded.append(text, f"file{i % 5}.pdf", i % 4 or None, fingerprint=i)
+
+    assert [loaded.get(i)["text"] for i in range(600)] == texts
+    assert [loaded.fingerprints[i] for i in range(600)] == list(range(600))
+    assert loaded.rows_for_source("file1.pdf").tolist() == \
+        [i for i in range(600) if (i % 3 if i < 400 else i % 5) == 1]
+    assert loaded.rows_for_source("file4.pdf").tolist() == [i for i in range(400, 600) if i % 5 == 4]
+    assert loaded.pages_of(np.array([0, 5, 401, 599])).tolist() == [0, 1, 1, 3]